@@ -0,0 +1,315 @@
+# analytics.py
+import json
+import mmap
+import weakref
+from datetime import date
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from models import *
+from data_manager import (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_SECTIONS, _HEADER, _SECTION, _NO_ID)
+
+# Записи двоичного снимка как структуры NumPy (форматы _BOOK, _PERSON и _BORROWING из data_manager)
+BOOK_DTYPE = np.dtype([("id", "<i8"), ("title", "<u4"), ("author", "<u4"), ("year", "<i4"), ("status", "<u4")])
+PERSON_DTYPE = np.dtype([("id", "<i8"), ("name", "<u4"), ("extra", "<u4"), ("start", "<u8"), ("count", "<u8")])
+BORROWING_DTYPE = np.dtype([("id", "<i8"), ("borrow_day", "<i4"), ("return_day", "<i4"), ("status", "<u4"),
+                            ("book_id", "<i8"), ("librarian_id", "<i8")])
+
+# Номер дня 1970-01-01 в date.toordinal(): от него отсчитывает datetime64[D]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_ID = _NO_ID
+
+
+def _days(ordinals) -> np.ndarray:
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def _ids(values, count: int) -> np.ndarray:
+    return np.fromiter(values, dtype=np.int64, count=count)
+
+
+class CirculationStats:
+    """Статистика выдач по колоночному представлению в массивах NumPy.
+
+    Выдачи хранятся колонками (id, book_id, librarian_id, borrow_date,
+    return_date, active), книги - колонками book_ids (по возрастанию) и
+    book_years. Группировки, топ-k и гистограммы по датам считаются
+    векторно. Построенная по системе статистика догоняет её через refresh()
+    по отметкам system.circulation, не обходя все выдачи.
+    """
+
+    def __init__(self):
+        self._system: Optional['LibrarySystem'] = None
+        self._clear()
+
+    def _clear(self):
+        # Колонки выдач - начала буферов с запасом: новые строки дописываются без копирования всех
+        self._buffers: Dict[str, np.ndarray] = {}
+        # id выдач возрастают по строкам: строки ищутся двоичным поиском без сортировки
+        self._ordered = True
+        self.ids = np.empty(0, dtype=np.int64)
+        self.book_id = np.empty(0, dtype=np.int64)
+        self.librarian_id = np.empty(0, dtype=np.int64)
+        self.borrow_date = np.empty(0, dtype="datetime64[D]")
+        self.return_date = np.empty(0, dtype="datetime64[D]")
+        # Выдача активна, пока она в списке выдач читателя
+        self.active = np.empty(0, dtype=bool)
+        self.book_ids = np.empty(0, dtype=np.int64)
+        self.book_years = np.empty(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # Построение
+
+    @classmethod
+    def from_system(cls, system: 'LibrarySystem') -> 'CirculationStats':
+        stats = cls()
+        stats._system = system
+        stats._build()
+        return stats
+
+    @classmethod
+    def from_json(cls, filename: str) -> 'CirculationStats':
+        """Строит колонки по файлу DataManager.save_to_json, не создавая объектов модели"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        stats = cls()
+        books = data["library"]["books"]
+        stats._set_books(_ids((book["id"] for book in books), len(books)),
+                         np.fromiter((book["year"] for book in books), dtype=np.int32, count=len(books)))
+        borrowings = data["borrowings"]
+        count = len(borrowings)
+
+        def column(key):
+            return _ids((NO_ID if b[key] is None else b[key] for b in borrowings), count)
+
+        stats.ids = _ids((b["id"] for b in borrowings), count)
+        stats.book_id = column("book_id")
+        stats.librarian_id = column("librarian_id")
+        # NumPy разбирает даты ISO сам, без date.fromisoformat на каждую запись
+        stats.borrow_date = np.array([b["borrow_date"] for b in borrowings], dtype="datetime64[D]")
+        stats.return_date = np.array([b["return_date"] for b in borrowings], dtype="datetime64[D]")
+        active = np.fromiter(chain.from_iterable(reader["borrowings"] for reader in data["readers"]),
+                             dtype=np.int64)
+        stats.active = np.isin(stats.ids, active)
+        return stats
+
+    @classmethod
+    def from_binary(cls, filename: str) -> 'CirculationStats':
+        """Строит колонки прямо по разделам снимка DataManager.save_to_binary"""
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            magic, version, section_count = _HEADER.unpack_from(snapshot, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("Файл не является снимком библиотечной системы")
+            if version != SNAPSHOT_VERSION or section_count != len(SNAPSHOT_SECTIONS):
+                raise ValueError(f"Неподдерживаемая версия снимка: {version}")
+            sections = {name: _SECTION.unpack_from(snapshot, _HEADER.size + i * _SECTION.size)
+                        for i, name in enumerate(SNAPSHOT_SECTIONS)}
+
+            def records(name: str, dtype) -> np.ndarray:
+                offset, size, _ = sections[name]
+                # Копия: массивы не должны ссылаться на закрываемый mmap
+                return np.frombuffer(snapshot, dtype=dtype, count=size // dtype.itemsize, offset=offset).copy()
+
+            books = records("books", BOOK_DTYPE)
+            readers = records("readers", PERSON_DTYPE)
+            borrowings = records("borrowings", BORROWING_DTYPE)
+            links = records("links", np.dtype("<i8"))
+
+        stats = cls()
+        stats._set_books(books["id"].astype(np.int64), books["year"].astype(np.int32))
+        stats.ids = borrowings["id"].astype(np.int64)
+        stats.book_id = borrowings["book_id"].astype(np.int64)
+        stats.librarian_id = borrowings["librarian_id"].astype(np.int64)
+        stats.borrow_date = _days(borrowings["borrow_day"])
+        stats.return_date = _days(borrowings["return_day"])
+        # Ссылки читателей - отрезки links[start:start + count]; индексы всех отрезков одним массивом
+        starts = readers["start"].astype(np.int64)
+        counts = readers["count"].astype(np.int64)
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        stats.active = np.isin(stats.ids, links[positions])
+        return stats
+
+    def _set_books(self, ids: np.ndarray, years: np.ndarray):
+        order = np.argsort(ids, kind="stable")
+        self.book_ids = ids[order]
+        self.book_years = years[order]
+
+    def _build(self):
+        """Строит колонки по системе с нуля и начинает следить за её изменениями"""
+        system = self._system
+        self._clear()
+        self._append_borrowings(list(system.borrowings))
+        books = system.library.books
+        self._set_books(_ids(books.ids(), len(books)),
+                        np.fromiter((book.year for book in books), dtype=np.int32, count=len(books)))
+        active = np.fromiter(chain.from_iterable(reader.borrowings.ids() for reader in system.readers),
+                             dtype=np.int64)
+        self.active[:] = np.isin(self.ids, active)
+        # Отметки снимаются после чтения: подгрузка ленивых коллекций выше тоже вызывает хуки
+        log = system.circulation
+        log.clear(weakref.ref(self, log.release))
+
+    def refresh(self):
+        """Догоняет систему, по которой построена статистика.
+
+        Хуки модели отмечают в system.circulation новые выдачи, выдачи со
+        сменой читателя и книги каталога; refresh дописывает новые строки,
+        меняет флаги active и колонки книг только у отмеченных. Статистика
+        строится заново, если из system.borrowings удалялись выдачи (например,
+        система загружена заново) или за системой следит другая статистика.
+        Прямую правку полей (book.year = ...) refresh не видит.
+        """
+        system = self._system
+        if system is None:
+            raise ValueError("Статистика построена не по системе")
+        log = system.circulation
+        follower = log.follower
+        if follower is None or follower() is not self or log.removed:
+            self._build()
+            return
+        added, changed, books = log.borrowings, log.readers, log.books
+        log.clear(follower)
+
+        if added:
+            self._append_borrowings(list(added.values()), active=True)
+        if books:
+            self._update_books(books)
+        if changed:
+            ids = _ids(changed.keys(), len(changed))
+            flags = np.fromiter(map(self._is_active, changed.values()), dtype=bool, count=len(changed))
+            rows, found = self._rows(ids)
+            self.active[rows] = flags[found]
+
+    def _is_active(self, borrowing: 'Borrowing') -> bool:
+        reader = borrowing.reader
+        return (reader is not None and reader._system is self._system
+                and reader.borrowings.get(borrowing.id) is borrowing)
+
+    def _append(self, name: str, values: np.ndarray):
+        column = getattr(self, name)
+        size = len(column)
+        buffer = self._buffers.get(name)
+        if buffer is None or column.base is not buffer or len(buffer) < size + len(values):
+            buffer = np.empty(max(2 * size, size + len(values), 1024), dtype=column.dtype)
+            buffer[:size] = column
+            self._buffers[name] = buffer
+        buffer[size:size + len(values)] = values
+        setattr(self, name, buffer[:size + len(values)])
+
+    def _append_borrowings(self, new: List['Borrowing'], active: bool = False):
+        """Дописывает строки выдач; active - сразу вычислить флаги (иначе False)"""
+        count = len(new)
+        if not count:
+            return
+        ids = _ids((b.id for b in new), count)
+        if self._ordered:
+            self._ordered = ((not len(self.ids) or ids[0] > self.ids[-1])
+                             and bool(np.all(ids[1:] > ids[:-1])))
+        self._append("ids", ids)
+        self._append("book_id", _ids((b.book.id if b.book is not None else NO_ID for b in new), count))
+        self._append("librarian_id", _ids(
+            (b.librarian.id if b.librarian is not None else NO_ID for b in new), count))
+        self._append("borrow_date", _days(
+            np.fromiter((b.borrow_date.toordinal() for b in new), dtype=np.int64, count=count)))
+        self._append("return_date", _days(
+            np.fromiter((b.return_date.toordinal() for b in new), dtype=np.int64, count=count)))
+        self._append("active", np.fromiter(map(self._is_active, new), dtype=bool, count=count)
+                     if active else np.zeros(count, dtype=bool))
+
+    def _rows(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(номера строк найденных id, маска найденных среди ids)"""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        if self._ordered:
+            order, sorted_ids = None, self.ids
+        else:
+            order = np.argsort(self.ids, kind="stable")
+            sorted_ids = self.ids[order]
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == ids
+        rows = positions[found]
+        return (rows if order is None else order[rows]), found
+
+    def _update_books(self, books: Dict[int, 'Book']):
+        """Убирает из колонок книг отмеченные id и вставляет те из них, что есть в каталоге"""
+        catalog = self._system.library.books
+        ids = np.array(sorted(books), dtype=np.int64)
+        if len(self.book_ids):
+            positions = np.minimum(np.searchsorted(self.book_ids, ids), len(self.book_ids) - 1)
+            present = positions[self.book_ids[positions] == ids]
+            self.book_ids = np.delete(self.book_ids, present)
+            self.book_years = np.delete(self.book_years, present)
+        current = [book for id, book in sorted(books.items()) if catalog.get(id) is book]
+        new_ids = _ids((book.id for book in current), len(current))
+        at = np.searchsorted(self.book_ids, new_ids)
+        self.book_ids = np.insert(self.book_ids, at, new_ids)
+        self.book_years = np.insert(self.book_years, at, np.array([book.year for book in current], dtype=np.int32))
+
+    # Запросы
+
+    def book_years_of_borrowings(self) -> np.ndarray:
+        """Год издания книги каждой выдачи (-1, если книги нет в каталоге)"""
+        if not len(self.book_ids):
+            return np.full(len(self.ids), -1, dtype=np.int32)
+        positions = np.minimum(np.searchsorted(self.book_ids, self.book_id), len(self.book_ids) - 1)
+        found = self.book_ids[positions] == self.book_id
+        return np.where(found, self.book_years[positions], -1).astype(np.int32)
+
+    def group_count(self, keys: np.ndarray, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Группировка: (значения ключа по возрастанию, число выдач с каждым)"""
+        if mask is not None:
+            keys = keys[mask]
+        return np.unique(keys, return_counts=True)
+
+    @staticmethod
+    def top_k(keys: np.ndarray, counts: np.ndarray, k: int) -> List[Tuple[int, int]]:
+        """k ключей с наибольшими счётчиками; при равенстве - меньший ключ раньше"""
+        if k <= 0 or not len(keys):
+            return []
+        if k < len(keys):
+            # argpartition отбирает кандидатов за O(n), сортируются только они
+            threshold = counts[np.argpartition(-counts, k - 1)[k - 1]]
+            candidates = np.flatnonzero(counts >= threshold)
+        else:
+            candidates = np.arange(len(keys))
+        order = np.lexsort((keys[candidates], -counts[candidates]))[:k]
+        return [(int(keys[i]), int(counts[i])) for i in candidates[order]]
+
+    def most_borrowed(self, k: int = 10) -> List[Tuple[int, int]]:
+        """Самые выдаваемые книги: [(id книги, число выдач)]"""
+        keys, counts = self.group_count(self.book_id, self.book_id != NO_ID)
+        return self.top_k(keys, counts, k)
+
+    def borrowings_per_librarian(self) -> Dict[int, int]:
+        keys, counts = self.group_count(self.librarian_id, self.librarian_id != NO_ID)
+        return dict(zip(keys.tolist(), counts.tolist()))
+
+    def average_loan_days(self) -> float:
+        """Средний срок выдачи в днях (от даты выдачи до срока возврата)"""
+        if not len(self.ids):
+            return 0.0
+        return float((self.return_date - self.borrow_date).astype(np.int64).mean())
+
+    def overdue(self, as_of: Optional[date] = None) -> np.ndarray:
+        """Маска активных выдач со сроком возврата раньше as_of (по умолчанию сегодня)"""
+        return self.active & (self.return_date < np.datetime64(as_of or date.today(), "D"))
+
+    def overdue_rate_by_year(self, as_of: Optional[date] = None) -> Dict[int, float]:
+        """Доля просроченных выдач среди всех выдач книг каждого года издания"""
+        years = self.book_years_of_borrowings()
+        known = years >= 0
+        keys, totals = self.group_count(years, known)
+        overdue = np.bincount(np.searchsorted(keys, years[known & self.overdue(as_of)]), minlength=len(keys))
+        return dict(zip(keys.tolist(), (overdue / totals).tolist()))
+
+    def histogram(self, column: str = "borrow_date", unit: str = "M",
+                  mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Число выдач по периодам даты: unit - 'D', 'W', 'M' или 'Y'.
+
+        Недели, как в NumPy, начинаются с четверга (1970-01-01). Возвращает (начала периодов в datetime64, счётчики); пустые периоды не выводятся.
+        """
+        if unit not in ("D", "W", "M", "Y"):
+            raise ValueError(f"Неизвестный период: {unit}")
+        return self.group_count(getattr(self, column).astype(f"datetime64[{unit}]"), mask)
@@ -0,0 +1,395 @@
+# benchmark.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+from models import *
+from data_manager import DataManager
+from events import NullSink
+from shard_storage import ShardedStorage
+import parallel_load
+import metrics
+
+# --metrics: фазы и счётчики последнего measure(), их забирает report()
+COLLECT_METRICS = False
+_last_metrics = None
+
+GENRES = ("роман", "детектив", "фантастика", "поэзия")
+FIELDS = ("физика", "биология", "математика", "история")
+SUBJECTS = ("алгебра", "химия", "литература", "география")
+
+
+def generate_system(books: int, readers: int, librarians: int, borrowings: int, seed: int = 0) -> 'LibrarySystem':
+    """Строит воспроизводимую систему заданного размера"""
+    rng = random.Random(seed)
+    system = LibrarySystem()
+
+    for i in range(1, books + 1):
+        title, author, year = f"Книга {i}", f"Автор {rng.randrange(max(books // 10, 1))}", rng.randint(1800, 2024)
+        kind = rng.randrange(3)
+        if kind == 0:
+            book = FictionBook(i, title, author, year, rng.choice(GENRES))
+        elif kind == 1:
+            book = ScientificBook(i, title, author, year, rng.choice(FIELDS))
+        else:
+            book = Textbook(i, title, author, year, rng.choice(SUBJECTS))
+        system.library.books.append(book)
+
+    for i in range(1, librarians + 1):
+        system.library.librarians.append(Librarian(i, f"Библиотекарь {i}", f"LIB{i:03}"))
+
+    for i in range(1, readers + 1):
+        system.readers.append(Reader(i, f"Читатель {i}", f"+7999{i:07}"))
+
+    start = date(2024, 1, 1)
+    latest: Dict[int, Borrowing] = {}
+    for i in range(1, borrowings + 1):
+        borrow_date = start + timedelta(days=rng.randrange(365))
+        borrowing = Borrowing(i, borrow_date, borrow_date + timedelta(days=14))
+        borrowing.book = system.library.books[rng.randrange(books)] if books else None
+        borrowing.librarian = system.library.librarians.get(rng.randint(1, librarians)) if librarians else None
+        system.borrowings.append(borrowing)
+        if borrowing.librarian:
+            borrowing.librarian.managed_borrowings.append(borrowing)
+        if borrowing.book:
+            previous = latest.get(borrowing.book.id)
+            if previous is None or previous.borrow_date <= borrow_date:
+                latest[borrowing.book.id] = borrowing
+
+    # Как после работы через API модели: у книги не больше одной активной выдачи -
+    # последней по дате, и книга выдана; остальные выдачи - история возвратов
+    if readers:
+        for borrowing in sorted(latest.values(), key=lambda b: b.id):
+            if rng.random() < 0.5:
+                system.readers.get(rng.randint(1, readers)).borrowings.append(borrowing)
+                borrowing.book.status = "Выдана"
+
+    return system
+
+
+def measure(func, *args):
+    """Возвращает (время в секундах, пиковая память, память после вызова) для func(*args).
+
+    Время и память снимаются в разных запусках: tracemalloc заметно замедляет выделения.
+    Метрики (--metrics) собираются во втором запуске, чтобы не влиять на время.
+    """
+    global _last_metrics
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        del result
+
+        with metrics.collect() if COLLECT_METRICS else contextlib.nullcontext() as collected:
+            tracemalloc.start()
+            result = func(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    _last_metrics = collected
+    del result
+    return elapsed, peak, current
+
+
+def measure_workload(setup, workload):
+    """Как measure, но подготовка (setup) в замер не входит: workload(setup()) меняет данные"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = setup()
+        started = time.perf_counter()
+        workload(state)
+        elapsed = time.perf_counter() - started
+        del state
+
+        state = setup()
+        tracemalloc.start()
+        workload(state)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def report(results: Optional[List[Dict[str, Any]]], name: str, elapsed: float, peak: int,
+           retained: Optional[int] = None, count: Optional[int] = None, size: Optional[int] = None):
+    """Печатает строку замера и добавляет её в results (для --output)"""
+    global _last_metrics
+    line = f"{name:24} {elapsed:7.2f} с  пик {peak / 2 ** 20:8.1f} МБ"
+    if retained is not None:
+        line += f"  итог {retained / 2 ** 20:8.1f} МБ"
+    if count:
+        line += f"  {count / elapsed if elapsed else float('inf'):12,.0f} оп/с"
+    print(line)
+    if results is not None:
+        results.append({"name": name, "seconds": elapsed, "peak_bytes": peak, "retained_bytes": retained,
+                        "count": count, "ops_per_second": count / elapsed if count and elapsed else None,
+                        "file_bytes": size,
+                        "metrics": _last_metrics.report() if _last_metrics is not None else None})
+    _last_metrics = None
+
+
+def _load(loader, filename: str) -> 'LibrarySystem':
+    system = LibrarySystem()
+    loader(filename, system)
+    return system
+
+
+def bench_json_load(books: int, borrowings: int, results: Optional[List[Dict[str, Any]]] = None):
+    """Сравнивает обычную и потоковую загрузку JSON"""
+    records = books + borrowings
+    system = generate_system(books, max(books // 10, 1), 10, borrowings)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "library_system.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            DataManager.save_to_json(system, filename)
+        del system
+        size = os.path.getsize(filename)
+        print(f"JSON: {size / 2 ** 20:.1f} МБ, книг {books}, выдач {borrowings}")
+
+        for name, loader in (("load_from_json", DataManager.load_from_json),
+                             ("load_from_json_stream", DataManager.load_from_json_stream),
+                             ("load_from_json_parallel", parallel_load.load_from_json)):
+            elapsed, peak, retained = measure(_load, loader, filename)
+            report(results, name, elapsed, peak, retained, count=records, size=size)
+
+
+def bench_xml(books: int, borrowings: int, results: Optional[List[Dict[str, Any]]] = None):
+    """Сравнивает построение DOM и потоковые запись/чтение XML"""
+    records = books + borrowings
+    system = generate_system(books, max(books // 10, 1), 10, borrowings)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "library_system.xml")
+        for name, saver in (("save_to_xml", DataManager.save_to_xml),
+                            ("save_to_xml_stream", DataManager.save_to_xml_stream)):
+            elapsed, peak, _ = measure(saver, system, filename)
+            report(results, name, elapsed, peak, count=records, size=os.path.getsize(filename))
+        del system
+        size = os.path.getsize(filename)
+        print(f"XML: {size / 2 ** 20:.1f} МБ, книг {books}, выдач {borrowings}")
+
+        for name, loader in (("load_from_xml", DataManager.load_from_xml),
+                             ("load_from_xml_stream", DataManager.load_from_xml_stream),
+                             ("load_from_xml_parallel", parallel_load.load_from_xml)):
+            elapsed, peak, retained = measure(_load, loader, filename)
+            report(results, name, elapsed, peak, retained, count=records, size=size)
+
+
+def bench_binary(books: int, borrowings: int, results: Optional[List[Dict[str, Any]]] = None):
+    """Сравнивает запись JSON (целиком и потоком), двоичного снимка и SQLite и загрузку последних двух"""
+    records = books + borrowings
+    system = generate_system(books, max(books // 10, 1), 10, borrowings)
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_file = os.path.join(tmp, "library_system.bin")
+        sqlite_file = os.path.join(tmp, "library_system.db")
+        json_file = os.path.join(tmp, "library_system.json")
+        for name, saver, filename in (("save_to_json", DataManager.save_to_json, json_file),
+                                      ("save_to_json_stream", DataManager.save_to_json_stream, json_file),
+                                      ("save_to_json_compact", _save_json_compact, json_file),
+                                      ("save_to_binary", DataManager.save_to_binary, binary_file),
+                                      ("save_to_sqlite", DataManager.save_to_sqlite, sqlite_file)):
+            elapsed, peak, _ = measure(saver, system, filename)
+            report(results, name, elapsed, peak, count=records, size=os.path.getsize(filename))
+        del system
+
+        # Выдачи из SQLite загружаются лениво: отдельно замеряется полная подгрузка
+        for name, filename, loader in (("load_from_binary", binary_file, DataManager.load_from_binary),
+                                       ("load_from_sqlite", sqlite_file, _load_sqlite),
+                                       ("load_from_sqlite_full", sqlite_file, _load_sqlite_full)):
+            elapsed, peak, retained = measure(_load, loader, filename)
+            report(results, name, elapsed, peak, retained, count=records, size=os.path.getsize(filename))
+
+
+def _save_json_compact(system: 'LibrarySystem', filename: str):
+    DataManager.save_to_json_stream(system, filename, compact=True)
+
+
+def _load_sqlite(filename: str, system: 'LibrarySystem'):
+    DataManager.load_from_sqlite(filename, system).close()
+
+
+def _load_sqlite_full(filename: str, system: 'LibrarySystem'):
+    with DataManager.load_from_sqlite(filename, system):
+        for reader in system.readers:
+            len(reader.borrowings)
+        for librarian in system.library.librarians:
+            len(librarian.managed_borrowings)
+        len(system.borrowings)
+
+
+def bench_workloads(books: int, borrowings: int, results: Optional[List[Dict[str, Any]]] = None):
+    """Выдача, возврат и удаление книг на системе заданного размера"""
+    readers = max(books // 10, 1)
+    return_date = date.today() + timedelta(days=14)
+
+    def setup():
+        return generate_system(books, readers, 10, borrowings)
+
+    # Выдаются только свободные книги; система детерминирована, поэтому список общий для всех замеров
+    system = setup()
+    available = [book.id for book in system.library.find_books_by_status("доступна")][:max(books // 2, 1)]
+    active = sum(len(reader.borrowings) for reader in system.readers)
+    count = len(available)
+    del system
+
+    def borrow(system):
+        librarians = system.library.librarians
+        for i, book_id in enumerate(available):
+            reader = system.readers.get(i % readers + 1)
+            reader.borrow_book(system.library.books.get(book_id), librarians.get(i % 10 + 1), return_date)
+
+    def borrowed():
+        system = setup()
+        borrow(system)
+        return system
+
+    def return_all(system):
+        for reader in system.readers:
+            for borrowing_id in list(reader.borrowings.ids()):
+                reader.return_book(borrowing_id)
+
+    def borrow_batch(system):
+        system.events = NullSink()
+        system.apply_batch(BorrowBook(i % readers + 1, book_id, i % 10 + 1, return_date)
+                           for i, book_id in enumerate(available))
+
+    def remove(system):
+        for i in range(1, count + 1):
+            system.library.remove_book(i)
+
+    print(f"Операции: книг {books}, выдач {borrowings}, по {count} операций")
+    elapsed, peak = measure_workload(setup, borrow)
+    report(results, "borrow_book", elapsed, peak, count=count)
+    elapsed, peak = measure_workload(setup, borrow_batch)
+    report(results, "apply_batch_borrow", elapsed, peak, count=count)
+    elapsed, peak = measure_workload(borrowed, return_all)
+    report(results, "return_book", elapsed, peak, count=active + count)
+    elapsed, peak = measure_workload(setup, remove)
+    report(results, "remove_book", elapsed, peak, count=count)
+
+
+def bench_shards(books: int, borrowings: int, results: Optional[List[Dict[str, Any]]] = None):
+    """Полное сохранение в шарды против сохранения после небольшого числа выдач"""
+    count = 100
+    return_date = date.today() + timedelta(days=14)
+
+    def save_full(system):
+        # Без отметки о прошлом сохранении каталог переписывается целиком
+        system.changes.clear()
+        storage.save(system)
+
+    def setup():
+        system = generate_system(books, max(books // 10, 1), 10, borrowings)
+        system.events = NullSink()
+        storage.save(system)
+        for i, book in enumerate(system.library.find_books_by_status("доступна")[:count]):
+            system.readers[i % len(system.readers)].borrow_book(book, system.library.librarians[0], return_date)
+        return system
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ShardedStorage(os.path.join(tmp, "shards"))
+        system = generate_system(books, max(books // 10, 1), 10, borrowings)
+        elapsed, peak, _ = measure(save_full, system)
+        report(results, "shards_save_full", elapsed, peak, count=books + borrowings)
+        del system
+
+        elapsed, peak = measure_workload(setup, storage.save)
+        report(results, "shards_save_incremental", elapsed, peak, count=count)
+
+        elapsed, peak, retained = measure(_load, _load_shards, storage.directory)
+        report(results, "shards_load", elapsed, peak, retained, count=books + borrowings)
+
+
+def _load_shards(directory: str, system: 'LibrarySystem'):
+    ShardedStorage(directory).load(system)
+
+
+def bench_memory(count: int):
+    """Оценивает байты на запись для книг и выдач, собранных как в загрузчиках"""
+    system = LibrarySystem()
+    system.library.librarians.append(Librarian(1, "Библиотекарь", "LIB001"))
+    rng = random.Random(0)
+    start = date(2024, 1, 1)
+    # Строки каждой записи создаются заново, как при разборе файла
+    book_lines = [json.dumps({"id": i, "title": f"Книга {i}", "author": f"Автор {i % 1000}",
+                              "year": 1900 + i % 120, "status": "доступна"}, ensure_ascii=False)
+                  for i in range(1, count + 1)]
+    borrowing_lines = []
+    for i in range(1, count + 1):
+        borrow_date = start + timedelta(days=rng.randrange(365))
+        borrowing_lines.append(json.dumps({
+            "id": i, "borrow_date": borrow_date.isoformat(),
+            "return_date": (borrow_date + timedelta(days=14)).isoformat(), "status": "Выдана",
+            "book_id": i, "librarian_id": 1, "reader_id": None}, ensure_ascii=False))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for line in book_lines:
+        system.library.books.append(DataManager._book_from_dict(json.loads(line)))
+    after_books = tracemalloc.get_traced_memory()[0]
+    for line in borrowing_lines:
+        system.borrowings.append(DataManager._borrowing_from_dict(json.loads(line), system))
+    after_borrowings = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"Book:      {(after_books - before) / count:6.0f} байт на запись (с индексами)")
+    print(f"Borrowing: {(after_borrowings - after_books) / count:6.0f} байт на запись (с индексами)")
+
+
+def save_results(filename: str, args: argparse.Namespace, results: List[Dict[str, Any]]):
+    """Сохраняет замеры в JSON для сравнения между запусками"""
+    data = {
+        "parameters": {"books": args.books, "borrowings": args.borrowings},
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {filename}")
+
+
+def compare_results(filename: str, results: List[Dict[str, Any]]):
+    """Печатает отношение времени к прошлому запуску (больше 1 - стало медленнее)"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        baseline = {entry["name"]: entry for entry in json.load(f)["results"]}
+    print(f"Сравнение с {filename}:")
+    for entry in results:
+        old = baseline.get(entry["name"])
+        if old and old["seconds"]:
+            print(f"{entry['name']:24} {entry['seconds'] / old['seconds']:6.2f}x время  "
+                  f"{entry['peak_bytes'] / max(old['peak_bytes'], 1):6.2f}x пик памяти")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности библиотечной системы")
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--borrowings", type=int, default=300_000)
+    parser.add_argument("--memory-only", action="store_true", help="только замер байт на запись")
+    parser.add_argument("--output", help="сохранить результаты в JSON-файл")
+    parser.add_argument("--compare", help="сравнить с результатами, сохранёнными через --output")
+    parser.add_argument("--metrics", action="store_true", help="собрать фазы и счётчики загрузок в результаты")
+    parser.add_argument("--profile", action="store_true", help="выполнить замеры под cProfile")
+    args = parser.parse_args()
+    COLLECT_METRICS = args.metrics
+
+    def run_all() -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        bench_memory(args.borrowings)
+        if not args.memory_only:
+            bench_json_load(args.books, args.borrowings, results)
+            bench_xml(args.books, args.borrowings, results)
+            bench_binary(args.books, args.borrowings, results)
+            bench_workloads(args.books, args.borrowings, results)
+            bench_shards(args.books, args.borrowings, results)
+        return results
+
+    results = metrics.profile(run_all) if args.profile else run_all()
+    if args.compare:
+        compare_results(args.compare, results)
+    if args.output:
+        save_results(args.output, args, results)
@@ -0,0 +1,179 @@
+# concurrency.py
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Dict, Optional
+from models import *
+from data_manager import DataManager
+
+
+class BookUnavailableError(ValueError):
+    """Книга уже выдана другому читателю"""
+
+
+class SharedExclusiveLock:
+    """Блокировка «много операций или один снимок».
+
+    Операции берут её совместно и друг другу не мешают; снимок берёт её
+    монопольно и ждёт, пока начатые операции закончатся. Ожидающий снимок
+    не пропускает вперёд новые операции, так что он не голодает.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._exclusive = False
+        self._waiting_exclusive = 0
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            while self._exclusive or self._waiting_exclusive:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if not self._active:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting_exclusive += 1
+            while self._exclusive or self._active:
+                self._condition.wait()
+            self._waiting_exclusive -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+class ConcurrentLibrarySystem:
+    """Потокобезопасный доступ к LibrarySystem для выдачи и возврата книг.
+
+    Проверка и смена статуса книги выполняются под блокировкой этой книги
+    (блокировки распределены по полосам по id), поэтому один экземпляр не
+    выдаётся дважды. Общие структуры защищены каждая своей блокировкой и
+    только на время своего изменения: индекс статусов книг, списки выдач
+    читателя и библиотекаря (полосы по id) и индекс сроков, который меняется
+    хуком списка читателя. Выдачи разных книг разным читателям поэтому не ждут
+    друг друга целиком. system.borrowings отдельной блокировки не требует: id
+    выдач уникальны (атомарный system.borrowing_ids), а добавление по id - одна
+    операция словаря. Блокировки берутся в порядке книга, читатель, индекс
+    сроков; статусы и библиотекарь берутся отдельно, так что взаимной
+    блокировки нет. Снимок для сохранения делается монопольно, но сама
+    запись файла идёт параллельно с новыми операциями.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, system: 'LibrarySystem', stripes: int = LOCK_STRIPES):
+        self.system = system
+        self._book_locks = [threading.Lock() for _ in range(stripes)]
+        self._reader_locks = [threading.Lock() for _ in range(stripes)]
+        self._librarian_locks = [threading.Lock() for _ in range(stripes)]
+        self._status_lock = threading.Lock()
+        self._due_lock = threading.Lock()
+        self._state = SharedExclusiveLock()
+
+    @staticmethod
+    def _stripe(locks, id: int) -> threading.Lock:
+        return locks[hash(id) % len(locks)]
+
+    def _book_lock(self, book_id: int) -> threading.Lock:
+        return self._stripe(self._book_locks, book_id)
+
+    def _set_status(self, book: 'Book', status: str):
+        # Сеттер переносит книгу в общем индексе статусов библиотеки
+        with self._status_lock:
+            book.status = status
+
+    def borrow_book(self, reader_id: int, book_id: int, librarian_id: int, return_date: date) -> 'Borrowing':
+        system = self.system
+        reader = system.get_reader(reader_id)
+        librarian = system.library.get_librarian(librarian_id)
+        if reader is None:
+            raise ValueError(f"Читатель с ID {reader_id} не найден")
+        if librarian is None:
+            raise ValueError(f"Библиотекарь с ID {librarian_id} не найден")
+
+        with self._state.shared(), self._book_lock(book_id):
+            book = system.library.get_book(book_id)
+            if book is None:
+                raise ValueError(f"Книга с ID {book_id} не найдена")
+            if book.status != "доступна":
+                raise BookUnavailableError(f"Книга '{book.title}' недоступна")
+            borrowing = Borrowing(system.borrowing_ids.allocate(), date.today(), return_date)
+            borrowing.book = book
+            borrowing.librarian = librarian
+            self._set_status(book, "Выдана")
+            with self._stripe(self._reader_locks, reader.id), self._due_lock:
+                reader.borrowings.append(borrowing)
+            with self._stripe(self._librarian_locks, librarian.id):
+                librarian.managed_borrowings.append(borrowing)
+            system.borrowings.append(borrowing)
+
+        system.events.emit("book_borrowed", book=book)
+        system.events.emit("borrowing_created", book=book, reader=reader)
+        return borrowing
+
+    def _close(self, reader: 'Reader', borrowing_id: int) -> Optional['Borrowing']:
+        with self._stripe(self._reader_locks, reader.id), self._due_lock:
+            return reader.borrowings.pop(borrowing_id)
+
+    def return_book(self, reader_id: int, borrowing_id: int) -> Optional['Borrowing']:
+        """Возвращает закрытую выдачу или None, если её нет (или её уже вернул другой поток)"""
+        system = self.system
+        reader = system.get_reader(reader_id)
+        borrowing = reader.borrowings.get(borrowing_id) if reader is not None else None
+        if borrowing is None:
+            system.events.emit("borrowing_not_found", id=borrowing_id)
+            return None
+
+        book = borrowing.book
+        with self._state.shared():
+            if book is None:
+                # Выдача без книги (book_id не было в файле): статус менять не у чего
+                borrowing = self._close(reader, borrowing_id)
+            else:
+                with self._book_lock(book.id):
+                    borrowing = self._close(reader, borrowing_id)
+                    if borrowing is not None:
+                        self._set_status(book, "доступна")
+
+        if borrowing is None:
+            system.events.emit("borrowing_not_found", id=borrowing_id)
+            return None
+        if book is not None:
+            system.events.emit("book_returned", book=book)
+        system.events.emit("borrowing_closed", borrowing=borrowing)
+        return borrowing
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Согласованное состояние системы в виде словаря DataManager.to_dict"""
+        with self._state.exclusive():
+            return DataManager.to_dict(self.system)
+
+    def copy(self) -> 'LibrarySystem':
+        """Независимая копия системы по согласованному снимку"""
+        data = self.snapshot()
+        system = LibrarySystem()
+        system.events = self.system.events
+        DataManager._load_from_dict(data, system)
+        return system
+
+    def save(self, filename: str):
+        """Сохраняет снимок в JSON, как DataManager.save_to_json.
+
+        Операции блокируются только на время снятия снимка, но не записи файла.
+        Файл пишется прямо из словаря снимка, без копии системы; для других
+        форматов сохраните copy() нужным методом DataManager.
+        """
+        DataManager.write_json(self.snapshot(), filename)
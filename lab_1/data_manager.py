@@ -1,12 +1,38 @@
 # data_manager.py
+import gc
 import json
+import mmap
+import os
+import re
+import struct
 import xml.etree.ElementTree as ET
+from array import array
+from contextlib import contextmanager
 from datetime import datetime, date
-from typing import Dict, Any
+from time import perf_counter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import metrics
 from models import *
+from sqlite_storage import SqliteStorage
 
 print()
 
+# Двоичный снимок: заголовок, таблица разделов и разделы с записями фиксированной длины.
+# Строки хранятся один раз в таблице строк, записи ссылаются на них по номеру.
+SNAPSHOT_MAGIC = b"LIBSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SECTIONS = ("library", "books", "librarians", "readers", "borrowings",
+                     "links", "string_offsets", "string_data")
+
+_HEADER = struct.Struct("<8sHH")
+_SECTION = struct.Struct("<QQQ")
+_LIBRARY = struct.Struct("<qII")
+_BOOK = struct.Struct("<qIIiI")
+_PERSON = struct.Struct("<qIIQQ")
+_BORROWING = struct.Struct("<qiiIqq")
+_LINK = struct.Struct("<q")
+_NO_ID = -1
+
 
 class DataManager:
     @staticmethod
@@ -68,93 +94,223 @@ class DataManager:
     @staticmethod
     def save_to_json(system: 'LibrarySystem', filename: str):
         """Сохраняет систему в JSON"""
-        data = DataManager.to_dict(system)
-        with open(filename, 'w', encoding='utf-8') as f:
+        with metrics.phase("to_dict"):
+            data = DataManager.to_dict(system)
+        DataManager.write_json(data, filename)
+
+    @staticmethod
+    def write_json(data: Dict[str, Any], filename: str):
+        """Пишет словарь DataManager.to_dict в JSON, как save_to_json"""
+        with metrics.phase("write"), open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2, default=str)
         print(f"Данные сохранены в {filename}")
 
+    @staticmethod
+    def save_to_json_stream(system: 'LibrarySystem', filename: str, compact: bool = False):
+        """Сохраняет систему в JSON по одной записи, без дерева словарей всей системы.
+
+        Вывод байт в байт как у save_to_json; compact=True пишет без отступов
+        и пробелов, как json.dump с separators=(",", ":").
+        """
+        library = system.library
+        write_items = _write_json_items_compact if compact else _write_json_items
+        with open(filename, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as f:
+            if compact:
+                f.write('{"library":{')
+                f.write(f'"id":{_json_scalar(library.id)},"name":{_json_scalar(library.name)},'
+                        f'"address":{_json_scalar(library.address)},')
+            else:
+                f.write('{\n  "library": {\n')
+                f.write(f'    "id": {_json_scalar(library.id)},\n    "name": {_json_scalar(library.name)},\n'
+                        f'    "address": {_json_scalar(library.address)},\n')
+            write_items(f, "books", library.books, DataManager._book_to_dict, "    ")
+            f.write("," if compact else ",\n")
+            write_items(f, "librarians", library.librarians, DataManager._librarian_to_dict, "    ")
+            f.write("}," if compact else "\n  },\n")
+            write_items(f, "readers", system.readers, DataManager._reader_to_dict, "  ")
+            f.write("," if compact else ",\n")
+            write_items(f, "borrowings", system.borrowings, DataManager._borrowing_to_dict, "  ")
+            f.write("}" if compact else "\n}")
+        print(f"Данные сохранены в {filename}")
+
     @staticmethod
     def load_from_json(filename: str, system: 'LibrarySystem'):
         """Загружает систему из JSON"""
-        with open(filename, 'r', encoding='utf-8') as f:
+        with metrics.phase("parse"), open(filename, 'r', encoding='utf-8') as f:
+            metrics.count("bytes_read", os.fstat(f.fileno()).st_size)
             data = json.load(f)
         DataManager._load_from_dict(data, system)
         print(f"Данные загружены из {filename}")
 
+    @staticmethod
+    def load_from_json_stream(filename: str, system: 'LibrarySystem'):
+        """Загружает систему из JSON потоково, не держа весь документ в памяти"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            metrics.count("bytes_read", os.fstat(f.fileno()).st_size)
+            DataManager._load_from_stream(_JsonStream(f), system)
+        print(f"Данные загружены из {filename}")
+
+    @staticmethod
+    def _book_to_xml(book: 'Book') -> ET.Element:
+        book_elem = ET.Element("book")
+        book_elem.set("id", str(book.id))
+        book_elem.set("title", book.title)
+        book_elem.set("author", book.author)
+        book_elem.set("year", str(book.year))
+        book_elem.set("status", book.status)
+        return book_elem
+
+    @staticmethod
+    def _librarian_to_xml(librarian: 'Librarian') -> ET.Element:
+        librarian_elem = ET.Element("librarian")
+        librarian_elem.set("id", str(librarian.id))
+        librarian_elem.set("name", librarian.name)
+        librarian_elem.set("employee_id", librarian.employee_id)
+
+        borrowings_elem = ET.SubElement(librarian_elem, "managed_borrowings")
+        for borrowing in librarian.managed_borrowings:
+            ET.SubElement(borrowings_elem, "borrowing_id").text = str(borrowing.id)
+        return librarian_elem
+
+    @staticmethod
+    def _reader_to_xml(reader: 'Reader') -> ET.Element:
+        reader_elem = ET.Element("reader")
+        reader_elem.set("id", str(reader.id))
+        reader_elem.set("full_name", reader.full_name)
+        reader_elem.set("phone", reader.phone)
+
+        borrowings_elem = ET.SubElement(reader_elem, "borrowings")
+        for borrowing in reader.borrowings:
+            ET.SubElement(borrowings_elem, "borrowing_id").text = str(borrowing.id)
+        return reader_elem
+
+    @staticmethod
+    def _borrowing_to_xml(borrowing: 'Borrowing') -> ET.Element:
+        borrowing_elem = ET.Element("borrowing")
+        borrowing_elem.set("id", str(borrowing.id))
+        borrowing_elem.set("borrow_date", borrowing.borrow_date.isoformat())
+        borrowing_elem.set("return_date", borrowing.return_date.isoformat())
+        borrowing_elem.set("status", borrowing.status)
+
+        if borrowing.book:
+            ET.SubElement(borrowing_elem, "book_id").text = str(borrowing.book.id)
+        if borrowing.librarian:
+            ET.SubElement(borrowing_elem, "librarian_id").text = str(borrowing.librarian.id)
+        return borrowing_elem
+
+    @staticmethod
+    def _library_to_xml(library: 'Library') -> ET.Element:
+        library_elem = ET.Element("library")
+        library_elem.set("id", str(library.id))
+        library_elem.set("name", library.name)
+        library_elem.set("address", library.address)
+        return library_elem
+
     @staticmethod
     def save_to_xml(system: 'LibrarySystem', filename: str):
         """Сохраняет систему в XML"""
         root = ET.Element("library_system")
 
         # Библиотека
-        library_elem = ET.SubElement(root, "library")
-        library_elem.set("id", str(system.library.id))
-        library_elem.set("name", system.library.name)
-        library_elem.set("address", system.library.address)
+        library_elem = DataManager._library_to_xml(system.library)
+        root.append(library_elem)
 
         # Книги
         books_elem = ET.SubElement(library_elem, "books")
         for book in system.library.books:
-            book_elem = ET.SubElement(books_elem, "book")
-            book_elem.set("id", str(book.id))
-            book_elem.set("title", book.title)
-            book_elem.set("author", book.author)
-            book_elem.set("year", str(book.year))
-            book_elem.set("status", book.status)
+            books_elem.append(DataManager._book_to_xml(book))
 
         # Библиотекари
         librarians_elem = ET.SubElement(library_elem, "librarians")
         for librarian in system.library.librarians:
-            librarian_elem = ET.SubElement(librarians_elem, "librarian")
-            librarian_elem.set("id", str(librarian.id))
-            librarian_elem.set("name", librarian.name)
-            librarian_elem.set("employee_id", librarian.employee_id)
-
-            borrowings_elem = ET.SubElement(librarian_elem, "managed_borrowings")
-            for borrowing in librarian.managed_borrowings:
-                ET.SubElement(borrowings_elem, "borrowing_id").text = str(borrowing.id)
+            librarians_elem.append(DataManager._librarian_to_xml(librarian))
 
         # Читатели
         readers_elem = ET.SubElement(root, "readers")
         for reader in system.readers:
-            reader_elem = ET.SubElement(readers_elem, "reader")
-            reader_elem.set("id", str(reader.id))
-            reader_elem.set("full_name", reader.full_name)
-            reader_elem.set("phone", reader.phone)
-
-            borrowings_elem = ET.SubElement(reader_elem, "borrowings")
-            for borrowing in reader.borrowings:
-                ET.SubElement(borrowings_elem, "borrowing_id").text = str(borrowing.id)
+            readers_elem.append(DataManager._reader_to_xml(reader))
 
         # Выдачи
         borrowings_elem = ET.SubElement(root, "borrowings")
         for borrowing in system.borrowings:
-            borrowing_elem = ET.SubElement(borrowings_elem, "borrowing")
-            borrowing_elem.set("id", str(borrowing.id))
-            borrowing_elem.set("borrow_date", borrowing.borrow_date.isoformat())
-            borrowing_elem.set("return_date", borrowing.return_date.isoformat())
-            borrowing_elem.set("status", borrowing.status)
-
-            if borrowing.book:
-                ET.SubElement(borrowing_elem, "book_id").text = str(borrowing.book.id)
-            if borrowing.librarian:
-                ET.SubElement(borrowing_elem, "librarian_id").text = str(borrowing.librarian.id)
+            borrowings_elem.append(DataManager._borrowing_to_xml(borrowing))
 
         tree = ET.ElementTree(root)
         tree.write(filename, encoding='utf-8', xml_declaration=True)
         print(f"Данные сохранены в {filename}")
 
+    @staticmethod
+    def save_to_xml_stream(system: 'LibrarySystem', filename: str):
+        """Сохраняет систему в XML поэлементно, байт в байт как save_to_xml"""
+        with open(filename, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+            f.write("<library_system>")
+            f.write(_open_tag(DataManager._library_to_xml(system.library)))
+            _write_xml_items(f, "books", system.library.books, DataManager._book_to_xml)
+            _write_xml_items(f, "librarians", system.library.librarians, DataManager._librarian_to_xml)
+            f.write("</library>")
+            _write_xml_items(f, "readers", system.readers, DataManager._reader_to_xml)
+            _write_xml_items(f, "borrowings", system.borrowings, DataManager._borrowing_to_xml)
+            f.write("</library_system>")
+        print(f"Данные сохранены в {filename}")
+
+    @staticmethod
+    def _book_from_xml(book_elem: ET.Element) -> 'Book':
+        book = Book(
+            int(book_elem.get("id")),
+            book_elem.get("title"),
+            book_elem.get("author"),
+            int(book_elem.get("year"))
+        )
+        book.status = book_elem.get("status")
+        return book
+
+    @staticmethod
+    def _borrowing_from_xml(borrowing_elem: ET.Element, system: 'LibrarySystem') -> 'Borrowing':
+        borrowing = Borrowing(
+            int(borrowing_elem.get("id")),
+            date.fromisoformat(borrowing_elem.get("borrow_date")),
+            date.fromisoformat(borrowing_elem.get("return_date"))
+        )
+        borrowing.status = borrowing_elem.get("status")
+
+        book_id = borrowing_elem.findtext("book_id")
+        if book_id is not None:
+            borrowing.book = system.library.get_book(int(book_id))
+        librarian_id = borrowing_elem.findtext("librarian_id")
+        if librarian_id is not None:
+            borrowing.librarian = system.library.get_librarian(int(librarian_id))
+        return borrowing
+
+    @staticmethod
+    def _librarian_from_xml(librarian_elem: ET.Element) -> 'Librarian':
+        return Librarian(
+            int(librarian_elem.get("id")),
+            librarian_elem.get("name"),
+            librarian_elem.get("employee_id")
+        )
+
+    @staticmethod
+    def _reader_from_xml(reader_elem: ET.Element) -> 'Reader':
+        return Reader(
+            int(reader_elem.get("id")),
+            reader_elem.get("full_name"),
+            reader_elem.get("phone")
+        )
+
+    @staticmethod
+    def _borrowing_ids_from_xml(list_elem: Optional[ET.Element]) -> List[int]:
+        return [int(id_elem.text) for id_elem in list_elem] if list_elem is not None else []
+
     @staticmethod
     def load_from_xml(filename: str, system: 'LibrarySystem'):
         """Загружает систему из XML"""
-        tree = ET.parse(filename)
-        root = tree.getroot()
+        metrics.count("bytes_read", os.path.getsize(filename))
+        with metrics.phase("parse"):
+            root = ET.parse(filename).getroot()
 
         # Очистка данных
-        system.library.books.clear()
-        system.library.librarians.clear()
-        system.readers.clear()
-        system.borrowings.clear()
+        DataManager._clear(system)
 
         # Загрузка библиотеки
         library_elem = root.find("library")
@@ -163,69 +319,322 @@ class DataManager:
         system.library.address = library_elem.get("address")
 
         # Загрузка книг
-        for book_elem in library_elem.find("books"):
-            book_id = int(book_elem.get("id"))
-            title = book_elem.get("title")
-            author = book_elem.get("author")
-            year = int(book_elem.get("year"))
-
-            book = Book(book_id, title, author, year)
-            book.status = book_elem.get("status")
-            system.library.books.append(book)
-
-        # Временное хранение выдач
-        temp_borrowings = {}
-        for borrowing_elem in root.find("borrowings"):
-            borrowing_id = int(borrowing_elem.get("id"))
-            borrow_date = date.fromisoformat(borrowing_elem.get("borrow_date"))
-            return_date = date.fromisoformat(borrowing_elem.get("return_date"))
-
-            borrowing = Borrowing(borrowing_id, borrow_date, return_date)
-            borrowing.status = borrowing_elem.get("status")
-            system.borrowings.append(borrowing)
-            temp_borrowings[borrowing_id] = borrowing
+        with metrics.phase("books"):
+            for book_elem in library_elem.find("books"):
+                system.library.books.append(DataManager._book_from_xml(book_elem))
 
         # Загрузка библиотекарей
-        for librarian_elem in library_elem.find("librarians"):
-            librarian_id = int(librarian_elem.get("id"))
-            name = librarian_elem.get("name")
-            employee_id = librarian_elem.get("employee_id")
+        with metrics.phase("librarians"):
+            for librarian_elem in library_elem.find("librarians"):
+                system.library.librarians.append(DataManager._librarian_from_xml(librarian_elem))
+
+        # Загрузка выдач (индекс system.borrowings служит для связывания по id)
+        borrowings = _LoadedBorrowings(system.borrowings)
+        with metrics.phase("borrowings"):
+            for borrowing_elem in root.find("borrowings"):
+                borrowings.append(DataManager._borrowing_from_xml(borrowing_elem, system))
+            borrowings.finish()
+
+        with metrics.phase("links"):
+            for librarian_elem in library_elem.find("librarians"):
+                librarian = system.library.get_librarian(int(librarian_elem.get("id")))
+                borrowings.link(librarian,
+                                DataManager._borrowing_ids_from_xml(librarian_elem.find("managed_borrowings")))
 
-            librarian = Librarian(librarian_id, name, employee_id)
+        # Загрузка читателей
+        with metrics.phase("readers"):
+            for reader_elem in root.find("readers"):
+                reader = DataManager._reader_from_xml(reader_elem)
+                borrowings.link(reader, DataManager._borrowing_ids_from_xml(reader_elem.find("borrowings")))
+                system.readers.append(reader)
 
-            for borrowing_id_elem in librarian_elem.find("managed_borrowings"):
-                borrowing_id = int(borrowing_id_elem.text)
-                if borrowing_id in temp_borrowings:
-                    librarian.managed_borrowings.append(temp_borrowings[borrowing_id])
+        DataManager._finish_load(system)
+        print(f"Данные загружены из {filename}")
 
-            system.library.librarians.append(librarian)
+    @staticmethod
+    def load_from_xml_stream(filename: str, system: 'LibrarySystem'):
+        """Загружает систему из XML через iterparse, освобождая разобранные элементы"""
+        DataManager._clear(system)
+        # Как и в потоковом JSON, выдачи идут в конце файла
+        pending: List[Tuple[Any, List[int]]] = []
+        borrowings = _LoadedBorrowings(system.borrowings)
+        parents: List[ET.Element] = []
+
+        for event, elem in ET.iterparse(filename, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "library":
+                    system.library.id = int(elem.get("id"))
+                    system.library.name = elem.get("name")
+                    system.library.address = elem.get("address")
+                parents.append(elem)
+                continue
+
+            parents.pop()
+            tag = elem.tag
+            parent_tag = parents[-1].tag if parents else None
+            if tag == "book" and parent_tag == "books":
+                system.library.books.append(DataManager._book_from_xml(elem))
+            elif tag == "librarian":
+                librarian = DataManager._librarian_from_xml(elem)
+                pending.append((librarian, DataManager._borrowing_ids_from_xml(elem.find("managed_borrowings"))))
+                system.library.librarians.append(librarian)
+            elif tag == "reader":
+                reader = DataManager._reader_from_xml(elem)
+                pending.append((reader, DataManager._borrowing_ids_from_xml(elem.find("borrowings"))))
+                system.readers.append(reader)
+            elif tag == "borrowing" and parent_tag == "borrowings":
+                borrowings.append(DataManager._borrowing_from_xml(elem, system))
+            else:
+                continue
+            # Разобранный элемент больше не нужен: убираем его из родителя
+            parents[-1].remove(elem)
+
+        borrowings.finish()
+        for owner, borrowing_ids in pending:
+            borrowings.link(owner, borrowing_ids)
+        DataManager._finish_load(system)
 
-        # Загрузка читателей
-        for reader_elem in root.find("readers"):
-            reader_id = int(reader_elem.get("id"))
-            full_name = reader_elem.get("full_name")
-            phone = reader_elem.get("phone")
+        print(f"Данные загружены из {filename}")
 
-            reader = Reader(reader_id, full_name, phone)
+    @staticmethod
+    def save_to_binary(system: 'LibrarySystem', filename: str):
+        """Сохраняет систему в двоичный снимок: записи фиксированной длины и таблица строк"""
+        strings = _StringTable()
+        sections = {name: bytearray() for name in SNAPSHOT_SECTIONS}
+        counts = dict.fromkeys(SNAPSHOT_SECTIONS, 0)
+
+        def add(name: str, record: bytes):
+            sections[name] += record
+            counts[name] += 1
+
+        def add_links(borrowings) -> Tuple[int, int]:
+            start = counts["links"]
+            for borrowing in borrowings:
+                add("links", _LINK.pack(borrowing.id))
+            return start, counts["links"] - start
+
+        library = system.library
+        add("library", _LIBRARY.pack(library.id, strings.index(library.name), strings.index(library.address)))
+        for book in library.books:
+            add("books", _BOOK.pack(book.id, strings.index(book.title), strings.index(book.author),
+                                    book.year, strings.index(book.status)))
+        for librarian in library.librarians:
+            start, count = add_links(librarian.managed_borrowings)
+            add("librarians", _PERSON.pack(librarian.id, strings.index(librarian.name),
+                                           strings.index(librarian.employee_id), start, count))
+        for reader in system.readers:
+            start, count = add_links(reader.borrowings)
+            add("readers", _PERSON.pack(reader.id, strings.index(reader.full_name),
+                                        strings.index(reader.phone), start, count))
+        for borrowing in system.borrowings:
+            add("borrowings", _BORROWING.pack(
+                borrowing.id,
+                borrowing.borrow_date.toordinal(),
+                borrowing.return_date.toordinal(),
+                strings.index(borrowing.status),
+                borrowing.book.id if borrowing.book else _NO_ID,
+                borrowing.librarian.id if borrowing.librarian else _NO_ID
+            ))
+        sections["string_offsets"], sections["string_data"] = strings.encode()
+        counts["string_offsets"] = len(strings)
+
+        # Заголовок: сигнатура, версия и таблица разделов (смещение, длина, число записей)
+        offset = _HEADER.size + _SECTION.size * len(SNAPSHOT_SECTIONS)
+        with open(filename, 'wb') as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(SNAPSHOT_SECTIONS)))
+            for name in SNAPSHOT_SECTIONS:
+                f.write(_SECTION.pack(offset, len(sections[name]), counts[name]))
+                offset += len(sections[name])
+            for name in SNAPSHOT_SECTIONS:
+                f.write(sections[name])
+        print(f"Данные сохранены в {filename}")
 
-            for borrowing_id_elem in reader_elem.find("borrowings"):
-                borrowing_id = int(borrowing_id_elem.text)
-                if borrowing_id in temp_borrowings:
-                    reader.borrowings.append(temp_borrowings[borrowing_id])
+    @staticmethod
+    def load_from_binary(filename: str, system: 'LibrarySystem'):
+        """Восстанавливает систему из двоичного снимка, отображая файл в память"""
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot, \
+                _gc_paused(), metrics.phase("snapshot"):
+            metrics.count("bytes_read", len(snapshot))
+            # Срезы memoryview не копируют байты; вид освобождается до закрытия mmap
+            with memoryview(snapshot) as view:
+                DataManager._load_from_snapshot(view, system)
+        print(f"Данные загружены из {filename}")
 
-            system.readers.append(reader)
+    @staticmethod
+    def save_to_sqlite(system: 'LibrarySystem', filename: str):
+        """Сохраняет систему в базу SQLite"""
+        with SqliteStorage(filename) as storage:
+            storage.save(system)
+        print(f"Данные сохранены в {filename}")
 
+    @staticmethod
+    def load_from_sqlite(filename: str, system: 'LibrarySystem') -> 'SqliteStorage':
+        """Загружает систему из SQLite; выдачи подгружаются лениво, пока хранилище открыто"""
+        storage = SqliteStorage(filename)
+        DataManager._clear(system)
+        storage.load(system)
+        DataManager._finish_load(system)
         print(f"Данные загружены из {filename}")
+        return storage
 
     @staticmethod
-    def _load_from_dict(data: Dict[str, Any], system: 'LibrarySystem'):
-        """Загружает данные из словаря"""
-        # Очистка данных
+    def _load_from_snapshot(snapshot, system: 'LibrarySystem'):
+        if len(snapshot) < _HEADER.size:
+            raise ValueError("Файл слишком мал для снимка")
+        magic, version, section_count = _HEADER.unpack_from(snapshot, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Файл не является снимком библиотечной системы")
+        if version != SNAPSHOT_VERSION or section_count != len(SNAPSHOT_SECTIONS):
+            raise ValueError(f"Неподдерживаемая версия снимка: {version}")
+        sections = {name: _SECTION.unpack_from(snapshot, _HEADER.size + i * _SECTION.size)
+                    for i, name in enumerate(SNAPSHOT_SECTIONS)}
+
+        def records(name: str, record: struct.Struct):
+            offset, size, _ = sections[name]
+            return record.iter_unpack(snapshot[offset:offset + size])
+
+        # Таблица строк невелика (строки уникальны), поэтому декодируется целиком
+        offsets_start, offsets_size, _ = sections["string_offsets"]
+        data_start, data_size, _ = sections["string_data"]
+        string_offsets = array('Q')
+        string_offsets.frombytes(snapshot[offsets_start:offsets_start + offsets_size])
+        links = array('q')
+        links.frombytes(snapshot[sections["links"][0]:sections["links"][0] + sections["links"][1]])
+        if sys.byteorder == "big":
+            string_offsets.byteswap()
+            links.byteswap()
+        string_data = snapshot[data_start:data_start + data_size]
+        strings = [str(string_data[string_offsets[i]:string_offsets[i + 1]], 'utf-8')
+                   for i in range(len(string_offsets) - 1)]
+        del string_data
+
+        DataManager._clear(system)
+        library = system.library
+        for library_id, name, address in records("library", _LIBRARY):
+            library.id, library.name, library.address = library_id, strings[name], strings[address]
+
+        add_book = library.books.append
+        for book_id, title, author, year, status in records("books", _BOOK):
+            book = Book(book_id, strings[title], strings[author], year)
+            book.status = strings[status]
+            add_book(book)
+
+        for librarian_id, name, employee_id, _, _ in records("librarians", _PERSON):
+            library.librarians.append(Librarian(librarian_id, strings[name], strings[employee_id]))
+
+        get_book = library.books.get
+        get_librarian = library.librarians.get
+        add_borrowing = system.borrowings.append
+        dates: Dict[int, date] = {}
+        for borrowing_id, borrow_day, return_day, status, book_id, librarian_id in records("borrowings", _BORROWING):
+            borrow_date = dates.get(borrow_day)
+            if borrow_date is None:
+                borrow_date = dates[borrow_day] = date.fromordinal(borrow_day)
+            return_date = dates.get(return_day)
+            if return_date is None:
+                return_date = dates[return_day] = date.fromordinal(return_day)
+            borrowing = Borrowing(borrowing_id, borrow_date, return_date)
+            borrowing.status = strings[status]
+            if book_id != _NO_ID:
+                borrowing.book = get_book(book_id)
+            if librarian_id != _NO_ID:
+                borrowing.librarian = get_librarian(librarian_id)
+            add_borrowing(borrowing)
+
+        for librarian_id, _, _, start, count in records("librarians", _PERSON):
+            DataManager._link_borrowings(get_librarian(librarian_id).managed_borrowings,
+                                         links[start:start + count], system.borrowings)
+
+        for reader_id, full_name, phone, start, count in records("readers", _PERSON):
+            reader = Reader(reader_id, strings[full_name], strings[phone])
+            DataManager._link_borrowings(reader.borrowings, links[start:start + count], system.borrowings)
+            system.readers.append(reader)
+
+        DataManager._finish_load(system)
+
+    @staticmethod
+    def _clear(system: 'LibrarySystem'):
+        # Поисковый индекс на время загрузки отключается и строится в _finish_load
+        system.library.search.suspend()
         system.library.books.clear()
         system.library.librarians.clear()
         system.readers.clear()
         system.borrowings.clear()
 
+    @staticmethod
+    def _finish_load(system: 'LibrarySystem'):
+        # Загруженная система не совпадает ни с одним хранилищем шардов
+        system.changes.clear()
+        with metrics.phase("search_index"):
+            system.library.search.rebuild(system.library.books)
+        metrics.count("records.books", len(system.library.books))
+        metrics.count("records.readers", len(system.readers))
+        # loaded() не подгружает ленивые выдачи (SQLite)
+        metrics.count("records.borrowings", len(system.borrowings.loaded()))
+
+    @staticmethod
+    def _book_from_dict(book_data: Dict[str, Any]) -> 'Book':
+        book = Book(
+            book_data["id"],
+            book_data["title"],
+            book_data["author"],
+            book_data["year"]
+        )
+        book.status = book_data["status"]
+        return book
+
+    @staticmethod
+    def _borrowing_from_dict(borrowing_data: Dict[str, Any], system: 'LibrarySystem') -> 'Borrowing':
+        # При включённых метриках время делится на разбор дат, создание объекта и поиск ссылок
+        collector = metrics.active
+        if collector is not None:
+            started = perf_counter()
+        borrow_date = date.fromisoformat(borrowing_data["borrow_date"])
+        return_date = date.fromisoformat(borrowing_data["return_date"])
+        if collector is not None:
+            parsed = perf_counter()
+        borrowing = Borrowing(borrowing_data["id"], borrow_date, return_date)
+        borrowing.status = borrowing_data["status"]
+        if collector is not None:
+            built = perf_counter()
+        # Книги и библиотекари к этому моменту уже в индексах библиотеки
+        if borrowing_data.get("book_id") is not None:
+            borrowing.book = system.library.get_book(borrowing_data["book_id"])
+        if borrowing_data.get("librarian_id") is not None:
+            borrowing.librarian = system.library.get_librarian(borrowing_data["librarian_id"])
+        if collector is not None:
+            collector.add_time("borrowing.parse_dates", parsed - started)
+            collector.add_time("borrowing.construct", built - parsed)
+            collector.add_time("borrowing.resolve_refs", perf_counter() - built)
+        return borrowing
+
+    @staticmethod
+    def _librarian_from_dict(librarian_data: Dict[str, Any]) -> 'Librarian':
+        return Librarian(
+            librarian_data["id"],
+            librarian_data["name"],
+            librarian_data["employee_id"]
+        )
+
+    @staticmethod
+    def _reader_from_dict(reader_data: Dict[str, Any]) -> 'Reader':
+        return Reader(
+            reader_data["id"],
+            reader_data["full_name"],
+            reader_data["phone"]
+        )
+
+    @staticmethod
+    def _link_borrowings(target, borrowing_ids, borrowings):
+        """Добавляет в коллекцию выдачи по их id, пропуская неизвестные"""
+        target.extend(borrowing for borrowing in map(borrowings.get, borrowing_ids) if borrowing is not None)
+
+    @staticmethod
+    def _load_from_dict(data: Dict[str, Any], system: 'LibrarySystem'):
+        """Загружает данные из словаря"""
+        # Очистка данных
+        DataManager._clear(system)
+
         # Загрузка библиотеки
         library_data = data["library"]
         system.library.id = library_data["id"]
@@ -233,52 +642,336 @@ class DataManager:
         system.library.address = library_data["address"]
 
         # Загрузка книг
-        for book_data in library_data["books"]:
-            book = Book(
-                book_data["id"],
-                book_data["title"],
-                book_data["author"],
-                book_data["year"]
-            )
-            book.status = book_data["status"]
-            system.library.books.append(book)
-
-        # Временное хранение выдач
-        temp_borrowings = {}
-        for borrowing_data in data["borrowings"]:
-            borrowing = Borrowing(
-                borrowing_data["id"],
-                date.fromisoformat(borrowing_data["borrow_date"]),
-                date.fromisoformat(borrowing_data["return_date"])
-            )
-            borrowing.status = borrowing_data["status"]
-            system.borrowings.append(borrowing)
-            temp_borrowings[borrowing.id] = borrowing
+        with metrics.phase("books"):
+            for book_data in library_data["books"]:
+                system.library.books.append(DataManager._book_from_dict(book_data))
 
         # Загрузка библиотекарей
-        for librarian_data in library_data["librarians"]:
-            librarian = Librarian(
-                librarian_data["id"],
-                librarian_data["name"],
-                librarian_data["employee_id"]
-            )
+        with metrics.phase("librarians"):
+            for librarian_data in library_data["librarians"]:
+                system.library.librarians.append(DataManager._librarian_from_dict(librarian_data))
+
+        # Загрузка выдач (индекс system.borrowings служит для связывания по id)
+        borrowings = _LoadedBorrowings(system.borrowings)
+        with metrics.phase("borrowings"):
+            for borrowing_data in data["borrowings"]:
+                borrowings.append(DataManager._borrowing_from_dict(borrowing_data, system))
+            borrowings.finish()
+
+        with metrics.phase("links"):
+            for librarian_data in library_data["librarians"]:
+                borrowings.link(system.library.get_librarian(librarian_data["id"]),
+                                librarian_data["managed_borrowings"])
 
-            for borrowing_id in librarian_data["managed_borrowings"]:
-                if borrowing_id in temp_borrowings:
-                    librarian.managed_borrowings.append(temp_borrowings[borrowing_id])
+        # Загрузка читателей
+        with metrics.phase("readers"):
+            for reader_data in data["readers"]:
+                reader = DataManager._reader_from_dict(reader_data)
+                borrowings.link(reader, reader_data["borrowings"])
+                system.readers.append(reader)
 
-            system.library.librarians.append(librarian)
+        DataManager._finish_load(system)
 
-        # Загрузка читателей
-        for reader_data in data["readers"]:
-            reader = Reader(
-                reader_data["id"],
-                reader_data["full_name"],
-                reader_data["phone"]
-            )
-
-            for borrowing_id in reader_data["borrowings"]:
-                if borrowing_id in temp_borrowings:
-                    reader.borrowings.append(temp_borrowings[borrowing_id])
-
-            system.readers.append(reader)
\ No newline at end of file
+    @staticmethod
+    def _load_from_stream(stream: '_JsonStream', system: 'LibrarySystem'):
+        """Строит объекты по мере чтения JSON; ссылки на выдачи связываются в конце"""
+        DataManager._clear(system)
+        # Читатели и библиотекари идут в файле раньше выдач, поэтому
+        # запоминаем только списки id и связываем их после чтения всех выдач
+        pending: List[Tuple[Any, List[int]]] = []
+        borrowings = _LoadedBorrowings(system.borrowings)
+
+        for key in stream.iter_object():
+            if key == "library":
+                for library_key in stream.iter_object():
+                    if library_key == "books":
+                        for book_data in stream.iter_array():
+                            system.library.books.append(DataManager._book_from_dict(book_data))
+                    elif library_key == "librarians":
+                        for librarian_data in stream.iter_array():
+                            librarian = DataManager._librarian_from_dict(librarian_data)
+                            pending.append((librarian, librarian_data["managed_borrowings"]))
+                            system.library.librarians.append(librarian)
+                    elif library_key in ("id", "name", "address"):
+                        setattr(system.library, library_key, stream.read_value())
+                    else:
+                        stream.read_value()
+            elif key == "readers":
+                for reader_data in stream.iter_array():
+                    reader = DataManager._reader_from_dict(reader_data)
+                    pending.append((reader, reader_data["borrowings"]))
+                    system.readers.append(reader)
+            elif key == "borrowings":
+                for borrowing_data in stream.iter_array():
+                    borrowings.append(DataManager._borrowing_from_dict(borrowing_data, system))
+            else:
+                stream.read_value()
+
+        borrowings.finish()
+        for owner, borrowing_ids in pending:
+            borrowings.link(owner, borrowing_ids)
+        DataManager._finish_load(system)
+
+
+class _JsonStream:
+    """Инкрементальный разбор JSON: значения декодируются по одному из буфера"""
+
+    CHUNK_SIZE = 1 << 16
+    WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+    def __init__(self, file, chunk_size: int = CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Дочитывает очередной блок; уже разобранная часть буфера отбрасывается"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = self.WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Неожиданный конец JSON")
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Ожидался символ '{char}' в позиции {self._pos}")
+        self._pos += 1
+
+    def read_value(self) -> Any:
+        """Декодирует одно значение целиком"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Число на границе блока могло быть обрезано - дочитываем и повторяем
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """Перебирает ключи объекта; значение каждого ключа должен прочитать вызывающий"""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("}")
+            return
+
+    def iter_array(self) -> Iterator[Any]:
+        """Перебирает элементы массива, декодируя их по одному"""
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("]")
+            return
+
+
+@contextmanager
+def _gc_paused():
+    """Отключает сборщик циклов на время массового создания объектов"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str)
+_JSON_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str, separators=(",", ":"))
+# Экранирование строк из модуля json (C-версия, если она есть)
+_json_string = json.encoder.encode_basestring
+
+
+def _json_scalar(value) -> str:
+    """Значение без вложенности так же, как его пишет json.dump"""
+    kind = type(value)
+    if kind is str:
+        return _json_string(value)
+    if kind is int:
+        return int.__repr__(value)
+    if value is None:
+        return "null"
+    return _JSON_ENCODER.encode(value)
+
+
+def _json_indented(record: Dict[str, Any], pad: str) -> str:
+    """Словарь записи с отступом 2, как json.dump(indent=2); pad - отступ самой записи"""
+    inner = pad + "  "
+    fields = []
+    for key, value in record.items():
+        if type(value) is list:
+            if value:
+                items = f",\n{inner}  ".join(map(_json_scalar, value))
+                value = f"[\n{inner}  {items}\n{inner}]"
+            else:
+                value = "[]"
+        else:
+            value = _json_scalar(value)
+        fields.append(f"{inner}{_json_string(key)}: {value}")
+    return "{\n" + ",\n".join(fields) + f"\n{pad}}}"
+
+
+def _write_json_items(f, key: str, items, to_dict, pad: str):
+    """Пишет массив записей с отступами; записи строятся и кодируются по одной"""
+    if not items:
+        f.write(f'{pad}"{key}": []')
+        return
+    inner = pad + "  "
+    f.write(f'{pad}"{key}": [\n{inner}')
+    first = True
+    for item in items:
+        if not first:
+            f.write(f",\n{inner}")
+        first = False
+        f.write(_json_indented(to_dict(item), inner))
+    f.write(f"\n{pad}]")
+
+
+def _write_json_items_compact(f, key: str, items, to_dict, pad: str):
+    """То же без отступов; запись кодирует C-кодировщик json"""
+    encode = _JSON_COMPACT_ENCODER.encode
+    f.write(f'"{key}":[')
+    first = True
+    for item in items:
+        if not first:
+            f.write(",")
+        first = False
+        f.write(encode(to_dict(item)))
+    f.write("]")
+
+
+def _open_tag(elem: ET.Element) -> str:
+    """Открывающий тег элемента с тем же экранированием атрибутов, что и в ElementTree"""
+    return ET.tostring(elem, encoding='unicode')[:-len(" />")] + ">"
+
+
+def _write_xml_items(f, tag: str, items, to_xml):
+    """Пишет контейнер и его элементы по одному; пустой контейнер - как ElementTree"""
+    if not items:
+        f.write(f"<{tag} />")
+        return
+    f.write(f"<{tag}>")
+    for item in items:
+        f.write(ET.tostring(to_xml(item), encoding='unicode'))
+    f.write(f"</{tag}>")
+
+
+class _LoadedBorrowings:
+    """Добавляет выдачи в system.borrowings при загрузке JSON и XML и связывает ссылки на них.
+
+    В файлах прежнего формата id выдач повторяются: Reader.borrow_book нумеровал
+    выдачи по длине списка читателя. Повторы получают в finish() новые id после
+    наибольшего, а ссылки на повторяющийся id разбираются по его записям:
+    библиотекарю достаются выдачи с его librarian_id, читателю - первая ещё
+    ничья запись. Без повторов ссылки связываются через индекс, как обычно.
+    """
+
+    def __init__(self, borrowings):
+        self.borrowings = borrowings
+        self._repeated: List['Borrowing'] = []
+        # id в файле -> все записи с этим id в порядке файла
+        self._records: Dict[int, List['Borrowing']] = {}
+
+    def append(self, borrowing: 'Borrowing'):
+        try:
+            self.borrowings.append(borrowing)
+        except ValueError:
+            self._repeated.append(borrowing)
+
+    def finish(self):
+        """Выдаёт повторам новые id; вызывается после чтения всех выдач"""
+        if not self._repeated:
+            return
+        next_id = max(self.borrowings.ids()) + 1
+        for borrowing in self._repeated:
+            self._records.setdefault(borrowing.id, [self.borrowings.get(borrowing.id)]).append(borrowing)
+            borrowing.id = next_id
+            next_id += 1
+            self.borrowings.append(borrowing)
+        metrics.count("borrowings.renumbered", len(self._repeated))
+        self._repeated.clear()
+
+    def link(self, owner, borrowing_ids):
+        """Добавляет выдачи по id в список читателя или библиотекаря"""
+        is_librarian = isinstance(owner, Librarian)
+        target = owner.managed_borrowings if is_librarian else owner.borrowings
+        if not self._records:
+            DataManager._link_borrowings(target, borrowing_ids, self.borrowings)
+            return
+        linked = []
+        taken = set()
+        for borrowing_id in borrowing_ids:
+            records = self._records.get(borrowing_id)
+            if records is None:
+                borrowing = self.borrowings.get(borrowing_id)
+            elif is_librarian:
+                free = [r for r in records if r.id not in taken]
+                borrowing = next((r for r in free if r.librarian is owner), free[0] if free else None)
+            else:
+                borrowing = next((r for r in records if r.reader is None and r.id not in taken), None)
+            if borrowing is not None and borrowing.id not in taken:
+                taken.add(borrowing.id)
+                linked.append(borrowing)
+        target.extend(linked)
+
+
+class _StringTable:
+    """Таблица уникальных строк снимка"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self._index)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def encode(self) -> Tuple[bytes, bytes]:
+        """Возвращает смещения (на одно больше числа строк) и сами строки в UTF-8"""
+        data = bytearray()
+        offsets = array('Q', [0])
+        for value in self._index:
+            data += value.encode('utf-8')
+            offsets.append(len(data))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        return offsets.tobytes(), bytes(data)
\ No newline at end of file
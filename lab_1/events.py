@@ -0,0 +1,59 @@
+# events.py
+import sys
+from typing import Any, Dict, List, Tuple
+
+# Тексты событий; поля подставляются только когда сообщение действительно нужно
+MESSAGES = {
+    "book_added": "Книга '{book.title}' добавлена",
+    "book_removed": "Книга с ID {id} удалена",
+    "book_borrowed": "Книга '{book.title}' выдана",
+    "book_unavailable": "Книга '{book.title}' недоступна",
+    "book_returned": "Книга '{book.title}' возвращена",
+    "borrowing_created": "Книга '{book.title}' выдана читателю {reader.full_name}",
+    "borrowing_closed": "Книга возвращена",
+    "borrowing_not_found": "Выдача с ID {id} не найдена",
+    "batch_applied": "Пакет применён: операций {count}",
+}
+
+
+def format_event(event: str, fields: Dict[str, Any]) -> str:
+    template = MESSAGES.get(event)
+    return template.format(**fields) if template else f"{event}: {fields}"
+
+
+class PrintSink:
+    """Печатает события в stdout, как раньше делали сами модели"""
+
+    def emit(self, event: str, **fields):
+        print(format_event(event, fields))
+
+
+class NullSink:
+    """Отбрасывает события: для пакетных загрузок, где вывод не нужен"""
+
+    def emit(self, event: str, **fields):
+        pass
+
+
+class BufferedSink:
+    """Копит события в памяти; flush() выводит их одним вызовом записи"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+
+    def emit(self, event: str, **fields):
+        self.events.append((event, fields))
+
+    def messages(self) -> List[str]:
+        return [format_event(event, fields) for event, fields in self.events]
+
+    def flush(self, file=None):
+        if self.events:
+            (file or sys.stdout).write("\n".join(self.messages()) + "\n")
+        self.events.clear()
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+DEFAULT_SINK = PrintSink()
@@ -0,0 +1,205 @@
+# journal.py
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+from datetime import date
+from typing import Any, Dict, Optional
+from models import *
+from data_manager import DataManager
+
+
+class Journal:
+    """Журнал операций: каждая операция дописывается строкой JSON, снимок обновляется периодически.
+
+    В каталоге лежат снимок snapshot.<seq>.bin (формат DataManager.save_to_binary)
+    и journal.log с событиями, у которых номер больше seq снимка. Операция применяется
+    к системе и сразу дописывается в журнал, так что после возврата из метода она
+    переживёт перезапуск, а восстановление проигрывает не больше compact_every событий.
+    """
+
+    SNAPSHOT_PATTERN = re.compile(r"snapshot\.(\d+)\.bin$")
+    JOURNAL_NAME = "journal.log"
+
+    def __init__(self, directory: str, compact_every: int = 10_000, fsync: bool = False):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.system: Optional['LibrarySystem'] = None
+        self._seq = 0
+        self._pending = 0
+        self._file = None
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.directory, self.JOURNAL_NAME)
+
+    # Восстановление
+
+    def load(self, initial: Optional['LibrarySystem'] = None) -> 'LibrarySystem':
+        """Загружает последний снимок и проигрывает журнал поверх него.
+
+        Если каталог ещё пуст, за исходное состояние берётся initial (или пустая система).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.close()
+        snapshot_seq, snapshot_path = self._latest_snapshot()
+        if snapshot_path is not None:
+            system = LibrarySystem()
+            with contextlib.redirect_stdout(io.StringIO()):
+                DataManager.load_from_binary(snapshot_path, system)
+        else:
+            system = initial if initial is not None else LibrarySystem()
+        self.system = system
+        self._seq = snapshot_seq
+        self._pending = 0
+
+        if os.path.exists(self.journal_path):
+            valid_size = 0
+            with open(self.journal_path, 'rb') as f:
+                lines = f.readlines()
+            for number, line in enumerate(lines):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("строка не дописана")
+                    event = json.loads(line)
+                except ValueError:
+                    # Оборванная последняя строка - след сбоя во время записи, её отбрасываем
+                    if number == len(lines) - 1:
+                        break
+                    raise ValueError(f"Журнал повреждён в строке {number + 1}")
+                valid_size += len(line)
+                if event["seq"] <= snapshot_seq:
+                    continue
+                self._apply(event)
+                self._seq = event["seq"]
+                self._pending += 1
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        if snapshot_path is None and initial is not None:
+            self.compact()
+        return system
+
+    def _latest_snapshot(self):
+        best_seq, best_path = 0, None
+        for path in glob.glob(os.path.join(self.directory, "snapshot.*.bin")):
+            match = self.SNAPSHOT_PATTERN.search(path)
+            if match and int(match.group(1)) >= best_seq:
+                best_seq, best_path = int(match.group(1)), path
+        return best_seq, best_path
+
+    # Операции
+
+    def add_book(self, book: 'Book'):
+        self._require_system()
+        if self.system.library.get_book(book.id) is not None:
+            raise ValueError(f"Книга с ID {book.id} уже существует")
+        self.system.library.add_book(book)
+        self._append({"op": "add_book", "book": DataManager._book_to_dict(book)})
+
+    def remove_book(self, id: int):
+        self._require_system()
+        exists = self.system.library.get_book(id) is not None
+        self.system.library.remove_book(id)
+        if exists:
+            self._append({"op": "remove_book", "id": id})
+
+    def borrow_book(self, reader: 'Reader', book: 'Book', librarian: 'Librarian', return_date: date) -> 'Borrowing':
+        self._require_system()
+        if self.system.get_reader(reader.id) is not reader:
+            raise ValueError(f"Читатель с ID {reader.id} не зарегистрирован в системе")
+        borrowing = reader.borrow_book(book, librarian, return_date)
+        self._append({
+            "op": "borrow",
+            "id": borrowing.id,
+            "reader_id": reader.id,
+            "book_id": book.id,
+            "librarian_id": librarian.id,
+            "borrow_date": borrowing.borrow_date.isoformat(),
+            "return_date": borrowing.return_date.isoformat()
+        })
+        return borrowing
+
+    def return_book(self, reader: 'Reader', borrowing_id: int):
+        self._require_system()
+        exists = reader.borrowings.get(borrowing_id) is not None
+        reader.return_book(borrowing_id)
+        if exists:
+            self._append({"op": "return", "reader_id": reader.id, "id": borrowing_id})
+
+    def compact(self):
+        """Сохраняет полный снимок и начинает журнал заново"""
+        self._require_system()
+        final_path = os.path.join(self.directory, f"snapshot.{self._seq:012d}.bin")
+        temp_path = final_path + ".tmp"
+        with contextlib.redirect_stdout(io.StringIO()):
+            DataManager.save_to_binary(self.system, temp_path)
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, final_path)
+
+        # Снимок уже учитывает все события: журнал и старые снимки больше не нужны
+        self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self._pending = 0
+        for path in glob.glob(os.path.join(self.directory, "snapshot.*.bin")):
+            if path != final_path:
+                os.remove(path)
+
+    def _require_system(self):
+        if self.system is None or self._file is None:
+            raise RuntimeError("Журнал не открыт: сначала вызовите load()")
+
+    def _append(self, event: Dict[str, Any]):
+        """Дописывает событие; операция считается сохранённой после возврата"""
+        self._seq += 1
+        event["seq"] = self._seq
+        self._file.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    # Проигрывание событий
+
+    def _apply(self, event: Dict[str, Any]):
+        system = self.system
+        op = event["op"]
+        if op == "add_book":
+            system.library.books.append(DataManager._book_from_dict(event["book"]))
+        elif op == "remove_book":
+            system.library.books.pop(event["id"])
+        elif op == "borrow":
+            reader = system.get_reader(event["reader_id"])
+            borrowing = Borrowing(event["id"],
+                                  date.fromisoformat(event["borrow_date"]),
+                                  date.fromisoformat(event["return_date"]))
+            borrowing.book = system.library.get_book(event["book_id"])
+            borrowing.librarian = system.library.get_librarian(event["librarian_id"])
+            reader.borrowings.append(borrowing)
+            borrowing.librarian.managed_borrowings.append(borrowing)
+            system.borrowings.append(borrowing)
+            if borrowing.book.status == "доступна":
+                borrowing.book.status = "Выдана"
+        elif op == "return":
+            borrowing = system.get_reader(event["reader_id"]).borrowings.pop(event["id"])
+            borrowing.book.status = "доступна"
+        else:
+            raise ValueError(f"Неизвестная операция в журнале: {op}")
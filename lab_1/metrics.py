@@ -0,0 +1,79 @@
+# metrics.py
+import cProfile
+import contextlib
+import json
+import pstats
+import sys
+import time
+from typing import Any, Dict, Optional
+
+# Включённый сборщик; None - замеры выключены и стоят одну проверку на None
+active: Optional['Metrics'] = None
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+class Metrics:
+    """Таймеры фаз и счётчики одного замера"""
+
+    def __init__(self):
+        self.timers: Dict[str, list] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0.0, 0]
+        timer[0] += seconds
+        timer[1] += calls
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "phases": {name: {"seconds": seconds, "calls": calls}
+                       for name, (seconds, calls) in self.timers.items()},
+            "counters": dict(self.counters)
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
+
+
+def phase(name: str):
+    """Контекст-таймер фазы; без включённого сборщика ничего не делает"""
+    return active.phase(name) if active is not None else _NO_PHASE
+
+
+def count(name: str, value: int = 1):
+    if active is not None:
+        active.count(name, value)
+
+
+@contextlib.contextmanager
+def collect():
+    """Включает сбор метрик на время блока: with collect() as m: ...; m.report()"""
+    global active
+    previous, active = active, Metrics()
+    try:
+        yield active
+    finally:
+        active = previous
+
+
+def profile(func, *args, sort: str = "cumulative", limit: int = 25, stream=None, **kwargs):
+    """Выполняет func под cProfile и печатает самые затратные функции"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        pstats.Stats(profiler, stream=stream or sys.stderr).sort_stats(sort).print_stats(limit)
@@ -1,5 +1,376 @@
+import sys
+import threading
+from bisect import bisect_left, insort
 from datetime import datetime, date, timedelta
-from typing import List, Optional
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from search import BookSearchIndex
+from events import DEFAULT_SINK
+
+# Даты выдач сильно повторяются: храним по одному объекту на каждый день
+_dates: Dict[date, date] = {}
+
+
+def intern_date(value: date) -> date:
+    """Возвращает общий экземпляр даты вместо копии"""
+    return _dates.setdefault(value, value)
+
+
+class IndexedCollection:
+    """Упорядоченная коллекция сущностей с индексом по id: поиск и удаление за O(1)"""
+
+    def __init__(self, on_add: Optional[Callable] = None, on_remove: Optional[Callable] = None):
+        self._items: Dict[int, object] = {}
+        self._on_add = on_add
+        self._on_remove = on_remove
+        # Поиск по id - самая частая операция, отдаём метод словаря без обёртки
+        self.get = self._items.get
+
+    def append(self, item):
+        existing = self._items.get(item.id)
+        if existing is item:
+            return
+        if existing is not None:
+            raise ValueError(f"Запись с ID {item.id} уже существует")
+        self._items[item.id] = item
+        if self._on_add:
+            self._on_add(item)
+
+    def extend(self, items):
+        items_by_id = self._items
+        on_add = self._on_add
+        for item in items:
+            existing = items_by_id.get(item.id)
+            if existing is item:
+                continue
+            if existing is not None:
+                raise ValueError(f"Запись с ID {item.id} уже существует")
+            items_by_id[item.id] = item
+            if on_add:
+                on_add(item)
+
+    def pop(self, id: int):
+        item = self._items.pop(id, None)
+        if item is not None and self._on_remove:
+            self._on_remove(item)
+        return item
+
+    def remove(self, item):
+        if self._items.get(item.id) is not item:
+            raise ValueError(f"Запись с ID {item.id} не найдена")
+        self.pop(item.id)
+
+    def clear(self):
+        items = list(self._items.values())
+        self._items.clear()
+        if self._on_remove:
+            for item in items:
+                self._on_remove(item)
+
+    def ids(self):
+        return self._items.keys()
+
+    def __contains__(self, item) -> bool:
+        return self._items.get(item.id) is item
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items.values())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index: int):
+        # Доступ по позиции оставлен для совместимости со списком, он O(n)
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("Индекс вне диапазона")
+        return next(islice(self._items.values(), index, None))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._items.values())!r})"
+
+    def loaded(self):
+        """Уже загруженные элементы; у обычной коллекции это все элементы"""
+        return self._items.values()
+
+
+class LazyCollection(IndexedCollection):
+    """Коллекция, которая загружает элементы через loader() при первом обращении.
+
+    append() не загружает коллекцию: новые элементы ждут загрузки и встают
+    после загруженных. get() без загрузки поднимает один элемент через
+    fetch(id), если он задан.
+    """
+
+    def __init__(self, loader: Callable, on_add: Optional[Callable] = None, on_remove: Optional[Callable] = None,
+                 fetch: Optional[Callable] = None):
+        super().__init__(on_add, on_remove)
+        self._loader = loader
+        self._fetch = fetch
+        self.get = self._lazy_get
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loader is None
+
+    def _hydrate(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            self.get = self._items.get
+            # Добавленные и поднятые по одному элементы уже прошли on_add
+            known = dict(self._items)
+            self._items.clear()
+            for item in loader():
+                if known.get(item.id) is item:
+                    self._items[item.id] = known.pop(item.id)
+                else:
+                    IndexedCollection.append(self, item)
+            # Дубликаты среди незагруженных элементов видны только здесь
+            for id, item in known.items():
+                if id in self._items:
+                    raise ValueError(f"Запись с ID {id} уже существует")
+                self._items[id] = item
+
+    def _lazy_get(self, id: int):
+        item = self._items.get(id)
+        if item is not None or self._loader is None:
+            return item
+        if self._fetch is None:
+            self._hydrate()
+            return self._items.get(id)
+        item = self._fetch(id)
+        if item is not None:
+            IndexedCollection.append(self, item)
+        return item
+
+    def extend(self, items):
+        self._hydrate()
+        super().extend(items)
+
+    def pop(self, id: int):
+        self._hydrate()
+        return super().pop(id)
+
+    def remove(self, item):
+        self._hydrate()
+        super().remove(item)
+
+    def clear(self):
+        # Незагруженные элементы просто забываются
+        self._loader = None
+        self.get = self._items.get
+        super().clear()
+
+    def ids(self):
+        self._hydrate()
+        return super().ids()
+
+    def __contains__(self, item) -> bool:
+        # Через get: с fetch проверка не загружает коллекцию
+        return self.get(item.id) is item
+
+    def __iter__(self) -> Iterator:
+        self._hydrate()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self._hydrate()
+        return super().__len__()
+
+    def __getitem__(self, index: int):
+        self._hydrate()
+        return super().__getitem__(index)
+
+    def __repr__(self) -> str:
+        if self._loader is not None:
+            return f"{type(self).__name__}(<не загружена>)"
+        return super().__repr__()
+
+
+class IdAllocator:
+    """Потокобезопасный счётчик id: выданный allocate() номер не достанется никому другому"""
+
+    def __init__(self, last: int = 0):
+        self._lock = threading.Lock()
+        self.last = last
+
+    def allocate(self) -> int:
+        with self._lock:
+            self.last += 1
+            return self.last
+
+    def observe(self, id: int):
+        """Учитывает id, пришедший извне (загрузка, журнал), чтобы не выдать его повторно"""
+        with self._lock:
+            if id > self.last:
+                self.last = id
+
+
+class _NoChanges:
+    """Пустое множество, которое ничего не запоминает: отметки, которые пока никому не нужны"""
+    __slots__ = ()
+
+    def add(self, id: int):
+        pass
+
+    def clear(self):
+        pass
+
+    def __iter__(self) -> Iterator:
+        return iter(())
+
+    def __len__(self) -> int:
+        return 0
+
+
+_NO_CHANGES = _NoChanges()
+
+
+class ChangeTracker:
+    """Id записей, изменённых (добавленных, удалённых) с последнего сохранения.
+
+    Книги, читатели, библиотекари и выдачи отмечаются сами при изменении
+    коллекций и статусов. Прямую правку полей (book.title = ...) нужно отметить
+    через mark(). baseline - хранилище, относительно которого копятся изменения;
+    пока его нет (система не сохранялась в ShardedStorage), отметки не хранятся.
+    """
+    __slots__ = ("books", "librarians", "readers", "borrowings", "baseline")
+
+    KINDS = ("books", "librarians", "readers", "borrowings")
+
+    def __init__(self):
+        self.clear()
+
+    def mark(self, kind: str, id: int):
+        getattr(self, kind).add(id)
+
+    def clear(self, baseline=None):
+        for kind in self.KINDS:
+            setattr(self, kind, set() if baseline is not None else _NO_CHANGES)
+        self.baseline = baseline
+
+    def __len__(self) -> int:
+        return sum(len(getattr(self, kind)) for kind in self.KINDS)
+
+
+class _Marks(dict):
+    """Отмеченные сущности по id; повторная отметка заменяет прежнюю"""
+    __slots__ = ()
+
+    def add(self, item):
+        self[item.id] = item
+
+
+class CirculationLog:
+    """Изменения выдач и каталога для CirculationStats.refresh.
+
+    borrowings - выдачи, добавленные в system.borrowings; readers - выдачи,
+    попавшие в списки читателей или ушедшие из них (выдача, возврат); books -
+    добавленные и удалённые книги. Если из system.borrowings что-то удалялось,
+    ставится removed, и статистика строится заново. Отметки хранятся, только
+    пока за системой следит статистика (follower - слабая ссылка на неё).
+    """
+    __slots__ = ("borrowings", "readers", "books", "removed", "follower")
+
+    KINDS = ("borrowings", "readers", "books")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self, follower=None):
+        for kind in self.KINDS:
+            setattr(self, kind, _Marks() if follower is not None else _NO_CHANGES)
+        self.removed = False
+        self.follower = follower
+
+    def release(self, follower):
+        """Обратный вызов слабой ссылки: статистика удалена, отметки больше не нужны"""
+        if self.follower is follower:
+            self.clear()
+
+
+class MultiIndex:
+    """Вторичный индекс: значение ключа -> сущности с этим ключом"""
+
+    def __init__(self, key: Callable):
+        self._key = key
+        self._buckets: Dict[object, Dict[int, object]] = {}
+
+    def add(self, item, key=None):
+        key = self._key(item) if key is None else key
+        self._buckets.setdefault(key, {})[item.id] = item
+
+    def discard(self, item, key=None):
+        key = self._key(item) if key is None else key
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(item.id, None)
+            if not bucket:
+                del self._buckets[key]
+
+    def move(self, item, old_key, new_key):
+        self.discard(item, old_key)
+        self.add(item, new_key)
+
+    def get(self, key) -> List:
+        return list(self._buckets.get(key, {}).values())
+
+    def keys(self):
+        return self._buckets.keys()
+
+
+class DueDateIndex:
+    """Активные выдачи, упорядоченные по дате возврата.
+
+    Выдачи сгруппированы по дню возврата, сами дни хранятся отсортированным
+    списком: добавление и удаление O(1), запрос по диапазону - O(log дней + k).
+    Если return_date выдачи меняется, её нужно удалить из индекса и добавить снова.
+    """
+
+    def __init__(self):
+        self._by_day: Dict[date, Dict[int, 'Borrowing']] = {}
+        self._days: List[date] = []
+
+    def add(self, borrowing: 'Borrowing'):
+        bucket = self._by_day.get(borrowing.return_date)
+        if bucket is None:
+            bucket = self._by_day[borrowing.return_date] = {}
+            insort(self._days, borrowing.return_date)
+        bucket[borrowing.id] = borrowing
+
+    def discard(self, borrowing: 'Borrowing'):
+        bucket = self._by_day.get(borrowing.return_date)
+        if bucket is not None and bucket.get(borrowing.id) is borrowing:
+            del bucket[borrowing.id]
+            if not bucket:
+                del self._by_day[borrowing.return_date]
+                del self._days[bisect_left(self._days, borrowing.return_date)]
+
+    def range(self, start: Optional[date], end: Optional[date]) -> Iterator['Borrowing']:
+        """Выдачи со сроком возврата в [start, end), в порядке срока"""
+        first = bisect_left(self._days, start) if start is not None else 0
+        last = bisect_left(self._days, end) if end is not None else len(self._days)
+        for day in self._days[first:last]:
+            yield from self._by_day[day].values()
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._by_day.values())
+
+
+class OverdueCursor:
+    """Перебирает выдачи, ставшие просроченными с прошлого вызова poll()"""
+
+    def __init__(self, index: DueDateIndex, last_run: Optional[date] = None):
+        self._index = index
+        self.last_run = last_run
+
+    def poll(self, today: Optional[date] = None) -> List['Borrowing']:
+        # Просрочена выдача со сроком раньше today; прошлый запуск уже вернул всё раньше last_run
+        today = today or date.today()
+        borrowings = list(self._index.range(self.last_run, today))
+        self.last_run = today
+        return borrowings
 
 
 class Library:
@@ -7,42 +378,111 @@ class Library:
         self.id = id
         self.name = name
         self.address = address
-        self.books: List[Book] = []
-        self.librarians: List[Librarian] = []
+        self._books_by_author = MultiIndex(lambda b: b.author)
+        self._books_by_status = MultiIndex(lambda b: b.status)
+        self.search = BookSearchIndex()
+        # Получатель событий (PrintSink, NullSink, BufferedSink или свой объект с emit)
+        self.events = DEFAULT_SINK
+        self.changes = ChangeTracker()
+        self.circulation = CirculationLog()
+        self.books = IndexedCollection(self._index_book, self._unindex_book)
+        self.librarians = IndexedCollection(self._attach_librarian, self._detach_librarian)
+
+    def _index_book(self, book: 'Book'):
+        book._library = self
+        self.changes.books.add(book.id)
+        self.circulation.books.add(book)
+        self._books_by_author.add(book)
+        self._books_by_status.add(book)
+        self.search.add(book)
+
+    def _unindex_book(self, book: 'Book'):
+        self._books_by_author.discard(book)
+        self._books_by_status.discard(book)
+        self.search.remove(book)
+        self.changes.books.add(book.id)
+        self.circulation.books.add(book)
+        book._library = None
+
+    def _attach_librarian(self, librarian: 'Librarian'):
+        librarian._library = self
+        self.changes.librarians.add(librarian.id)
+
+    def _detach_librarian(self, librarian: 'Librarian'):
+        self.changes.librarians.add(librarian.id)
+        librarian._library = None
 
     def add_book(self, book: 'Book'):
         self.books.append(book)
-        print(f"Книга '{book.title}' добавлена")
+        self.events.emit("book_added", book=book)
 
     def remove_book(self, id: int):
-        self.books = [b for b in self.books if b.id != id]
-        print(f"Книга с ID {id} удалена")
+        self.books.pop(id)
+        self.events.emit("book_removed", id=id)
+
+    def get_book(self, id: int) -> Optional['Book']:
+        return self.books.get(id)
+
+    def get_librarian(self, id: int) -> Optional['Librarian']:
+        return self.librarians.get(id)
+
+    def find_books_by_author(self, author: str) -> List['Book']:
+        return self._books_by_author.get(author)
+
+    def find_books_by_status(self, status: str) -> List['Book']:
+        return self._books_by_status.get(status)
+
+    def search_books(self, query: str) -> List['Book']:
+        """Книги, в названии или авторе которых есть все слова запроса («булг*» - префикс)"""
+        return [self.books.get(id) for id in sorted(self.search.search_ids(query))]
 
 
 class Book:
+    __slots__ = ("id", "title", "author", "year", "_library", "_status")
+
     def __init__(self, id: int, title: str, author: str, year: int):
         self.id = id
         self.title = title
         self.author = author
         self.year = year
-        self.status = "доступна"
+        self._library: Optional[Library] = None
+        self._status = "доступна"
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @status.setter
+    def status(self, value: str):
+        value = sys.intern(value)
+        # Книга в библиотеке переносится в индексе статусов вместе с изменением
+        if self._library is not None and value != self._status:
+            self._library._books_by_status.move(self, self._status, value)
+            self._library.changes.books.add(self.id)
+        self._status = value
+
+    @property
+    def events(self):
+        return self._library.events if self._library is not None else DEFAULT_SINK
 
     def borrow(self):
         if self.status == "доступна":
             self.status = "Выдана"
-            print(f"Книга '{self.title}' выдана")
+            self.events.emit("book_borrowed", book=self)
         else:
-            print(f"Книга '{self.title}' недоступна")
+            self.events.emit("book_unavailable", book=self)
 
     def return_book(self):
         self.status = "доступна"
-        print(f"Книга '{self.title}' возвращена")
+        self.events.emit("book_returned", book=self)
 
     def get_info(self) -> str:
         return f"Книга ID: {self.id}, Название: '{self.title}', Автор: {self.author}, Статус: {self.status}"
 
 
 class FictionBook(Book):
+    __slots__ = ("genre",)
+
     def __init__(self, id: int, title: str, author: str, year: int, genre: str):
         if year <= 0:
             raise ValueError("Год издания должен быть положительным")
@@ -51,6 +491,8 @@ class FictionBook(Book):
 
 
 class ScientificBook(Book):
+    __slots__ = ("field",)
+
     def __init__(self, id: int, title: str, author: str, year: int, field: str):
         if year <= 0:
             raise ValueError("Год издания должен быть положительным")
@@ -59,6 +501,8 @@ class ScientificBook(Book):
 
 
 class Textbook(Book):
+    __slots__ = ("subject",)
+
     def __init__(self, id: int, title: str, author: str, year: int, subject: str):
         if year <= 0:
             raise ValueError("Год издания должен быть положительным")
@@ -67,48 +511,98 @@ class Textbook(Book):
 
 
 class Librarian:
+    __slots__ = ("id", "name", "employee_id", "_library", "managed_borrowings")
+
     def __init__(self, id: int, name: str, employee_id: str):
         self.id = id
         self.name = name
         self.employee_id = employee_id
-        self.managed_borrowings: List[Borrowing] = []
+        self._library: Optional[Library] = None
+        self.managed_borrowings = IndexedCollection(self._link_changed, self._link_changed)
+
+    def _link_changed(self, borrowing: 'Borrowing'):
+        # Связь с библиотекарем хранится в записи выдачи
+        if self._library is not None:
+            self._library.changes.borrowings.add(borrowing.id)
 
 
 class Reader:
+    __slots__ = ("id", "full_name", "phone", "_system", "_last_borrowing_id", "borrowings")
+
     def __init__(self, id: int, full_name: str, phone: str):
         self.id = id
         self.full_name = full_name
         self.phone = phone
-        self.borrowings: List[Borrowing] = []
+        self._system: Optional['LibrarySystem'] = None
+        self._last_borrowing_id = 0
+        self.borrowings = IndexedCollection(self._attach_borrowing, self._detach_borrowing)
+
+    def _attach_borrowing(self, borrowing: 'Borrowing'):
+        borrowing.reader = self
+        self._last_borrowing_id = max(self._last_borrowing_id, borrowing.id)
+        if self._system is not None:
+            self._system.due.add(borrowing)
+            self._system.changes.borrowings.add(borrowing.id)
+            self._system.circulation.readers.add(borrowing)
+
+    def _detach_borrowing(self, borrowing: 'Borrowing'):
+        if self._system is not None:
+            self._system.due.discard(borrowing)
+            self._system.changes.borrowings.add(borrowing.id)
+            self._system.circulation.readers.add(borrowing)
+
+    @property
+    def events(self):
+        return self._system.events if self._system is not None else DEFAULT_SINK
+
+    def _next_borrowing_id(self) -> int:
+        # Внутри системы id уникальны глобально, у отдельного читателя - локально
+        if self._system is not None:
+            return self._system._next_borrowing_id()
+        return self._last_borrowing_id + 1
 
     def borrow_book(self, book: Book, librarian: Librarian, return_date: date) -> 'Выдача ':
-        borrowing = Borrowing(len(self.borrowings) + 1, date.today(), return_date)
+        borrowing = Borrowing(self._next_borrowing_id(), date.today(), return_date)
         borrowing.book = book
         borrowing.librarian = librarian
         self.borrowings.append(borrowing)
         librarian.managed_borrowings.append(borrowing)
+        if self._system is not None:
+            self._system.borrowings.append(borrowing)
         book.borrow()
-        print(f"Книга '{book.title}' выдана читателю {self.full_name}")
+        self.events.emit("borrowing_created", book=book, reader=self)
         return borrowing
 
     def return_book(self, borrowing_id: int):
-        for borrowing in self.borrowings:
-            if borrowing.id == borrowing_id:
-                borrowing.book.return_book()
-                self.borrowings.remove(borrowing)
-                print(f"Книга возвращена")
-                return
-        print(f"Выдача с ID {borrowing_id} не найдена")
+        borrowing = self.borrowings.pop(borrowing_id)
+        if borrowing is None:
+            self.events.emit("borrowing_not_found", id=borrowing_id)
+            return
+        # Загрузчики допускают выдачу без книги (нет book_id)
+        if borrowing.book is not None:
+            borrowing.book.return_book()
+        self.events.emit("borrowing_closed", borrowing=borrowing)
 
 
 class Borrowing:
+    __slots__ = ("id", "borrow_date", "return_date", "_status", "book", "librarian", "reader")
+
     def __init__(self, id: int, borrow_date: date, return_date: date):
         self.id = id
-        self.borrow_date = borrow_date
-        self.return_date = return_date
+        self.borrow_date = intern_date(borrow_date)
+        self.return_date = intern_date(return_date)
         self.status = "доступна"
         self.book: Optional[Book] = None
         self.librarian: Optional[Librarian] = None
+        self.reader: Optional[Reader] = None
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @status.setter
+    def status(self, value: str):
+        self._status = sys.intern(value)
 
     def get_info(self) -> str:
         book_title = self.book.title if self.book else "Не назначена"
@@ -116,8 +610,213 @@ class Borrowing:
         return f"Выдача ID: {self.id}, Книга: '{book_title}', Библиотекарь: {librarian_name}, Статус: {self.status}"
 
 
+class AddBook:
+    """Операция пакета: добавить книгу"""
+    __slots__ = ("book",)
+
+    def __init__(self, book: Book):
+        self.book = book
+
+
+class RemoveBook:
+    """Операция пакета: удалить книгу"""
+    __slots__ = ("book_id",)
+
+    def __init__(self, book_id: int):
+        self.book_id = book_id
+
+
+class BorrowBook:
+    """Операция пакета: выдать книгу читателю"""
+    __slots__ = ("reader_id", "book_id", "librarian_id", "return_date")
+
+    def __init__(self, reader_id: int, book_id: int, librarian_id: int, return_date: date):
+        self.reader_id = reader_id
+        self.book_id = book_id
+        self.librarian_id = librarian_id
+        self.return_date = return_date
+
+
+class ReturnBook:
+    """Операция пакета: вернуть выдачу читателя"""
+    __slots__ = ("reader_id", "borrowing_id")
+
+    def __init__(self, reader_id: int, borrowing_id: int):
+        self.reader_id = reader_id
+        self.borrowing_id = borrowing_id
+
+
+class BatchError(ValueError):
+    """Пакет не прошёл проверку; errors - список (номер операции, сообщение)"""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        details = "; ".join(f"#{index}: {message}" for index, message in errors[:5])
+        more = f" и ещё {len(errors) - 5}" if len(errors) > 5 else ""
+        super().__init__(f"Пакет отклонён, ошибок {len(errors)}: {details}{more}")
+
+
 class LibrarySystem:
     def __init__(self):
         self.library = Library(1, "Центральная библиотека", "ул. Книжная, 1")
-        self.readers: List[Reader] = []
-        self.borrowings: List[Borrowing] = []
\ No newline at end of file
+        self.borrowing_ids = IdAllocator()
+        # Активные выдачи всех читателей по сроку возврата
+        self.due = DueDateIndex()
+        self.readers = IndexedCollection(self._attach_reader, self._detach_reader)
+        self.borrowings = IndexedCollection(self._track_borrowing_id, self._untrack_borrowing)
+
+    @property
+    def events(self):
+        return self.library.events
+
+    @events.setter
+    def events(self, sink):
+        self.library.events = sink
+
+    @property
+    def changes(self) -> ChangeTracker:
+        return self.library.changes
+
+    @property
+    def circulation(self) -> CirculationLog:
+        return self.library.circulation
+
+    def _attach_reader(self, reader: Reader):
+        # Ленивые выдачи попадут в индекс сроков при загрузке через _attach_borrowing
+        reader._system = self
+        self.changes.readers.add(reader.id)
+        for borrowing in reader.borrowings.loaded():
+            self.due.add(borrowing)
+            self.changes.borrowings.add(borrowing.id)
+            self.circulation.readers.add(borrowing)
+
+    def _detach_reader(self, reader: Reader):
+        self.changes.readers.add(reader.id)
+        for borrowing in reader.borrowings.loaded():
+            self.due.discard(borrowing)
+            self.changes.borrowings.add(borrowing.id)
+            self.circulation.readers.add(borrowing)
+        reader._system = None
+
+    def _track_borrowing_id(self, borrowing: Borrowing):
+        self.borrowing_ids.observe(borrowing.id)
+        self.changes.borrowings.add(borrowing.id)
+        self.circulation.borrowings.add(borrowing)
+
+    def _untrack_borrowing(self, borrowing: Borrowing):
+        self.changes.borrowings.add(borrowing.id)
+        self.circulation.removed = True
+
+    def _next_borrowing_id(self) -> int:
+        return self.borrowing_ids.allocate()
+
+    def get_reader(self, id: int) -> Optional[Reader]:
+        return self.readers.get(id)
+
+    def get_borrowing(self, id: int) -> Optional[Borrowing]:
+        return self.borrowings.get(id)
+
+    def find_borrowings_by_reader(self, reader_id: int) -> List[Borrowing]:
+        reader = self.readers.get(reader_id)
+        return list(reader.borrowings) if reader else []
+
+    def overdue(self, as_of: Optional[date] = None) -> List[Borrowing]:
+        """Активные выдачи со сроком возврата раньше as_of (по умолчанию сегодня).
+
+        Учитываются выдачи в индексе сроков; у системы из SQLite туда попадают
+        только загруженные списки читателей - по всей базе ищет SqliteStorage.overdue.
+        """
+        return list(self.due.range(None, as_of or date.today()))
+
+    def due_within(self, days: int, today: Optional[date] = None) -> List[Borrowing]:
+        """Активные выдачи, которые нужно вернуть в ближайшие days дней включительно"""
+        today = today or date.today()
+        return list(self.due.range(today, today + timedelta(days=days + 1)))
+
+    def overdue_cursor(self, last_run: Optional[date] = None) -> OverdueCursor:
+        return OverdueCursor(self.due, last_run)
+
+    def apply_batch(self, operations: Iterable) -> list:
+        """Применяет пакет AddBook/RemoveBook/BorrowBook/ReturnBook.
+
+        Весь пакет сначала проверяется с учётом предыдущих операций пакета; при
+        ошибках BatchError, и система не меняется. Возвращает результат каждой
+        операции: книгу, удалённую книгу или выдачу.
+        """
+        operations = list(operations)
+        errors = self._validate_batch(operations)
+        if errors:
+            raise BatchError(errors)
+
+        library = self.library
+        results = []
+        for operation in operations:
+            if type(operation) is BorrowBook:
+                reader = self.readers.get(operation.reader_id)
+                results.append(reader.borrow_book(library.books.get(operation.book_id),
+                                                  library.librarians.get(operation.librarian_id),
+                                                  operation.return_date))
+            elif type(operation) is ReturnBook:
+                reader = self.readers.get(operation.reader_id)
+                borrowing = reader.borrowings.get(operation.borrowing_id)
+                reader.return_book(operation.borrowing_id)
+                results.append(borrowing)
+            elif type(operation) is AddBook:
+                library.add_book(operation.book)
+                results.append(operation.book)
+            else:
+                book = library.books.get(operation.book_id)
+                library.remove_book(operation.book_id)
+                results.append(book)
+        self.events.emit("batch_applied", count=len(operations))
+        return results
+
+    def _validate_batch(self, operations: List) -> List[Tuple[int, str]]:
+        library = self.library
+        errors: List[Tuple[int, str]] = []
+        # Статусы книг с учётом уже проверенных операций пакета (None - книги нет)
+        statuses: Dict[int, Optional[str]] = {}
+        returned = set()
+
+        def status_of(book_id: int) -> Optional[str]:
+            if book_id in statuses:
+                return statuses[book_id]
+            book = library.books.get(book_id)
+            return book.status if book is not None else None
+
+        for index, operation in enumerate(operations):
+            kind = type(operation)
+            if kind is BorrowBook:
+                if self.readers.get(operation.reader_id) is None:
+                    errors.append((index, f"Читатель с ID {operation.reader_id} не найден"))
+                elif library.librarians.get(operation.librarian_id) is None:
+                    errors.append((index, f"Библиотекарь с ID {operation.librarian_id} не найден"))
+                elif status_of(operation.book_id) is None:
+                    errors.append((index, f"Книга с ID {operation.book_id} не найдена"))
+                elif status_of(operation.book_id) != "доступна":
+                    errors.append((index, f"Книга с ID {operation.book_id} недоступна"))
+                else:
+                    statuses[operation.book_id] = "Выдана"
+            elif kind is ReturnBook:
+                reader = self.readers.get(operation.reader_id)
+                borrowing = reader.borrowings.get(operation.borrowing_id) if reader is not None else None
+                key = (operation.reader_id, operation.borrowing_id)
+                if borrowing is None or key in returned:
+                    errors.append((index, f"Выдача с ID {operation.borrowing_id} не найдена"))
+                else:
+                    returned.add(key)
+                    if borrowing.book is not None and status_of(borrowing.book.id) is not None:
+                        statuses[borrowing.book.id] = "доступна"
+            elif kind is AddBook:
+                if status_of(operation.book.id) is not None:
+                    errors.append((index, f"Книга с ID {operation.book.id} уже существует"))
+                else:
+                    statuses[operation.book.id] = operation.book.status
+            elif kind is RemoveBook:
+                if status_of(operation.book_id) is None:
+                    errors.append((index, f"Книга с ID {operation.book_id} не найдена"))
+                else:
+                    statuses[operation.book_id] = None
+            else:
+                errors.append((index, f"Неизвестная операция: {operation!r}"))
+        return errors
@@ -0,0 +1,276 @@
+# parallel_load.py
+import json
+import mmap
+import os
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import metrics
+from models import *
+from data_manager import DataManager, _LoadedBorrowings
+
+# Файлы меньше одного раздела загружаются обычным загрузчиком: запуск процессов дороже разбора
+PARTITION_SIZE = 4 << 20
+# Виды сущностей в порядке построения объектов: выдачи ссылаются на книги и библиотекарей,
+# списки выдач читателей и библиотекарей связываются после всех выдач
+KINDS = ("books", "librarians", "borrowings", "readers")
+# Отрезков в работе на один процесс: пул не простаивает, пока строятся объекты,
+# а разобранные, но ещё не использованные записи не копятся в памяти
+IN_FLIGHT_PER_WORKER = 2
+
+# Разметка save_to_json (json.dump с indent=2): отступ ключа каждого массива сущностей.
+# Внутри строк JSON перевод строки экранируется, поэтому "\n" с отступом встречается только в разметке
+_JSON_PREFIX = b'{\n  "library": {\n'
+_JSON_INDENT = {"books": b"    ", "librarians": b"    ", "readers": b"  ", "borrowings": b"  "}
+# Разметка save_to_xml: '<' внутри значений атрибутов и текста экранируется
+_XML_PREFIX = b"<?xml version='1.0' encoding='utf-8'?>\n<library_system>"
+_XML_ORDER = ("books", "librarians", "readers", "borrowings")
+
+Sections = Dict[str, Tuple[int, int, bytes]]
+
+
+def _at(data, position: int, token: bytes) -> bool:
+    """data[position:] начинается с token (у mmap нет startswith)"""
+    return data[position:position + len(token)] == token
+
+
+def _json_layout(data) -> Optional[Tuple[Dict[str, Any], Sections]]:
+    """Находит массивы сущностей: ({id, name, address}, {вид: (начало, конец, начало записи)})"""
+    if not _at(data, 0, _JSON_PREFIX):
+        return None
+    sections: Sections = {}
+    header_end = len(data)
+    for kind, indent in _JSON_INDENT.items():
+        key = b"\n" + indent + b'"' + kind.encode() + b'": ['
+        start = data.find(key)
+        if start < 0:
+            return None
+        header_end = min(header_end, start)
+        start += len(key)
+        if _at(data, start, b"]"):
+            sections[kind] = (start, start, b"")
+            continue
+        end = data.find(b"\n" + indent + b"]", start)
+        if end < 0:
+            return None
+        sections[kind] = (start, end, b"\n" + indent + b"  {")
+
+    # До первого массива идут поля библиотеки; достраиваем их до объекта
+    try:
+        library = json.loads(data[:header_end].rstrip().rstrip(b",") + b"}}")["library"]
+        header = {key: library[key] for key in ("id", "name", "address")}
+    except (ValueError, KeyError, TypeError):
+        return None
+    return header, sections
+
+
+def _xml_layout(data) -> Optional[Tuple[Dict[str, Any], Sections]]:
+    if not _at(data, 0, _XML_PREFIX):
+        return None
+    start = len(_XML_PREFIX)
+    end = data.find(b">", start)
+    if not _at(data, start, b"<library ") or end < 0:
+        return None
+    try:
+        header = ET.fromstring(data[start:end + 1] + b"</library>").attrib
+        header = {"id": int(header["id"]), "name": header["name"], "address": header["address"]}
+    except (ET.ParseError, ValueError, KeyError):
+        return None
+
+    sections: Sections = {}
+    position = end
+    for kind in _XML_ORDER:
+        tag = kind.encode()
+        # Поиск с конца предыдущего контейнера: <borrowings> читателей остаются позади
+        start = data.find(b"<" + tag, position)
+        if start < 0:
+            return None
+        if _at(data, start, b"<" + tag + b" />"):
+            sections[kind] = (start, start, b"")
+            position = start
+            continue
+        if not _at(data, start, b"<" + tag + b">"):
+            return None
+        start += len(tag) + 2
+        position = data.find(b"</" + tag + b">", start)
+        if position < 0:
+            return None
+        sections[kind] = (start, position, b"<" + tag[:-1] + b" ")
+    return header, sections
+
+
+_LAYOUTS = {"json": _json_layout, "xml": _xml_layout}
+_SERIAL = {"json": DataManager.load_from_json, "xml": DataManager.load_from_xml}
+
+
+def _partitions(data, start: int, end: int, marker: bytes, size: int) -> List[Tuple[int, int]]:
+    """Делит [start, end) на отрезки около size байт по границам записей"""
+    parts = []
+    while start < end:
+        cut = data.find(marker, start + size, end) if start + size < end else -1
+        if cut < 0:
+            cut = end
+        parts.append((start, cut))
+        start = cut
+    return parts
+
+
+def _ordinal(value: str) -> int:
+    return date.fromisoformat(value).toordinal()
+
+
+def _decode_json(kind: str, chunk: bytes) -> List[tuple]:
+    records = json.loads(b"[" + chunk.rstrip().rstrip(b",") + b"]")
+    if kind == "books":
+        return [(r["id"], r["title"], r["author"], r["year"], r["status"]) for r in records]
+    if kind == "librarians":
+        return [(r["id"], r["name"], r["employee_id"], r["managed_borrowings"]) for r in records]
+    if kind == "readers":
+        return [(r["id"], r["full_name"], r["phone"], r["borrowings"]) for r in records]
+    return [(r["id"], _ordinal(r["borrow_date"]), _ordinal(r["return_date"]), r["status"],
+             r.get("book_id"), r.get("librarian_id")) for r in records]
+
+
+def _optional_id(elem: ET.Element, tag: str) -> Optional[int]:
+    value = elem.findtext(tag)
+    return int(value) if value is not None else None
+
+
+def _decode_xml(kind: str, chunk: bytes) -> List[tuple]:
+    elems = ET.fromstring(b"<partition>" + chunk + b"</partition>")
+    ids = DataManager._borrowing_ids_from_xml
+    if kind == "books":
+        return [(int(e.get("id")), e.get("title"), e.get("author"), int(e.get("year")), e.get("status"))
+                for e in elems]
+    if kind == "librarians":
+        return [(int(e.get("id")), e.get("name"), e.get("employee_id"), ids(e.find("managed_borrowings")))
+                for e in elems]
+    if kind == "readers":
+        return [(int(e.get("id")), e.get("full_name"), e.get("phone"), ids(e.find("borrowings")))
+                for e in elems]
+    return [(int(e.get("id")), _ordinal(e.get("borrow_date")), _ordinal(e.get("return_date")), e.get("status"),
+             _optional_id(e, "book_id"), _optional_id(e, "librarian_id")) for e in elems]
+
+
+def _decode_partition(filename: str, fmt: str, kind: str, start: int, end: int) -> List[tuple]:
+    """Выполняется в рабочем процессе: читает отрезок файла и возвращает записи кортежами.
+
+    Даты передаются номерами дней: кортежи чисел и строк сериализуются
+    между процессами быстрее объектов.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+    return _decode_json(kind, chunk) if fmt == "json" else _decode_xml(kind, chunk)
+
+
+def _load(filename: str, system: 'LibrarySystem', fmt: str, workers: Optional[int], partition_size: int):
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        layout = None
+        if size >= partition_size and size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                layout = _LAYOUTS[fmt](data)
+                if layout is not None:
+                    header, sections = layout
+                    tasks = {kind: _partitions(data, *sections[kind], partition_size) for kind in KINDS}
+    if layout is None:
+        # Небольшой файл или разметка не как у save_to_json/save_to_xml: обычная загрузка
+        _SERIAL[fmt](filename, system)
+        return
+    metrics.count("bytes_read", size)
+    metrics.count("partitions", sum(len(parts) for parts in tasks.values()))
+
+    jobs = iter([(kind, start, end) for kind in KINDS for start, end in tasks[kind]])
+    in_flight = IN_FLIGHT_PER_WORKER * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Отрезки отдаются пулу скользящим окном; объекты строятся в порядке файла по мере готовности.
+        # Future выходит из очереди вместе с result(), поэтому готовые результаты не удерживаются
+        pending: deque = deque()
+
+        def submit():
+            while len(pending) < in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    return
+                pending.append(executor.submit(_decode_partition, filename, fmt, *job))
+
+        def records(kind: str):
+            for _ in tasks[kind]:
+                rows = pending.popleft().result()
+                submit()
+                yield from rows
+
+        submit()
+        DataManager._clear(system)
+        library = system.library
+        library.id, library.name, library.address = header["id"], header["name"], header["address"]
+
+        with metrics.phase("books"):
+            add_book = library.books.append
+            for book_id, title, author, year, status in records("books"):
+                book = Book(book_id, title, author, year)
+                book.status = status
+                add_book(book)
+
+        with metrics.phase("librarians"):
+            managed: List[Tuple[int, List[int]]] = []
+            for librarian_id, name, employee_id, borrowing_ids in records("librarians"):
+                library.librarians.append(Librarian(librarian_id, name, employee_id))
+                managed.append((librarian_id, borrowing_ids))
+
+        with metrics.phase("borrowings"):
+            get_book = library.books.get
+            get_librarian = library.librarians.get
+            borrowings = _LoadedBorrowings(system.borrowings)
+            add_borrowing = borrowings.append
+            dates: Dict[int, date] = {}
+            for borrowing_id, borrow_day, return_day, status, book_id, librarian_id in records("borrowings"):
+                borrow_date = dates.get(borrow_day)
+                if borrow_date is None:
+                    borrow_date = dates[borrow_day] = date.fromordinal(borrow_day)
+                return_date = dates.get(return_day)
+                if return_date is None:
+                    return_date = dates[return_day] = date.fromordinal(return_day)
+                borrowing = Borrowing(borrowing_id, borrow_date, return_date)
+                borrowing.status = status
+                if book_id is not None:
+                    borrowing.book = get_book(book_id)
+                if librarian_id is not None:
+                    borrowing.librarian = get_librarian(librarian_id)
+                add_borrowing(borrowing)
+            borrowings.finish()
+
+        # Единственный проход связывания: id выдач разрешаются через индекс system.borrowings
+        with metrics.phase("links"):
+            for librarian_id, borrowing_ids in managed:
+                borrowings.link(get_librarian(librarian_id), borrowing_ids)
+
+        with metrics.phase("readers"):
+            for reader_id, full_name, phone, borrowing_ids in records("readers"):
+                reader = Reader(reader_id, full_name, phone)
+                borrowings.link(reader, borrowing_ids)
+                system.readers.append(reader)
+
+    DataManager._finish_load(system)
+    print(f"Данные загружены из {filename}")
+
+
+def load_from_json(filename: str, system: 'LibrarySystem', workers: Optional[int] = None,
+                   partition_size: int = PARTITION_SIZE):
+    """Загружает файл DataManager.save_to_json, разбирая его в нескольких процессах.
+
+    Массивы книг, библиотекарей, читателей и выдач делятся по границам записей
+    на отрезки около partition_size байт; рабочие процессы разбирают JSON и
+    даты, а объекты и ссылки между ними строятся в текущем процессе. Результат
+    совпадает с DataManager.load_from_json.
+    """
+    _load(filename, system, "json", workers, partition_size)
+
+
+def load_from_xml(filename: str, system: 'LibrarySystem', workers: Optional[int] = None,
+                  partition_size: int = PARTITION_SIZE):
+    """Загружает файл DataManager.save_to_xml по отрезкам в нескольких процессах, как load_from_json"""
+    _load(filename, system, "xml", workers, partition_size)
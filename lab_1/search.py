@@ -0,0 +1,134 @@
+# search.py
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Set
+
+TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Приводит текст к виду для поиска: NFKC, без регистра, «ё» как «е»"""
+    return unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(normalize(text))
+
+
+class BookSearchIndex:
+    """Инвертированный индекс по названию и автору книги.
+
+    Термин -> множество id книг. Отсортированный словарь терминов нужен для
+    поиска по префиксу; новые термины досортировываются лениво при запросе.
+    Если название или автор книги меняются, книгу нужно переиндексировать
+    через remove() и add().
+    """
+
+    # При большем числе новых терминов словарь пересортировывается целиком
+    RESORT_THRESHOLD = 256
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+        self._terms: List[str] = []
+        self._new_terms: List[str] = []
+        self.suspended = False
+
+    @staticmethod
+    def _book_terms(book) -> Set[str]:
+        return set(tokenize(book.title)) | set(tokenize(book.author))
+
+    def add(self, book):
+        if self.suspended:
+            return
+        for term in self._book_terms(book):
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                self._new_terms.append(term)
+            ids.add(book.id)
+
+    def remove(self, book):
+        if self.suspended:
+            return
+        for term in self._book_terms(book):
+            ids = self._postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(book.id)
+            if not ids:
+                # Из отсортированного словаря термин уберёт ближайший запрос
+                del self._postings[term]
+
+    def suspend(self):
+        """Отключает инкрементальные обновления до rebuild() (массовая загрузка)"""
+        self.suspended = True
+
+    def rebuild(self, books: Iterable):
+        """Строит индекс заново по всем книгам за один проход"""
+        postings: Dict[str, Set[int]] = {}
+        for book in books:
+            for term in self._book_terms(book):
+                ids = postings.get(term)
+                if ids is None:
+                    ids = postings[term] = set()
+                ids.add(book.id)
+        self._postings = postings
+        self._terms = sorted(postings)
+        self._new_terms = []
+        self.suspended = False
+
+    def _sorted_terms(self) -> List[str]:
+        if len(self._new_terms) > self.RESORT_THRESHOLD:
+            self._terms = sorted(self._postings)
+        else:
+            for term in self._new_terms:
+                index = bisect_left(self._terms, term)
+                if index == len(self._terms) or self._terms[index] != term:
+                    insort(self._terms, term, lo=index)
+        self._new_terms = []
+        return self._terms
+
+    def _prefix_ids(self, prefix: str) -> Set[int]:
+        terms = self._sorted_terms()
+        ids: Set[int] = set()
+        index = bisect_left(terms, prefix)
+        stale = []
+        while index < len(terms) and terms[index].startswith(prefix):
+            term_ids = self._postings.get(terms[index])
+            if term_ids is None:
+                stale.append(index)
+            else:
+                ids |= term_ids
+            index += 1
+        for stale_index in reversed(stale):
+            del terms[stale_index]
+        return ids
+
+    def search_ids(self, query: str) -> Set[int]:
+        """Id книг, содержащих все слова запроса; слово с «*» на конце - префикс"""
+        terms = []
+        for fragment in query.split():
+            fragment_terms = tokenize(fragment)
+            # В «Салтыков-Щед*» по префиксу ищется только последнее слово фрагмента
+            for i, term in enumerate(fragment_terms):
+                terms.append((term, fragment.endswith("*") and i == len(fragment_terms) - 1))
+        if not terms:
+            return set()
+
+        matches = []
+        for term, prefix in terms:
+            ids = self._prefix_ids(term) if prefix else self._postings.get(term, set())
+            if not ids:
+                return set()
+            matches.append(ids)
+        matches.sort(key=len)
+        result = set(matches[0])
+        for ids in matches[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def __len__(self) -> int:
+        return len(self._postings)
@@ -0,0 +1,201 @@
+# shard_storage.py
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import metrics
+from models import *
+from data_manager import DataManager
+
+SHARD_SIZE = 4096
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Порядок записи: сначала то, на что ссылаются выдачи, чтобы после сбоя
+# посреди сохранения выдача не ссылалась на ещё не записанную книгу или читателя
+KINDS = ("books", "librarians", "readers", "borrowings")
+
+
+def _collection(system: 'LibrarySystem', kind: str) -> 'IndexedCollection':
+    if kind == "books":
+        return system.library.books
+    if kind == "librarians":
+        return system.library.librarians
+    if kind == "readers":
+        return system.readers
+    return system.borrowings
+
+
+def _read_shard(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class ShardedStorage:
+    """Хранилище системы в каталоге файлов JSON Lines, разбитых по виду сущности и диапазону id.
+
+    Запись - одна строка, шард kind/NNNNNNNN.jsonl держит id из
+    [N * shard_size, (N + 1) * shard_size). Списки выдач читателей и
+    библиотекарей хранятся в записях выдач (reader_id активного читателя и
+    признак managed), поэтому выдача или возврат меняют только шарды выдачи и
+    книги. save() переписывает лишь шарды с записями, отмеченными в
+    system.changes, каждый через временный файл и os.replace. Первое сохранение
+    системы в каталог - полное. load() читает шарды параллельно.
+    """
+
+    def __init__(self, directory: str, shard_size: int = SHARD_SIZE, workers: Optional[int] = None,
+                 fsync: bool = False):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.workers = workers
+        self.fsync = fsync
+        # По этому ключу system.changes помнит, с каким хранилищем система совпадает
+        self.key = os.path.abspath(directory)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _shard_path(self, kind: str, shard: int) -> str:
+        return os.path.join(self.directory, kind, f"{shard:08d}.jsonl")
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия хранилища: {manifest.get('version')}")
+        return manifest
+
+    # Сохранение
+
+    @staticmethod
+    def _encode(kind: str, item) -> Dict[str, Any]:
+        if kind == "books":
+            return DataManager._book_to_dict(item)
+        if kind == "librarians":
+            return {"id": item.id, "name": item.name, "employee_id": item.employee_id}
+        if kind == "readers":
+            return {"id": item.id, "full_name": item.full_name, "phone": item.phone}
+        record = DataManager._borrowing_to_dict(item)
+        reader = item.reader
+        # Выдача числится за читателем, пока она в его активных выдачах
+        record["reader_id"] = reader.id if reader is not None and item in reader.borrowings else None
+        record["managed"] = item.librarian is not None and item in item.librarian.managed_borrowings
+        return record
+
+    def _write_shard(self, kind: str, shard: int, items: List) -> bool:
+        """Атомарно заменяет шард; пустой шард удаляется. Возвращает, был ли файл записан"""
+        path = self._shard_path(kind, shard)
+        if not items:
+            if os.path.exists(path):
+                os.remove(path)
+            return False
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps(self._encode(kind, item), ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return True
+
+    def save(self, system: 'LibrarySystem') -> int:
+        """Сохраняет изменения системы; возвращает число переписанных шардов.
+
+        Время записи пропорционально числу изменённых шардов, а не размеру
+        каталога. Если каталог пуст, записан другой системой или другим
+        размером шарда, система сохраняется целиком.
+        """
+        manifest = self._read_manifest()
+        changes = system.changes
+        full = (changes.baseline != self.key or manifest is None
+                or manifest.get("shard_size") != self.shard_size)
+        size = self.shard_size
+        written = 0
+
+        for kind in KINDS:
+            os.makedirs(os.path.join(self.directory, kind), exist_ok=True)
+            collection = _collection(system, kind)
+            with metrics.phase(kind):
+                if full:
+                    shards = defaultdict(list)
+                    for item in collection:
+                        shards[item.id // size].append(item)
+                    # Шарды прежнего содержимого каталога, которых больше нет
+                    for name in os.listdir(os.path.join(self.directory, kind)):
+                        stem = name.split(".")[0]
+                        if stem.isdigit() and int(stem) not in shards:
+                            os.remove(os.path.join(self.directory, kind, name))
+                    for shard in sorted(shards):
+                        written += self._write_shard(kind, shard, sorted(shards[shard], key=lambda item: item.id))
+                else:
+                    get = collection.get
+                    for shard in sorted({id // size for id in getattr(changes, kind)}):
+                        items = [item for item in map(get, range(shard * size, (shard + 1) * size))
+                                 if item is not None]
+                        written += self._write_shard(kind, shard, items)
+
+        library = system.library
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": FORMAT_VERSION, "shard_size": size,
+                       "library": {"id": library.id, "name": library.name, "address": library.address}},
+                      f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+        metrics.count("shards.written", written)
+        changes.clear(baseline=self.key)
+        return written
+
+    # Загрузка
+
+    def _shard_paths(self, kind: str) -> List[str]:
+        directory = os.path.join(self.directory, kind)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith(".jsonl")]
+
+    def load(self, system: 'LibrarySystem'):
+        """Загружает систему; шарды читаются и разбираются в пуле потоков"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"В каталоге {self.directory} нет хранилища")
+        paths = {kind: self._shard_paths(kind) for kind in KINDS}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Все шарды отдаются пулу сразу, объекты строятся по мере готовности по порядку
+            records = {kind: executor.map(_read_shard, paths[kind]) for kind in KINDS}
+            DataManager._clear(system)
+            library = system.library
+            library.id = manifest["library"]["id"]
+            library.name = manifest["library"]["name"]
+            library.address = manifest["library"]["address"]
+
+            with metrics.phase("books"):
+                for shard in records["books"]:
+                    library.books.extend(map(DataManager._book_from_dict, shard))
+            with metrics.phase("librarians"):
+                for shard in records["librarians"]:
+                    library.librarians.extend(map(DataManager._librarian_from_dict, shard))
+            with metrics.phase("readers"):
+                for shard in records["readers"]:
+                    system.readers.extend(map(DataManager._reader_from_dict, shard))
+            with metrics.phase("borrowings"):
+                get_reader = system.readers.get
+                for shard in records["borrowings"]:
+                    for borrowing_data in shard:
+                        borrowing = DataManager._borrowing_from_dict(borrowing_data, system)
+                        system.borrowings.append(borrowing)
+                        if borrowing_data["managed"] and borrowing.librarian is not None:
+                            borrowing.librarian.managed_borrowings.append(borrowing)
+                        reader = get_reader(borrowing_data["reader_id"])
+                        if reader is not None:
+                            reader.borrowings.append(borrowing)
+
+        metrics.count("shards.read", sum(len(kind_paths) for kind_paths in paths.values()))
+        DataManager._finish_load(system)
+        system.changes.clear(baseline=self.key)
@@ -0,0 +1,296 @@
+# sqlite_storage.py
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+from models import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS library (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_author ON books(author);
+CREATE INDEX IF NOT EXISTS books_status ON books(status);
+CREATE TABLE IF NOT EXISTS librarians (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    employee_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS readers (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS borrowings (
+    id INTEGER PRIMARY KEY,
+    borrow_date TEXT NOT NULL,
+    return_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    book_id INTEGER,
+    librarian_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS borrowings_return_date ON borrowings(return_date);
+-- Списки выдач читателей (активные) и библиотекарей (все оформленные), с порядком
+CREATE TABLE IF NOT EXISTS reader_borrowings (
+    reader_id INTEGER NOT NULL,
+    borrowing_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (reader_id, borrowing_id)
+);
+CREATE INDEX IF NOT EXISTS reader_borrowings_borrowing ON reader_borrowings(borrowing_id);
+CREATE TABLE IF NOT EXISTS librarian_borrowings (
+    librarian_id INTEGER NOT NULL,
+    borrowing_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (librarian_id, borrowing_id)
+);
+"""
+
+BATCH_SIZE = 10_000
+
+
+class SqliteStorage:
+    """Хранилище библиотечной системы в SQLite.
+
+    load() поднимает книги, библиотекарей и читателей, а выдачи читателей,
+    библиотекарей и system.borrowings читает лениво - при первом обращении.
+    Выдача книги и поиск выдачи по id списки целиком не загружают.
+    system.overdue() видит только выдачи загруженных списков читателей;
+    по всей базе просроченные ищет overdue().
+    Точечные изменения копятся в открытой транзакции и фиксируются commit()
+    или при выходе из batch().
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+        self.system: Optional['LibrarySystem'] = None
+        # Каждая выдача поднимается из базы один раз: читатель и библиотекарь делят объект
+        self._borrowings: Dict[int, 'Borrowing'] = {}
+        self._batch_depth = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self) -> 'SqliteStorage':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def batch(self):
+        """Группирует изменения в одну транзакцию"""
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.connection.rollback()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.connection.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def _autocommit(self):
+        if not self._batch_depth:
+            self.connection.commit()
+
+    # Полное сохранение
+
+    def save(self, system: 'LibrarySystem'):
+        """Переписывает базу содержимым системы в одной транзакции"""
+        with self.batch():
+            for table in ("library", "books", "librarians", "readers", "borrowings",
+                          "reader_borrowings", "librarian_borrowings"):
+                self.connection.execute(f"DELETE FROM {table}")
+            library = system.library
+            self.connection.execute("INSERT INTO library VALUES (?, ?, ?)",
+                                    (library.id, library.name, library.address))
+            self._insert_many("INSERT INTO books VALUES (?, ?, ?, ?, ?)",
+                              (self._book_row(book) for book in library.books))
+            self._insert_many("INSERT INTO librarians VALUES (?, ?, ?)",
+                              ((l.id, l.name, l.employee_id) for l in library.librarians))
+            self._insert_many("INSERT INTO readers VALUES (?, ?, ?)",
+                              ((r.id, r.full_name, r.phone) for r in system.readers))
+            self._insert_many("INSERT INTO borrowings VALUES (?, ?, ?, ?, ?, ?)",
+                              (self._borrowing_row(b) for b in system.borrowings))
+            self._insert_many("INSERT INTO reader_borrowings VALUES (?, ?, ?)",
+                              ((r.id, b.id, position) for r in system.readers
+                               for position, b in enumerate(r.borrowings)))
+            self._insert_many("INSERT INTO librarian_borrowings VALUES (?, ?, ?)",
+                              ((l.id, b.id, position) for l in library.librarians
+                               for position, b in enumerate(l.managed_borrowings)))
+
+    def _insert_many(self, sql: str, rows: Iterable[tuple]):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                self.connection.executemany(sql, batch)
+                batch.clear()
+        if batch:
+            self.connection.executemany(sql, batch)
+
+    @staticmethod
+    def _book_row(book: 'Book') -> tuple:
+        return book.id, book.title, book.author, book.year, book.status
+
+    @staticmethod
+    def _borrowing_row(borrowing: 'Borrowing') -> tuple:
+        return (borrowing.id, borrowing.borrow_date.isoformat(), borrowing.return_date.isoformat(),
+                borrowing.status,
+                borrowing.book.id if borrowing.book else None,
+                borrowing.librarian.id if borrowing.librarian else None)
+
+    # Загрузка
+
+    def load(self, system: 'LibrarySystem'):
+        """Заполняет систему; списки выдач подгружаются при первом обращении"""
+        self.system = system
+        self._borrowings.clear()
+        connection = self.connection
+
+        row = connection.execute("SELECT id, name, address FROM library").fetchone()
+        if row is not None:
+            system.library.id, system.library.name, system.library.address = row
+
+        for book_id, title, author, year, status in connection.execute(
+                "SELECT id, title, author, year, status FROM books ORDER BY rowid"):
+            book = Book(book_id, title, author, year)
+            book.status = status
+            system.library.books.append(book)
+
+        for librarian_id, name, employee_id in connection.execute(
+                "SELECT id, name, employee_id FROM librarians ORDER BY rowid"):
+            librarian = Librarian(librarian_id, name, employee_id)
+            librarian.managed_borrowings = LazyCollection(self._loader(
+                "SELECT borrowing_id FROM librarian_borrowings WHERE librarian_id = ? ORDER BY position",
+                librarian_id), librarian._link_changed, librarian._link_changed,
+                self._member_fetcher("librarian_borrowings", "librarian_id", librarian_id))
+            system.library.librarians.append(librarian)
+
+        for reader_id, full_name, phone in connection.execute(
+                "SELECT id, full_name, phone FROM readers ORDER BY rowid"):
+            system.readers.append(self._make_reader(reader_id, full_name, phone))
+
+        # Новые выдачи получают id после последнего сохранённого, не поднимая все выдачи
+        system.borrowing_ids.observe(connection.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM borrowings").fetchone()[0])
+        system.borrowings = LazyCollection(self._all_borrowings, system._track_borrowing_id,
+                                           system._untrack_borrowing, self.get_borrowing)
+
+    def _make_reader(self, reader_id: int, full_name: str, phone: str) -> 'Reader':
+        reader = Reader(reader_id, full_name, phone)
+        reader.borrowings = LazyCollection(self._loader(
+            "SELECT borrowing_id FROM reader_borrowings WHERE reader_id = ? ORDER BY position", reader_id),
+            reader._attach_borrowing, reader._detach_borrowing,
+            self._member_fetcher("reader_borrowings", "reader_id", reader_id))
+        return reader
+
+    def _loader(self, sql: str, owner_id: int):
+        def load() -> List['Borrowing']:
+            ids = [row[0] for row in self.connection.execute(sql, (owner_id,))]
+            return self._get_borrowings(ids)
+        return load
+
+    def _member_fetcher(self, table: str, owner_column: str, owner_id: int):
+        """Поднимает одну выдачу списка, если она в нём есть, не читая весь список"""
+        def fetch(borrowing_id: int) -> Optional['Borrowing']:
+            row = self.connection.execute(f"SELECT 1 FROM {table} WHERE {owner_column} = ? AND borrowing_id = ?",
+                                          (owner_id, borrowing_id)).fetchone()
+            return self.get_borrowing(borrowing_id) if row is not None else None
+        return fetch
+
+    def _all_borrowings(self) -> List['Borrowing']:
+        ids = [row[0] for row in self.connection.execute("SELECT id FROM borrowings ORDER BY rowid")]
+        return self._get_borrowings(ids)
+
+    def _get_borrowings(self, ids: List[int]) -> List['Borrowing']:
+        missing = [id for id in ids if id not in self._borrowings]
+        # Недостающие выдачи читаются пачками по первичному ключу
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.connection.execute(
+                    "SELECT id, borrow_date, return_date, status, book_id, librarian_id "
+                    f"FROM borrowings WHERE id IN ({placeholders})", chunk):
+                self._borrowings[row[0]] = self._make_borrowing(row)
+        return [self._borrowings[id] for id in ids if id in self._borrowings]
+
+    def _make_borrowing(self, row: tuple) -> 'Borrowing':
+        borrowing_id, borrow_date, return_date, status, book_id, librarian_id = row
+        borrowing = Borrowing(borrowing_id, date.fromisoformat(borrow_date), date.fromisoformat(return_date))
+        borrowing.status = status
+        if book_id is not None:
+            borrowing.book = self.system.library.get_book(book_id)
+        if librarian_id is not None:
+            borrowing.librarian = self.system.library.get_librarian(librarian_id)
+        return borrowing
+
+    # Точечные чтения без загрузки всей системы
+
+    def get_borrowing(self, id: int) -> Optional['Borrowing']:
+        return next(iter(self._get_borrowings([id])), None)
+
+    def overdue(self, as_of: Optional[date] = None) -> List['Borrowing']:
+        """Активные выдачи со сроком раньше as_of; поднимаются только они, а не все выдачи"""
+        as_of = as_of or date.today()
+        return self._get_borrowings([row[0] for row in self.connection.execute(
+            "SELECT b.id FROM borrowings b JOIN reader_borrowings rb ON rb.borrowing_id = b.id "
+            "WHERE b.return_date < ? ORDER BY b.return_date, b.id", (as_of.isoformat(),))])
+
+    # Точечные записи
+
+    def add_book(self, book: 'Book'):
+        self.connection.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?)", self._book_row(book))
+        self._autocommit()
+
+    def update_book(self, book: 'Book'):
+        self.connection.execute("UPDATE books SET title = ?, author = ?, year = ?, status = ? WHERE id = ?",
+                                self._book_row(book)[1:] + (book.id,))
+        self._autocommit()
+
+    def remove_book(self, id: int):
+        self.connection.execute("DELETE FROM books WHERE id = ?", (id,))
+        self._autocommit()
+
+    def record_borrow(self, reader: 'Reader', borrowing: 'Borrowing'):
+        """Сохраняет выдачу, оформленную через reader.borrow_book"""
+        with self.batch():
+            self.connection.execute("INSERT INTO borrowings VALUES (?, ?, ?, ?, ?, ?)",
+                                    self._borrowing_row(borrowing))
+            self._append_link("reader_borrowings", "reader_id", reader.id, borrowing.id)
+            if borrowing.librarian:
+                self._append_link("librarian_borrowings", "librarian_id", borrowing.librarian.id, borrowing.id)
+            if borrowing.book:
+                self.update_book(borrowing.book)
+        self._borrowings[borrowing.id] = borrowing
+
+    def record_return(self, reader: 'Reader', borrowing: 'Borrowing'):
+        """Сохраняет возврат, выполненный через reader.return_book"""
+        with self.batch():
+            self.connection.execute("DELETE FROM reader_borrowings WHERE reader_id = ? AND borrowing_id = ?",
+                                    (reader.id, borrowing.id))
+            if borrowing.book:
+                self.update_book(borrowing.book)
+
+    def _append_link(self, table: str, owner_column: str, owner_id: int, borrowing_id: int):
+        self.connection.execute(
+            f"INSERT INTO {table} SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM {table} WHERE {owner_column} = ?",
+            (owner_id, borrowing_id, owner_id))
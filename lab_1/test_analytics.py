@@ -0,0 +1,117 @@
+import contextlib
+import gc
+import io
+import os
+import tempfile
+import unittest
+from collections import Counter
+from datetime import date, timedelta
+from unittest.mock import patch
+import numpy as np
+from analytics import CirculationStats
+from benchmark import generate_system
+from data_manager import DataManager
+from events import NullSink
+from models import Book, Borrowing
+
+
+class TestCirculationStats(unittest.TestCase):
+    def setUp(self):
+        self.system = generate_system(books=80, readers=9, librarians=4, borrowings=500, seed=3)
+        self.system.events = NullSink()
+        # Часть выдач закрыта: активны не все
+        for reader in self.system.readers:
+            for borrowing_id in list(reader.borrowings.ids())[::3]:
+                reader.return_book(borrowing_id)
+        self.as_of = date(2024, 7, 1)
+
+    def assert_same(self, stats, other):
+        for column in ("ids", "book_id", "librarian_id", "borrow_date", "return_date", "active",
+                       "book_ids", "book_years"):
+            np.testing.assert_array_equal(getattr(stats, column), getattr(other, column), column)
+
+    def test_queries_match_loops(self):
+        stats = CirculationStats.from_system(self.system)
+        counts = Counter(b.book.id for b in self.system.borrowings)
+        expected = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:5]
+        self.assertEqual(stats.most_borrowed(5), expected)
+        self.assertEqual(stats.borrowings_per_librarian(),
+                         dict(Counter(b.librarian.id for b in self.system.borrowings)))
+        self.assertEqual(stats.average_loan_days(), 14.0)
+        self.assertEqual(int(stats.overdue(self.as_of).sum()), len(self.system.overdue(self.as_of)))
+
+        overdue = {b.id for b in self.system.overdue(self.as_of)}
+        totals, late = Counter(), Counter()
+        for b in self.system.borrowings:
+            totals[b.book.year] += 1
+            late[b.book.year] += b.id in overdue
+        rates = stats.overdue_rate_by_year(self.as_of)
+        self.assertEqual(set(rates), set(totals))
+        for year, total in totals.items():
+            self.assertAlmostEqual(rates[year], late[year] / total)
+
+        months, month_counts = stats.histogram("borrow_date", "M")
+        expected = Counter(b.borrow_date.replace(day=1) for b in self.system.borrowings)
+        self.assertEqual(dict(zip(months.astype(date).tolist(), month_counts.tolist())), dict(expected))
+        self.assertEqual(stats.top_k(np.array([3, 1, 2]), np.array([5, 5, 1]), 2), [(1, 5), (3, 5)])
+
+    def test_from_files_matches_system(self):
+        stats = CirculationStats.from_system(self.system)
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            json_file = os.path.join(tmp, "library_system.json")
+            binary_file = os.path.join(tmp, "library_system.bin")
+            DataManager.save_to_json(self.system, json_file)
+            DataManager.save_to_binary(self.system, binary_file)
+            self.assert_same(CirculationStats.from_json(json_file), stats)
+            self.assert_same(CirculationStats.from_binary(binary_file), stats)
+
+    def test_refresh_after_changes(self):
+        stats = CirculationStats.from_system(self.system)
+        librarian = self.system.library.get_librarian(1)
+        for reader in list(self.system.readers)[:4]:
+            book = self.system.library.find_books_by_status("доступна")[0]
+            reader.borrow_book(book, librarian, date.today() + timedelta(days=7))
+            reader.return_book(next(iter(reader.borrowings.ids())))
+        self.system.library.add_book(Book(1000, "Новая", "Автор", 1901))
+        self.system.library.remove_book(5)
+        # Изменения берутся из отметок хуков, без построения с нуля
+        with patch.object(CirculationStats, "_build", side_effect=AssertionError("полный проход")):
+            stats.refresh()
+        self.assertEqual(len(stats), 504)
+        self.assert_same(stats, CirculationStats.from_system(self.system))
+
+    def test_refresh_rebuilds_after_removal(self):
+        # Та же система заполнена другими данными с тем же числом выдач
+        stats = CirculationStats.from_system(self.system)
+        other = generate_system(books=80, readers=9, librarians=4, borrowings=len(self.system.borrowings), seed=8)
+        DataManager._load_from_dict(DataManager.to_dict(other), self.system)
+        stats.refresh()
+        self.assert_same(stats, CirculationStats.from_system(self.system))
+
+        # Удаление и добавление выдачи с тем же id
+        stats = CirculationStats.from_system(self.system)
+        old = self.system.get_borrowing(7)
+        replacement = Borrowing(old.id, date(2020, 1, 1), date(2020, 1, 15))
+        replacement.book = self.system.library.get_book(1)
+        self.system.borrowings.remove(old)
+        self.system.borrowings.append(replacement)
+        stats.refresh()
+        self.assert_same(stats, CirculationStats.from_system(self.system))
+
+        self.system.borrowings.clear()
+        stats.refresh()
+        self.assertEqual(len(stats), 0)
+
+    def test_released_stats_stop_recording(self):
+        log = self.system.circulation
+        stats = CirculationStats.from_system(self.system)
+        self.assertIs(log.follower(), stats)
+        del stats
+        gc.collect()
+        self.assertIsNone(log.follower)
+        reader = self.system.get_reader(1)
+        reader.borrow_book(self.system.library.get_book(1), self.system.library.get_librarian(1), date.today())
+        self.assertEqual(len(log.borrowings) + len(log.readers), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from concurrency import BookUnavailableError, ConcurrentLibrarySystem, SharedExclusiveLock
+from data_manager import DataManager
+from events import NullSink
+from models import Book, Borrowing, Librarian, LibrarySystem, Reader
+
+
+def check_consistent(data):
+    """Каждая активная выдача держит ровно одну выданную книгу, id выдач не повторяются"""
+    active = [borrowing_id for reader in data["readers"] for borrowing_id in reader["borrowings"]]
+    borrowings = {b["id"]: b for b in data["borrowings"]}
+    issued = sorted(book["id"] for book in data["library"]["books"] if book["status"] == "Выдана")
+    assert len(borrowings) == len(data["borrowings"]), "повторяющиеся id выдач"
+    assert sorted(borrowings[id]["book_id"] for id in active) == issued, "выдачи и статусы книг расходятся"
+
+
+class TestConcurrentBorrowing(unittest.TestCase):
+    THREADS = 8
+    ATTEMPTS = 400
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        # Частые переключения потоков, чтобы гонки успевали проявиться
+        sys.setswitchinterval(1e-6)
+        system = LibrarySystem()
+        system.events = NullSink()
+        system.library.books.extend(Book(i, f"Книга {i}", "Автор", 2000) for i in range(1, 11))
+        system.library.librarians.append(Librarian(1, "Петрова Анна", "LIB001"))
+        system.readers.extend(Reader(i, f"Читатель {i}", f"+7999{i:07}") for i in range(1, self.THREADS + 1))
+        self.system = system
+        self.concurrent = ConcurrentLibrarySystem(system)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_stress_borrow_return_with_snapshots(self):
+        return_date = date.today() + timedelta(days=14)
+        errors = []
+        snapshots = []
+        done = threading.Event()
+
+        def worker(reader_id):
+            rng = random.Random(reader_id)
+            try:
+                for _ in range(self.ATTEMPTS):
+                    reader = self.system.get_reader(reader_id)
+                    if reader.borrowings.ids() and rng.random() < 0.5:
+                        self.concurrent.return_book(reader_id, rng.choice(list(reader.borrowings.ids())))
+                        continue
+                    try:
+                        self.concurrent.borrow_book(reader_id, rng.randint(1, 10), 1, return_date)
+                    except BookUnavailableError:
+                        pass
+            except Exception as e:
+                errors.append(e)
+
+        def snapshotter():
+            while not done.is_set():
+                snapshots.append(self.concurrent.snapshot())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, self.THREADS + 1)]
+        watcher = threading.Thread(target=snapshotter)
+        watcher.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        watcher.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(snapshots)
+        for data in snapshots + [self.concurrent.snapshot()]:
+            check_consistent(data)
+        ids = [borrowing.id for borrowing in self.system.borrowings]
+        self.assertEqual(sorted(ids), list(range(1, len(ids) + 1)))
+        self.assertEqual(len(self.system.library.find_books_by_status("Выдана")),
+                         sum(len(reader.borrowings) for reader in self.system.readers))
+
+    def test_same_book_is_issued_once(self):
+        return_date = date.today() + timedelta(days=14)
+        barrier = threading.Barrier(self.THREADS)
+        issued = []
+
+        def worker(reader_id):
+            barrier.wait()
+            try:
+                issued.append(self.concurrent.borrow_book(reader_id, 1, 1, return_date))
+            except BookUnavailableError:
+                pass
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, self.THREADS + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(issued), 1)
+
+    def test_throughput_with_many_threads(self):
+        # Обычный интервал переключения: меряется работа, а не частота переключений
+        sys.setswitchinterval(self.interval)
+        return_date = date.today() + timedelta(days=14)
+        operations = 4000
+
+        def throughput(threads):
+            system = LibrarySystem()
+            system.events = NullSink()
+            system.library.books.extend(Book(i, f"Книга {i}", "Автор", 2000) for i in range(1, threads * 10 + 1))
+            system.library.librarians.extend(Librarian(i, f"Библиотекарь {i}", f"LIB{i:03}")
+                                             for i in range(1, threads + 1))
+            system.readers.extend(Reader(i, f"Читатель {i}", f"+7999{i:07}") for i in range(1, threads + 1))
+            concurrent = ConcurrentLibrarySystem(system)
+
+            def worker(reader_id):
+                # У каждого потока свои книги, читатель и библиотекарь: общие только индексы
+                for n in range(operations // threads):
+                    borrowing = concurrent.borrow_book(reader_id, (reader_id - 1) * 10 + n % 10 + 1,
+                                                       reader_id, return_date)
+                    concurrent.return_book(reader_id, borrowing.id)
+
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(1, threads + 1)]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            check_consistent(concurrent.snapshot())
+            self.assertEqual(len(system.borrowings), operations // threads * threads)
+            return operations / elapsed
+
+        single = throughput(1)
+        many = throughput(32)
+        # Под GIL быстрее не станет, но и очереди к одной блокировке быть не должно
+        self.assertGreater(many, single / 2, f"{many:.0f} операций/с в 32 потоках против {single:.0f} в одном")
+
+    def test_return_without_book(self):
+        borrowing = Borrowing(100, date.today(), date.today())
+        reader = self.system.get_reader(1)
+        reader.borrowings.append(borrowing)
+        self.assertIs(self.concurrent.return_book(1, 100), borrowing)
+        self.assertIsNone(reader.borrowings.get(100))
+        reader.borrowings.append(borrowing)
+        reader.return_book(100)
+        self.assertIsNone(reader.borrowings.get(100))
+
+    def test_copy_is_independent(self):
+        borrowing = self.concurrent.borrow_book(1, 1, 1, date.today())
+        copy = self.concurrent.copy()
+        self.concurrent.return_book(1, borrowing.id)
+        self.assertEqual(copy.library.get_book(1).status, "Выдана")
+        self.assertEqual(self.system.library.get_book(1).status, "доступна")
+
+    def test_save_writes_snapshot_as_json(self):
+        self.concurrent.borrow_book(1, 1, 1, date.today())
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            filename = os.path.join(tmp, "concurrent.json")
+            expected_file = os.path.join(tmp, "expected.json")
+            self.concurrent.save(filename)
+            DataManager.save_to_json(self.system, expected_file)
+            with open(filename, 'rb') as f, open(expected_file, 'rb') as expected:
+                self.assertEqual(f.read(), expected.read())
+
+
+class TestSharedExclusiveLock(unittest.TestCase):
+    def test_exclusive_waits_for_shared(self):
+        lock = SharedExclusiveLock()
+        order = []
+        entered = threading.Event()
+
+        def exclusive():
+            entered.wait()
+            with lock.exclusive():
+                order.append("exclusive")
+
+        thread = threading.Thread(target=exclusive)
+        thread.start()
+        with lock.shared():
+            entered.set()
+            thread.join(0.05)
+            order.append("shared")
+        thread.join()
+        self.assertEqual(order, ["shared", "exclusive"])
+
+
+if __name__ == "__main__":
+    unittest.main()
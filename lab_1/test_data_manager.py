@@ -0,0 +1,200 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+from data_manager import DataManager, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _JsonStream
+from benchmark import generate_system
+import metrics
+from models import Book, LibrarySystem, Reader
+
+
+def snapshot(system):
+    """Сводит систему к сравнимому словарю"""
+    return DataManager.to_dict(system)
+
+
+def legacy_data():
+    """Файл прежнего формата: id выдач считались по списку читателя и повторяются"""
+    def borrowing(id, book_id):
+        return {"id": id, "borrow_date": "2024-03-01", "return_date": "2024-03-15", "status": "доступна",
+                "book_id": book_id, "librarian_id": 1, "reader_id": None}
+
+    return {
+        "library": {
+            "id": 1, "name": "Городская библиотека", "address": "ул. Ленина, 1",
+            "books": [{"id": id, "title": f"Книга {id}", "author": "Автор", "year": 2000, "status": "Выдана"}
+                      for id in (1, 2, 3)],
+            "librarians": [{"id": 1, "name": "Мария", "employee_id": "EMP001", "managed_borrowings": [1, 1, 2]}],
+        },
+        "readers": [{"id": 1, "full_name": "Иван", "phone": "+7", "borrowings": [1]},
+                    {"id": 2, "full_name": "Пётр", "phone": "+7", "borrowings": [1, 2]}],
+        "borrowings": [borrowing(1, 1), borrowing(1, 2), borrowing(2, 3)],
+    }
+
+
+LEGACY_XML = """<?xml version='1.0' encoding='utf-8'?>
+<library_system><library id="1" name="Городская библиотека" address="ул. Ленина, 1"><books>\
+<book id="1" title="Книга 1" author="Автор" year="2000" status="Выдана" />\
+<book id="2" title="Книга 2" author="Автор" year="2000" status="Выдана" />\
+<book id="3" title="Книга 3" author="Автор" year="2000" status="Выдана" /></books><librarians>\
+<librarian id="1" name="Мария" employee_id="EMP001"><managed_borrowings><borrowing_id>1</borrowing_id>\
+<borrowing_id>1</borrowing_id><borrowing_id>2</borrowing_id></managed_borrowings></librarian></librarians></library>\
+<readers><reader id="1" full_name="Иван" phone="+7"><borrowings><borrowing_id>1</borrowing_id></borrowings></reader>\
+<reader id="2" full_name="Пётр" phone="+7"><borrowings><borrowing_id>1</borrowing_id><borrowing_id>2</borrowing_id>\
+</borrowings></reader></readers><borrowings>\
+<borrowing id="1" borrow_date="2024-03-01" return_date="2024-03-15" status="доступна"><book_id>1</book_id>\
+<librarian_id>1</librarian_id></borrowing>\
+<borrowing id="1" borrow_date="2024-03-01" return_date="2024-03-15" status="доступна"><book_id>2</book_id>\
+<librarian_id>1</librarian_id></borrowing>\
+<borrowing id="2" borrow_date="2024-03-01" return_date="2024-03-15" status="доступна"><book_id>3</book_id>\
+<librarian_id>1</librarian_id></borrowing></borrowings></library_system>"""
+
+
+class TestDataManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.system = generate_system(books=50, readers=7, librarians=3, borrowings=120, seed=1)
+        self.json_file = os.path.join(self.tmp.name, "library_system.json")
+        DataManager.save_to_json(self.system, self.json_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_json_stream_matches_json(self):
+        expected = LibrarySystem()
+        DataManager.load_from_json(self.json_file, expected)
+        loaded = LibrarySystem()
+        DataManager.load_from_json_stream(self.json_file, loaded)
+        self.assertEqual(snapshot(loaded), snapshot(expected))
+        self.assertEqual(snapshot(loaded), snapshot(self.system))
+
+    def test_json_stream_small_chunks(self):
+        loaded = LibrarySystem()
+        with open(self.json_file, 'r', encoding='utf-8') as f:
+            DataManager._load_from_stream(_JsonStream(f, chunk_size=7), loaded)
+        self.assertEqual(snapshot(loaded), snapshot(self.system))
+        self.assertEqual(loaded.library.search_books("книга 7"), [loaded.library.get_book(7)])
+        reader = loaded.readers[0]
+        for borrowing in reader.borrowings:
+            self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+
+    def test_load_metrics(self):
+        with metrics.collect() as collected:
+            DataManager.load_from_json(self.json_file, LibrarySystem())
+        report = collected.report()
+        self.assertEqual(report["counters"]["bytes_read"], os.path.getsize(self.json_file))
+        self.assertEqual(report["counters"]["records.borrowings"], 120)
+        self.assertEqual(report["phases"]["borrowing.parse_dates"]["calls"], 120)
+        for phase in ("parse", "books", "borrowings", "links", "readers", "search_index"):
+            self.assertIn(phase, report["phases"])
+        self.assertIsNone(metrics.active)
+
+    def test_xml_stream_is_byte_compatible(self):
+        self.system.library.books.append(Book(999, 'Кавычки "и" & <теги>\n', "O'Neil", 2000))
+        self.system.readers.append(Reader(99, "Без выдач", "+70000000000"))
+        expected_file = os.path.join(self.tmp.name, "expected.xml")
+        stream_file = os.path.join(self.tmp.name, "stream.xml")
+        DataManager.save_to_xml(self.system, expected_file)
+        DataManager.save_to_xml_stream(self.system, stream_file)
+        with open(expected_file, 'rb') as expected, open(stream_file, 'rb') as streamed:
+            self.assertEqual(streamed.read(), expected.read())
+
+    def test_json_stream_writer_is_byte_compatible(self):
+        self.system.library.books.append(Book(999, 'Кавычки "и" \\ \n\t', "O'Neil", 2000))
+        self.system.readers.append(Reader(99, "Без выдач", "+70000000000"))
+        stream_file = os.path.join(self.tmp.name, "stream.json")
+        compact_file = os.path.join(self.tmp.name, "compact.json")
+        DataManager.save_to_json(self.system, self.json_file)
+        DataManager.save_to_json_stream(self.system, stream_file)
+        DataManager.save_to_json_stream(self.system, compact_file, compact=True)
+        with open(self.json_file, 'rb') as expected, open(stream_file, 'rb') as streamed:
+            self.assertEqual(streamed.read(), expected.read())
+        with open(self.json_file, encoding='utf-8') as expected, open(compact_file, encoding='utf-8') as compact:
+            text = compact.read()
+            self.assertEqual(json.loads(text), json.load(expected))
+            self.assertNotIn("\n", text)
+
+        empty_file = os.path.join(self.tmp.name, "empty.json")
+        DataManager.save_to_json(LibrarySystem(), empty_file)
+        DataManager.save_to_json_stream(LibrarySystem(), stream_file)
+        with open(empty_file, 'rb') as expected, open(stream_file, 'rb') as streamed:
+            self.assertEqual(streamed.read(), expected.read())
+
+    def test_xml_stream_loader_matches_xml(self):
+        xml_file = os.path.join(self.tmp.name, "library_system.xml")
+        DataManager.save_to_xml(self.system, xml_file)
+        expected = LibrarySystem()
+        DataManager.load_from_xml(xml_file, expected)
+        loaded = LibrarySystem()
+        DataManager.load_from_xml_stream(xml_file, loaded)
+        self.assertEqual(snapshot(loaded), snapshot(expected))
+        self.assertEqual(snapshot(loaded), snapshot(self.system))
+
+    def test_sample_xml_round_trip(self):
+        sample = os.path.join(os.path.dirname(os.path.abspath(__file__)), "library_system.xml")
+        loaded = LibrarySystem()
+        DataManager.load_from_xml_stream(sample, loaded)
+        saved = os.path.join(self.tmp.name, "sample.xml")
+        DataManager.save_to_xml_stream(loaded, saved)
+        with open(sample, 'rb') as expected, open(saved, 'rb') as streamed:
+            self.assertEqual(streamed.read(), expected.read())
+
+    def test_legacy_repeated_borrowing_ids(self):
+        json_file = os.path.join(self.tmp.name, "legacy.json")
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy_data(), f, ensure_ascii=False, indent=2)
+        xml_file = os.path.join(self.tmp.name, "legacy.xml")
+        with open(xml_file, 'w', encoding='utf-8') as f:
+            f.write(LEGACY_XML)
+
+        loaders = ((DataManager.load_from_json, json_file), (DataManager.load_from_json_stream, json_file),
+                   (DataManager.load_from_xml, xml_file), (DataManager.load_from_xml_stream, xml_file))
+        for loader, filename in loaders:
+            loaded = LibrarySystem()
+            loader(filename, loaded)
+            # Повтор id 1 получает следующий свободный id, ни одна выдача не теряется
+            self.assertEqual(sorted(loaded.borrowings.ids()), [1, 2, 3])
+            self.assertEqual(loaded.get_borrowing(3).book.id, 2)
+            readers = {reader.id: [b.book.id for b in reader.borrowings] for reader in loaded.readers}
+            self.assertEqual(readers, {1: [1], 2: [2, 3]}, loader.__name__)
+            librarian = loaded.library.get_librarian(1)
+            self.assertEqual(sorted(b.book.id for b in librarian.managed_borrowings), [1, 2, 3])
+            for reader in loaded.readers:
+                for borrowing in reader.borrowings:
+                    self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+
+            # Пересохранённый файл уже без повторов
+            resaved = LibrarySystem()
+            DataManager._load_from_dict(DataManager.to_dict(loaded), resaved)
+            self.assertEqual(snapshot(resaved), snapshot(loaded))
+
+    def test_binary_round_trip_matches_json_and_xml(self):
+        xml_file = os.path.join(self.tmp.name, "library_system.xml")
+        DataManager.save_to_xml(self.system, xml_file)
+        for loader, filename in ((DataManager.load_from_json, self.json_file),
+                                 (DataManager.load_from_xml, xml_file)):
+            expected = LibrarySystem()
+            loader(filename, expected)
+            binary_file = os.path.join(self.tmp.name, "library_system.bin")
+            DataManager.save_to_binary(expected, binary_file)
+            loaded = LibrarySystem()
+            DataManager.load_from_binary(binary_file, loaded)
+            self.assertEqual(snapshot(loaded), snapshot(expected))
+            self.assertEqual(snapshot(loaded), snapshot(self.system))
+
+    def test_binary_rejects_foreign_files(self):
+        with self.assertRaises(ValueError):
+            DataManager.load_from_binary(self.json_file, LibrarySystem())
+
+        binary_file = os.path.join(self.tmp.name, "library_system.bin")
+        DataManager.save_to_binary(self.system, binary_file)
+        with open(binary_file, 'r+b') as f:
+            f.seek(len(SNAPSHOT_MAGIC))
+            f.write(struct.pack("<H", SNAPSHOT_VERSION + 1))
+        with self.assertRaises(ValueError):
+            DataManager.load_from_binary(binary_file, LibrarySystem())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from data_manager import DataManager
+from journal import Journal
+from models import Book, Librarian, LibrarySystem, Reader
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "store")
+        initial = LibrarySystem()
+        initial.library.librarians.append(Librarian(1, "Петрова Анна", "LIB001"))
+        initial.readers.append(Reader(1, "Иванов Сергей", "+79991234567"))
+        self.journal = Journal(self.directory, compact_every=100)
+        self.system = self.journal.load(initial)
+        self.return_date = date.today() + timedelta(days=14)
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def reopen(self, **kwargs) -> LibrarySystem:
+        self.journal.close()
+        self.journal = Journal(self.directory, **kwargs)
+        return self.journal.load()
+
+    def test_replay_restores_operations(self):
+        reader = self.system.get_reader(1)
+        librarian = self.system.library.get_librarian(1)
+        for i in range(1, 4):
+            self.journal.add_book(Book(i, f"Книга {i}", "Автор", 2000 + i))
+        first = self.journal.borrow_book(reader, self.system.library.get_book(1), librarian, self.return_date)
+        self.journal.borrow_book(reader, self.system.library.get_book(2), librarian, self.return_date)
+        self.journal.return_book(reader, first.id)
+        self.journal.remove_book(3)
+
+        restored = self.reopen()
+        self.assertEqual(DataManager.to_dict(restored), DataManager.to_dict(self.system))
+        self.assertEqual(restored.library.get_book(1).status, "доступна")
+        self.assertEqual(restored.library.get_book(2).status, "Выдана")
+
+    def test_compaction_bounds_journal(self):
+        for i in range(1, 251):
+            self.journal.add_book(Book(i, f"Книга {i}", "Автор", 2000))
+        with open(self.journal.journal_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 50)
+        snapshots = [name for name in os.listdir(self.directory) if name.startswith("snapshot.")]
+        self.assertEqual(snapshots, ["snapshot.000000000200.bin"])
+        self.assertEqual(len(self.reopen().library.books), 250)
+
+    def test_torn_last_line_is_dropped(self):
+        self.journal.add_book(Book(1, "Книга 1", "Автор", 2000))
+        self.journal.close()
+        with open(os.path.join(self.directory, Journal.JOURNAL_NAME), 'a', encoding='utf-8') as f:
+            f.write('{"op":"add_book","bo')
+
+        restored = self.reopen()
+        self.assertEqual(len(restored.library.books), 1)
+        self.journal.add_book(Book(2, "Книга 2", "Автор", 2000))
+        self.assertEqual(len(self.reopen().library.books), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
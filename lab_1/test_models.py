@@ -0,0 +1,184 @@
+import unittest
+import unittest.mock
+from datetime import date, timedelta
+from events import BufferedSink, NullSink
+from models import (Book, FictionBook, Librarian, Reader, LibrarySystem,
+                    AddBook, RemoveBook, BorrowBook, ReturnBook, BatchError)
+
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        self.system = LibrarySystem()
+        self.book1 = FictionBook(1, "Мастер и Маргарита", "Михаил Булгаков", 1966, "роман")
+        self.book2 = Book(2, "Белая гвардия", "Михаил Булгаков", 1925)
+        self.book3 = Book(3, "Краткая история времени", "Стивен Хокинг", 1988)
+        self.system.library.books.extend([self.book1, self.book2, self.book3])
+        self.librarian = Librarian(1, "Петрова Анна", "LIB001")
+        self.system.library.librarians.append(self.librarian)
+        self.reader = Reader(1, "Иванов Сергей", "+79991234567")
+        self.other_reader = Reader(2, "Смирнова Ольга", "+79990000000")
+        self.system.readers.extend([self.reader, self.other_reader])
+        self.return_date = date.today() + timedelta(days=14)
+
+    def test_book_lookup_by_id(self):
+        self.assertIs(self.system.library.get_book(2), self.book2)
+        self.assertIsNone(self.system.library.get_book(42))
+        self.assertIs(self.system.library.books[0], self.book1)
+
+    def test_remove_book_updates_indexes(self):
+        self.system.library.remove_book(2)
+        self.assertIsNone(self.system.library.get_book(2))
+        self.assertEqual(self.system.library.find_books_by_author("Михаил Булгаков"), [self.book1])
+        self.assertNotIn(self.book2, self.system.library.find_books_by_status("доступна"))
+        self.assertEqual(len(self.system.library.books), 2)
+
+    def test_duplicate_book_id_rejected(self):
+        with self.assertRaises(ValueError):
+            self.system.library.books.append(Book(1, "Дубликат", "Автор", 2000))
+
+    def test_status_index_follows_borrow_and_return(self):
+        borrowing = self.reader.borrow_book(self.book1, self.librarian, self.return_date)
+        self.assertEqual(self.system.library.find_books_by_status("Выдана"), [self.book1])
+        self.reader.return_book(borrowing.id)
+        self.assertEqual(self.system.library.find_books_by_status("Выдана"), [])
+        self.assertIn(self.book1, self.system.library.find_books_by_status("доступна"))
+
+    def test_borrowing_ids_are_unique_across_readers(self):
+        first = self.reader.borrow_book(self.book1, self.librarian, self.return_date)
+        second = self.other_reader.borrow_book(self.book2, self.librarian, self.return_date)
+        self.reader.return_book(first.id)
+        third = self.reader.borrow_book(self.book3, self.librarian, self.return_date)
+        self.assertEqual(len({first.id, second.id, third.id}), 3)
+        self.assertIs(self.system.get_borrowing(second.id), second)
+        self.assertEqual(self.system.find_borrowings_by_reader(1), [third])
+
+    def test_return_unknown_borrowing(self):
+        self.reader.return_book(99)
+        self.assertEqual(len(self.reader.borrowings), 0)
+
+
+class TestDueDates(unittest.TestCase):
+    def setUp(self):
+        self.system = LibrarySystem()
+        self.librarian = Librarian(1, "Петрова Анна", "LIB001")
+        self.system.library.librarians.append(self.librarian)
+        self.reader = Reader(1, "Иванов Сергей", "+79991234567")
+        self.system.readers.append(self.reader)
+        self.today = date.today()
+        self.borrowings = []
+        for i, days in enumerate((-5, -1, 0, 3, 10), start=1):
+            book = Book(i, f"Книга {i}", "Автор", 2000)
+            self.system.library.books.append(book)
+            self.borrowings.append(self.reader.borrow_book(book, self.librarian, self.today + timedelta(days=days)))
+
+    def test_overdue_and_due_within(self):
+        self.assertEqual(self.system.overdue(self.today), self.borrowings[:2])
+        self.assertEqual(self.system.due_within(3, self.today), self.borrowings[2:4])
+
+    def test_return_removes_from_index(self):
+        self.reader.return_book(self.borrowings[0].id)
+        self.assertEqual(self.system.overdue(self.today), [self.borrowings[1]])
+        self.system.readers.remove(self.reader)
+        self.assertEqual(self.system.overdue(self.today + timedelta(days=30)), [])
+
+    def test_overdue_cursor_reports_each_borrowing_once(self):
+        cursor = self.system.overdue_cursor()
+        self.assertEqual(cursor.poll(self.today), self.borrowings[:2])
+        self.assertEqual(cursor.poll(self.today), [])
+        self.assertEqual(cursor.poll(self.today + timedelta(days=4)), self.borrowings[2:4])
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.library = LibrarySystem().library
+        self.library.books.extend([
+            Book(1, "Мастер и Маргарита", "Михаил Булгаков", 1966),
+            Book(2, "Белая гвардия", "Михаил Булгаков", 1925),
+            Book(3, "Ёжик в тумане", "Сергей Козлов", 1969),
+            Book(4, "Краткая история времени", "Стивен Хокинг", 1988),
+        ])
+
+    def ids(self, query):
+        return [book.id for book in self.library.search_books(query)]
+
+    def test_multi_term_and_case(self):
+        self.assertEqual(self.ids("булгаков"), [1, 2])
+        self.assertEqual(self.ids("МИХАИЛ гвардия"), [2])
+        self.assertEqual(self.ids("булгаков хокинг"), [])
+
+    def test_prefix_and_yo_normalization(self):
+        self.assertEqual(self.ids("булг*"), [1, 2])
+        self.assertEqual(self.ids("ежик"), [3])
+        self.assertEqual(self.ids("ёж*"), [3])
+        self.assertEqual(self.ids("ист* вр*"), [4])
+
+    def test_incremental_updates(self):
+        self.library.add_book(Book(5, "Собачье сердце", "Михаил Булгаков", 1925))
+        self.assertEqual(self.ids("булгаков"), [1, 2, 5])
+        self.assertEqual(self.ids("соба*"), [5])
+        self.library.remove_book(5)
+        self.assertEqual(self.ids("соба*"), [])
+        self.library.add_book(Book(6, "Собака Баскервилей", "Артур Конан Дойл", 1902))
+        self.assertEqual(self.ids("соба*"), [6])
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.system = LibrarySystem()
+        self.events = self.system.events = BufferedSink()
+        self.system.library.books.extend(Book(i, f"Книга {i}", "Автор", 2000) for i in range(1, 4))
+        self.system.library.librarians.append(Librarian(1, "Петрова Анна", "LIB001"))
+        self.system.readers.extend([Reader(1, "Иванов Сергей", "+79991234567"),
+                                    Reader(2, "Смирнова Ольга", "+79990000000")])
+        self.return_date = date.today() + timedelta(days=14)
+
+    def test_batch_applies_all_operations(self):
+        first, second, added, removed = self.system.apply_batch([
+            BorrowBook(1, 1, 1, self.return_date),
+            BorrowBook(2, 2, 1, self.return_date),
+            AddBook(Book(4, "Новая книга", "Автор", 2024)),
+            RemoveBook(3),
+        ])
+        self.assertEqual((first.id, second.id), (1, 2))
+        self.assertEqual(self.system.find_borrowings_by_reader(2), [second])
+        self.assertEqual(self.system.library.get_book(4), added)
+        self.assertIsNone(self.system.library.get_book(3))
+        self.assertEqual(removed.id, 3)
+        self.assertEqual(self.system.library.find_books_by_status("Выдана"), [first.book, second.book])
+
+        returned, again = self.system.apply_batch([ReturnBook(1, first.id), BorrowBook(2, 1, 1, self.return_date)])
+        self.assertIs(returned, first)
+        self.assertEqual(self.system.find_borrowings_by_reader(2), [second, again])
+        self.assertIn("Пакет применён: операций 2", self.events.messages())
+
+    def test_invalid_batch_changes_nothing(self):
+        with self.assertRaises(BatchError) as caught:
+            self.system.apply_batch([
+                BorrowBook(1, 1, 1, self.return_date),
+                BorrowBook(2, 1, 1, self.return_date),
+                RemoveBook(2),
+                BorrowBook(1, 2, 1, self.return_date),
+                AddBook(Book(1, "Дубликат", "Автор", 2000)),
+                ReturnBook(1, 99),
+            ])
+        self.assertEqual([index for index, _ in caught.exception.errors], [1, 3, 4, 5])
+        self.assertEqual(len(self.system.borrowings), 0)
+        self.assertIsNotNone(self.system.library.get_book(2))
+        self.assertEqual(len(self.events), 0)
+
+    def test_sinks_replace_print(self):
+        self.system.events = NullSink()
+        reader = self.system.get_reader(1)
+        with unittest.mock.patch("builtins.print") as printed:
+            borrowing = reader.borrow_book(self.system.library.get_book(1), self.system.library.get_librarian(1),
+                                           self.return_date)
+            reader.return_book(borrowing.id)
+        printed.assert_not_called()
+
+        self.system.events = sink = BufferedSink()
+        self.system.library.remove_book(1)
+        self.assertEqual(sink.messages(), ["Книга с ID 1 удалена"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import patch
+import metrics
+import parallel_load
+from benchmark import generate_system
+from data_manager import DataManager
+from events import NullSink
+from models import Book, Borrowing, LibrarySystem
+from test_data_manager import legacy_data
+
+
+class TestParallelLoad(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.system = generate_system(books=120, readers=9, librarians=3, borrowings=300, seed=4)
+        self.system.events = NullSink()
+        for reader in self.system.readers:
+            for borrowing_id in list(reader.borrowings.ids())[::4]:
+                reader.return_book(borrowing_id)
+        # Строки с символами разметки и выдача без книги и библиотекаря
+        self.system.library.books.append(Book(1000, 'Заголовок "в кавычках"\n    {', "<Автор> & },", 1999))
+        self.system.borrowings.append(Borrowing(10000, self.system.borrowings[0].borrow_date,
+                                                self.system.borrowings[0].return_date))
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def load(self, loader, filename: str, **kwargs) -> LibrarySystem:
+        system = LibrarySystem()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader(filename, system, **kwargs)
+        return system
+
+    def assert_same_as_serial(self, filename: str, serial, parallel, partitions: bool = True):
+        expected = self.load(serial, filename)
+        with metrics.collect() as collected:
+            loaded = self.load(parallel, filename, workers=2, partition_size=2048)
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(expected))
+        self.assertEqual(collected.counters.get("partitions", 0) > 4, partitions)
+        for reader in loaded.readers:
+            for borrowing in reader.borrowings:
+                self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+                self.assertIs(borrowing.book, loaded.library.get_book(borrowing.book.id))
+        for librarian in loaded.library.librarians:
+            for borrowing in librarian.managed_borrowings:
+                self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+
+    def save(self, saver, name: str, system=None, **kwargs) -> str:
+        filename = self.path(name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            saver(system if system is not None else self.system, filename, **kwargs)
+        return filename
+
+    def test_json_matches_serial_loader(self):
+        for saver in (DataManager.save_to_json, DataManager.save_to_json_stream):
+            filename = self.save(saver, "library_system.json")
+            self.assert_same_as_serial(filename, DataManager.load_from_json, parallel_load.load_from_json)
+
+    def test_xml_matches_serial_loader(self):
+        for saver in (DataManager.save_to_xml, DataManager.save_to_xml_stream):
+            filename = self.save(saver, "library_system.xml")
+            self.assert_same_as_serial(filename, DataManager.load_from_xml, parallel_load.load_from_xml)
+
+    def test_empty_sections_and_fallback(self):
+        system = LibrarySystem()
+        system.library.books.append(Book(1, "Единственная", "Автор", 2000))
+        filename = self.save(DataManager.save_to_json, "empty.json", system)
+        loaded = self.load(parallel_load.load_from_json, filename, partition_size=16)
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(system))
+        filename = self.save(DataManager.save_to_xml, "empty.xml", system)
+        loaded = self.load(parallel_load.load_from_xml, filename, partition_size=16)
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(system))
+
+        # Компактный JSON другой разметки загружается обычным загрузчиком
+        filename = self.save(DataManager.save_to_json_stream, "compact.json", compact=True)
+        self.assert_same_as_serial(filename, DataManager.load_from_json, parallel_load.load_from_json,
+                                   partitions=False)
+
+    def test_legacy_repeated_borrowing_ids(self):
+        filename = self.path("legacy.json")
+        DataManager.write_json(legacy_data(), filename)
+        with metrics.collect() as collected:
+            loaded = self.load(parallel_load.load_from_json, filename, workers=2, partition_size=64)
+        self.assertGreater(collected.counters["partitions"], 4)
+        expected = self.load(DataManager.load_from_json, filename)
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(expected))
+        self.assertEqual(sorted(loaded.borrowings.ids()), [1, 2, 3])
+
+    def test_partitions_in_flight_are_bounded(self):
+        counts = {"outstanding": 0, "max": 0, "submitted": 0}
+
+        class CountingFuture(Future):
+            def result(self, timeout=None):
+                counts["outstanding"] -= 1
+                return super().result(timeout)
+
+        class CountingExecutor(ThreadPoolExecutor):
+            # Отрезки разбираются в потоках; учитываются отданные, но ещё не полученные результаты
+            def submit(self, fn, *args):
+                future = CountingFuture()
+                future.set_result(fn(*args))
+                counts["submitted"] += 1
+                counts["outstanding"] += 1
+                counts["max"] = max(counts["max"], counts["outstanding"])
+                return future
+
+        filename = self.save(DataManager.save_to_json, "library_system.json")
+        with patch.object(parallel_load, "ProcessPoolExecutor", CountingExecutor), metrics.collect() as collected:
+            loaded = self.load(parallel_load.load_from_json, filename, workers=2, partition_size=2048)
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(self.system))
+        self.assertGreater(collected.counters["partitions"], 4 * parallel_load.IN_FLIGHT_PER_WORKER)
+        self.assertEqual(counts["submitted"], collected.counters["partitions"])
+        self.assertEqual(counts["max"], 2 * parallel_load.IN_FLIGHT_PER_WORKER)
+        self.assertEqual(counts["outstanding"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from benchmark import generate_system
+from data_manager import DataManager
+from events import NullSink
+from models import Book, LibrarySystem
+from shard_storage import ShardedStorage
+
+
+class TestShardedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "shards")
+        self.system = generate_system(books=100, readers=7, librarians=3, borrowings=200, seed=2)
+        self.system.events = NullSink()
+        self.storage = ShardedStorage(self.directory, shard_size=16, workers=4)
+
+    def load(self):
+        system = LibrarySystem()
+        ShardedStorage(self.directory, shard_size=16).load(system)
+        return system
+
+    def test_round_trip(self):
+        written = self.storage.save(self.system)
+        self.assertEqual(written, 7 + 1 + 1 + 13)
+        self.assertEqual(len(self.system.changes), 0)
+        loaded = self.load()
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(self.system))
+        self.assertEqual(len(loaded.changes), 0)
+        for reader in loaded.readers:
+            for borrowing in reader.borrowings:
+                self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+                self.assertIs(borrowing.librarian.managed_borrowings.get(borrowing.id), borrowing)
+
+    def test_changes_recorded_only_after_save(self):
+        # generate_system меняет коллекции, но без базового хранилища отметки не копятся
+        self.assertIsNone(self.system.changes.baseline)
+        self.assertEqual(len(self.system.changes), 0)
+        self.storage.save(self.system)
+        self.system.library.remove_book(1)
+        self.assertEqual(len(self.system.changes), 1)
+
+        # Загрузка из другого источника сбрасывает отметки и базовое хранилище
+        DataManager._load_from_dict(DataManager.to_dict(self.system), self.system)
+        self.assertIsNone(self.system.changes.baseline)
+        self.assertEqual(len(self.system.changes), 0)
+
+    def test_incremental_save_rewrites_only_dirty_shards(self):
+        self.storage.save(self.system)
+        reader = self.system.get_reader(1)
+        book = self.system.library.find_books_by_status("доступна")[0]
+        borrowing = reader.borrow_book(book, self.system.library.get_librarian(1), date.today() + timedelta(days=14))
+        # Новая выдача и статус книги: один шард выдач и один шард книг
+        self.assertEqual(self.storage.save(self.system), 2)
+        self.assertEqual(self.storage.save(self.system), 0)
+
+        reader.return_book(borrowing.id)
+        returned = reader.borrowings[0]
+        reader.return_book(returned.id)
+        self.assertLessEqual(self.storage.save(self.system), 4)
+        self.assertEqual(DataManager.to_dict(self.load()), DataManager.to_dict(self.system))
+
+    def test_removed_records_and_marked_fields(self):
+        self.storage.save(self.system)
+        for id in range(1, 17):
+            self.system.library.remove_book(id)
+        self.system.library.get_book(40).title = "Новое название"
+        self.system.changes.mark("books", 40)
+        self.storage.save(self.system)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "books", "00000000.jsonl")))
+        loaded = self.load()
+        self.assertIsNone(loaded.library.get_book(1))
+        self.assertEqual(loaded.library.get_book(40).title, "Новое название")
+
+    def test_full_save_for_other_system(self):
+        self.storage.save(self.system)
+        other = LibrarySystem()
+        other.library.books.append(Book(1, "Единственная", "Автор", 2000))
+        self.assertEqual(self.storage.save(other), 1)
+        loaded = self.load()
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(other))
+        self.assertEqual(os.listdir(os.path.join(self.directory, "borrowings")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
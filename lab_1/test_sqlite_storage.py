@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from data_manager import DataManager
+from benchmark import generate_system
+from models import Book, LibrarySystem
+from sqlite_storage import SqliteStorage
+
+
+class TestSqliteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.system = generate_system(books=50, readers=7, librarians=3, borrowings=120, seed=1)
+        self.db_file = os.path.join(self.tmp.name, "library_system.db")
+        DataManager.save_to_sqlite(self.system, self.db_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        system = LibrarySystem()
+        storage = DataManager.load_from_sqlite(self.db_file, system)
+        self.addCleanup(storage.close)
+        return system, storage
+
+    def test_round_trip_matches_json(self):
+        loaded, _ = self.load()
+        self.assertEqual(DataManager.to_dict(loaded), DataManager.to_dict(self.system))
+        # Одна и та же выдача у читателя, библиотекаря и в system.borrowings
+        for reader in loaded.readers:
+            for borrowing in reader.borrowings:
+                self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+                self.assertIs(borrowing.librarian.managed_borrowings.get(borrowing.id), borrowing)
+
+    def test_borrowings_are_loaded_lazily(self):
+        loaded, _ = self.load()
+        reader = loaded.readers[0]
+        self.assertFalse(reader.borrowings.is_loaded)
+        self.assertFalse(loaded.borrowings.is_loaded)
+        self.assertEqual([b.id for b in reader.borrowings], [b.id for b in self.system.readers[0].borrowings])
+        self.assertTrue(reader.borrowings.is_loaded)
+        self.assertFalse(loaded.readers[1].borrowings.is_loaded)
+        self.assertEqual(loaded._next_borrowing_id(), self.system._next_borrowing_id())
+
+    def test_point_operations_stay_lazy(self):
+        loaded, storage = self.load()
+        reader = loaded.readers[0]
+        librarian = loaded.library.librarians[0]
+        book = loaded.library.find_books_by_status("доступна")[0]
+        borrowing = reader.borrow_book(book, librarian, date.today() + timedelta(days=14))
+        storage.record_borrow(reader, borrowing)
+        existing = self.system.borrowings[5]
+        self.assertEqual(loaded.get_borrowing(existing.id).book.id, existing.book.id)
+        self.assertIsNone(loaded.get_borrowing(10 ** 6))
+        self.assertIs(loaded.get_borrowing(borrowing.id), borrowing)
+        for collection in (reader.borrowings, librarian.managed_borrowings, loaded.borrowings):
+            self.assertFalse(collection.is_loaded)
+        # Из базы поднята только запрошенная выдача
+        self.assertEqual(len(storage._borrowings), 2)
+
+        # После загрузки новая выдача стоит на своём месте и не дублируется
+        self.assertEqual([b.id for b in reader.borrowings],
+                         [b.id for b in self.system.readers[0].borrowings] + [borrowing.id])
+        self.assertEqual(len(loaded.borrowings), len(self.system.borrowings) + 1)
+        self.assertIs(librarian.managed_borrowings.get(borrowing.id), borrowing)
+
+    def test_overdue_query(self):
+        _, storage = self.load()
+        as_of = date.today() + timedelta(days=7)
+        self.assertEqual([b.id for b in storage.overdue(as_of)],
+                         [b.id for b in self.system.overdue(as_of)])
+
+    def test_point_writes(self):
+        loaded, storage = self.load()
+        reader = loaded.readers[0]
+        librarian = loaded.library.librarians[0]
+        book = Book(1000, "Новая книга", "Автор", 2024)
+        with storage.batch():
+            loaded.library.books.append(book)
+            storage.add_book(book)
+            borrowing = reader.borrow_book(book, librarian, date.today() + timedelta(days=14))
+            storage.record_borrow(reader, borrowing)
+        returned = reader.borrowings[0]
+        reader.return_book(returned.id)
+        storage.record_return(reader, returned)
+
+        reloaded, _ = self.load()
+        self.assertEqual(DataManager.to_dict(reloaded), DataManager.to_dict(loaded))
+
+    def test_failed_batch_is_rolled_back(self):
+        _, storage = self.load()
+        with self.assertRaises(RuntimeError):
+            with storage.batch():
+                storage.add_book(Book(1000, "Новая книга", "Автор", 2024))
+                raise RuntimeError
+        reloaded, _ = self.load()
+        self.assertIsNone(reloaded.library.get_book(1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
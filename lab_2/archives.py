@@ -0,0 +1,202 @@
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+import metrics
+
+# Сигнатуры сжатых потоков; tar распознаётся по магии ustar в заголовке первого блока
+# (старые архивы v7 без неё читаются как обычные данные). У bz2 сигнатура - заголовок
+# целиком: 'BZh', размер блока 1-9 и магия первого блока (или конца пустого потока),
+# иначе текст, начинающийся с 'BZh', приняли бы за архив
+SIGNATURES = (
+    ('gzip', b'\x1f\x8b'),
+    *(('bz2', b'BZh%d' % level + magic) for level in range(1, 10) for magic in (b'1AY&SY', b'\x17rE8P\x90')),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zip', b'PK\x03\x04'),
+)
+TAR_MAGIC_OFFSET = 257
+TAR_MAGIC = b'ustar'
+# Числовые поля заголовка tar (режим, uid, gid, размер, время, контрольная сумма):
+# восьмеричные цифры, пробелы и нули; первый байт 0x80 или 0xff - двоичная запись GNU
+TAR_NUMERIC_FIELDS = ((100, 108), (108, 116), (116, 124), (124, 136), (136, 148), (148, 156))
+TAR_OCTAL = frozenset(b'01234567 \0')
+HEAD_SIZE = tarfile.BLOCKSIZE
+
+# Распаковщики читают сжатый поток блоками и отдают данные по мере распаковки
+DECOMPRESSORS = {
+    'gzip': lambda stream: gzip.GzipFile(fileobj=stream, mode='rb'),
+    'bz2': lambda stream: bz2.BZ2File(stream, mode='rb'),
+    'xz': lambda stream: lzma.LZMAFile(stream, mode='rb'),
+}
+
+# Ошибки чтения повреждённых или обрезанных архивов
+ERRORS = (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile, lzma.LZMAError)
+
+# Глубже этого уровня вложенные архивы (например, gzip в gzip) сканируются как есть
+MAX_NESTING = 8
+# Разделитель пути архива и члена в отчёте: logs.tar.gz!app/app.log
+MEMBER_SEPARATOR = '!'
+
+
+def detect_format(head):
+    """Формат по первым байтам потока: 'gzip', 'bz2', 'xz', 'zip', 'tar' или None"""
+    for name, signature in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    if head[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + len(TAR_MAGIC)] == TAR_MAGIC:
+        return 'tar'
+    return None
+
+
+def _could_be_tar(head):
+    """Может ли неполное начало потока оказаться заголовком tar с магией ustar"""
+    for start, end in TAR_NUMERIC_FIELDS:
+        field = head[start:end]
+        if field and field[0] not in (0x80, 0xff) and not TAR_OCTAL.issuperset(field):
+            return False
+    return TAR_MAGIC.startswith(head[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + len(TAR_MAGIC)])
+
+
+def _undecided(head):
+    """Нужно ли дочитать начало потока, чтобы определить формат.
+
+    Раньше HEAD_SIZE останавливаемся только на полной сигнатуре или когда
+    начало уже не может быть ни сигнатурой, ни заголовком tar: первые 100
+    байт (имя члена) могут быть любыми, дальше идут восьмеричные поля и магия.
+    Живой лог (tail -f) поэтому ждёт не больше чем до первой строки длиннее
+    имени, где числовые поля не сходятся.
+    """
+    if any(head.startswith(signature) for _, signature in SIGNATURES):
+        return False
+    if any(signature.startswith(head) for _, signature in SIGNATURES):
+        return True
+    return _could_be_tar(head)
+
+
+class _Recorder(io.RawIOBase):
+    """Несмещаемый поток, который запоминает прочитанные байты, пока их может понадобиться отдать заново"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._read = getattr(stream, 'read1', stream.read)
+        self.recorded = bytearray()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._read(len(buffer))
+        buffer[:len(data)] = data
+        if self.recorded is not None:
+            self.recorded += data
+        return len(data)
+
+    def stop(self):
+        self.recorded = None
+
+
+class _Replay(io.RawIOBase):
+    """Несмещаемый поток, перед которым заново отдаются уже прочитанные байты"""
+
+    def __init__(self, head, stream):
+        self._head = memoryview(head)
+        self._stream = stream
+        self._read = getattr(stream, 'read1', stream.read)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._head:
+            size = min(len(buffer), len(self._head))
+            buffer[:size] = self._head[:size]
+            self._head = self._head[size:]
+            return size
+        data = self._read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _peek_head(stream, rewindable):
+    """Читает начало потока для определения формата и возвращает (начало, поток с начала)"""
+    position = stream.tell() if rewindable else None
+    read = getattr(stream, 'read1', stream.read)
+    head = b''
+    while len(head) < HEAD_SIZE and _undecided(head):
+        data = read(HEAD_SIZE - len(head))
+        if not data:
+            break
+        head += data
+    if position is not None:
+        stream.seek(position)
+        return head, stream
+    return head, io.BufferedReader(_Replay(head, stream))
+
+
+def iter_members(stream, name, depth=0):
+    """Перебирает содержимое потока с распаковкой на лету: (имя члена, двоичный поток).
+
+    gzip, bz2 и xz распаковываются прозрачно, члены tar и zip (в том числе
+    вложенные: .tar.gz, .gz внутри .zip) отдаются по одному под именами вида
+    архив!член. Поток члена действителен только до перехода к следующему:
+    tar читается последовательно, без перемотки. zip требует перемотки,
+    поэтому zip внутри несмещаемого или сжатого потока (stdin, член tar,
+    .zip.gz) пропускается со счётчиком archive.skipped.
+    """
+    return _iter_members(stream, name, 0, stream.seekable())
+
+
+def _iter_members(stream, name, depth, rewindable):
+    head, stream = _peek_head(stream, rewindable)
+    kind = detect_format(head) if depth < MAX_NESTING else None
+
+    if kind in DECOMPRESSORS:
+        position = stream.tell() if rewindable else None
+        source = stream if rewindable else _Recorder(stream)
+        decompressed = DECOMPRESSORS[kind](source)
+        try:
+            decompressed.peek(1)
+        except ERRORS:
+            # Сигнатура совпала случайно: распаковщик не смог начать, поток сканируется как есть
+            decompressed.close()
+            metrics.count("archive.undecodable")
+            if rewindable:
+                stream.seek(position)
+                yield name, stream
+            else:
+                yield name, io.BufferedReader(_Replay(bytes(source.recorded), stream))
+            return
+        if not rewindable:
+            source.stop()
+        # Распаковщики перематываются повторной распаковкой с начала, поэтому
+        # их поток считается несмещаемым
+        with decompressed:
+            yield from _iter_members(decompressed, name, depth + 1, False)
+    elif kind == 'tar':
+        with tarfile.open(fileobj=stream, mode='r|') as archive:
+            for info in archive:
+                if info.isfile():
+                    metrics.count("archive.members")
+                    yield from _iter_members(archive.extractfile(info),
+                                             name + MEMBER_SEPARATOR + info.name, depth + 1, False)
+    elif kind == 'zip':
+        if not rewindable:
+            metrics.count("archive.skipped")
+            return
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    metrics.count("archive.members")
+                    with archive.open(info) as member:
+                        yield from _iter_members(member, name + MEMBER_SEPARATOR + info.filename,
+                                                 depth + 1, True)
+    else:
+        yield name, stream
+
+
+def is_archive(filename):
+    """Сжат ли файл или является ли он архивом"""
+    with open(filename, 'rb') as f:
+        return detect_format(_peek_head(f, True)[0]) is not None
@@ -0,0 +1,168 @@
+import json
+import os
+from collections import OrderedDict
+import metrics
+
+# Номеров в кэше проверок; в логах и на страницах одни и те же номера повторяются постоянно
+VALIDATION_CACHE_SIZE = 64 * 1024
+# Объём записей кэша страниц (в байтах JSON), сверх которого вытесняются давно не нужные страницы
+PAGE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+PAGE_CACHE_VERSION = 1
+
+
+class LRUCache:
+    """Ограниченный кэш результатов по ключу с вытеснением давно не использованных.
+
+    Считает попадания, промахи и вытеснения (атрибуты и метрики name.*).
+    Без блокировок: гонка потоков может лишь посчитать значение дважды.
+    """
+
+    def __init__(self, maxsize, name='cache'):
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        """Значение для key; при промахе - compute(key), которое запоминается"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                # Ключ успел вытеснить другой поток
+                pass
+            if metrics.active is not None:
+                metrics.active.count(self.name + '.hits')
+            return value
+
+        self.misses += 1
+        value = self._data[key] = compute(key)
+        while len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break
+            self.evictions += 1
+        if metrics.active is not None:
+            metrics.active.count(self.name + '.misses')
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+
+class PageCache:
+    """Кэш результатов сканирования веб-страниц в файле JSON для условных запросов.
+
+    Для URL хранятся ETag, Last-Modified и найденные номера. Запрос к
+    закэшированной странице идёт с If-None-Match/If-Modified-Since; ответ 304
+    значит, что ни тело, ни повторное сканирование не нужны. В файле лежат
+    номера карт, поэтому он создаётся с правами 0600. Страницы без валидаторов
+    не кэшируются; при превышении max_bytes вытесняются давно не нужные.
+    """
+
+    def __init__(self, filename, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        # url -> запись; порядок - от давно не использованных к недавним
+        self._pages = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Нет файла или он испорчен: начинаем с пустого кэша
+            return
+        if isinstance(data, dict) and data.get("version") == PAGE_CACHE_VERSION:
+            for page in data.get("pages", []):
+                self._add(page)
+
+    def _add(self, page):
+        url = page["url"]
+        if url in self._pages:
+            self._bytes -= self._sizes.pop(url)
+            del self._pages[url]
+        size = len(json.dumps(page, ensure_ascii=False).encode('utf-8'))
+        self._pages[url] = page
+        self._sizes[url] = size
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._pages:
+            old_url, _ = self._pages.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_url)
+            self.evictions += 1
+            metrics.count('page_cache.evictions')
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __contains__(self, url):
+        return url in self._pages
+
+    def conditional_headers(self, url):
+        """Заголовки условного запроса для закэшированной страницы (иначе пустые)"""
+        page = self._pages.get(url)
+        if page is None:
+            return {}
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def revalidated(self, url):
+        """Сервер ответил 304: возвращает сохранённые номера (цифрами)"""
+        page = self._pages[url]
+        self._pages.move_to_end(url)
+        self.hits += 1
+        metrics.count('page_cache.hits')
+        return list(page["cards"])
+
+    def store(self, url, headers, cards):
+        """Запоминает результат полной загрузки страницы; headers - заголовки ответа"""
+        self.misses += 1
+        metrics.count('page_cache.misses')
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            # Без валидаторов условный запрос невозможен; старая запись больше не верна
+            if url in self._pages:
+                self._bytes -= self._sizes.pop(url)
+                del self._pages[url]
+            return
+        self._add({"url": url, "etag": etag, "last_modified": last_modified, "cards": list(cards)})
+
+    def save(self):
+        """Атомарно записывает кэш на диск"""
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.filename + ".tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": PAGE_CACHE_VERSION, "pages": list(self._pages.values())}, f,
+                      ensure_ascii=False)
+        os.replace(temp_path, self.filename)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "pages": len(self._pages), "bytes": self._bytes, "max_bytes": self.max_bytes}
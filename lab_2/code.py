@@ -1,5 +1,34 @@
-import re
+import argparse
+import contextlib
+import os
+import sys
 import requests
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+from archives import is_archive, iter_members
+from cache import PageCache, VALIDATION_CACHE_SIZE, LRUCache
+from matcher import MAX_MATCH_LENGTH, iter_card_spans, iter_card_spans_bytes
+
+# Потоковый режим: вход читается блоками, между блоками переносится хвост,
+# достаточный для номера с разделителями, проверки следующей группы
+# (разделитель и цифра) и соседних символов (до 4 байт UTF-8 с каждой стороны)
+STREAM_BUFFER_SIZE = 64 * 1024
+STREAM_TAIL = MAX_MATCH_LENGTH + 2 + 4
+STREAM_LOOKBEHIND = 4
+
+# Параллельный режим: файл режется на куски, к каждому добавляется перекрытие,
+# чтобы номер на стыке кусков был найден ровно одним процессом
+PARALLEL_THRESHOLD = 32 * 1024 * 1024
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_OVERLAP = 128
+
+# Результаты is_valid_card_number по цифрам номера (ручной ввод, luhn_batch).
+# Сканеры текста и файлов проверяют номера табличным luhn_ok из matcher без кэша:
+# он быстрее поиска в кэше
+VALIDATION_CACHE = LRUCache(VALIDATION_CACHE_SIZE, 'validation_cache')
+# Кэш страниц для web_input_mode: путь к файлу JSON. В нём хранятся найденные
+# номера, поэтому кэш включается явно переменной окружения
+PAGE_CACHE_FILE = os.environ.get('CARD_PAGE_CACHE')
 
 
 def is_valid_card_number(card_number):
@@ -11,7 +40,13 @@ def is_valid_card_number(card_number):
     """
     # Извлекаем только цифры
     digits = ''.join(filter(str.isdigit, card_number))
+    if len(digits) != 16:
+        # Кэшируются только номера нужной длины: отказ по длине и так дешёв
+        return _check_digits(digits)
+    return VALIDATION_CACHE.get(digits, _check_digits)
+
 
+def _check_digits(digits):
     # Критерий 1: ровно 16 цифр
     if len(digits) != 16:
         return False, f"Ошибка: найдено {len(digits)} цифр (нужно 16)"
@@ -36,21 +71,145 @@ def is_valid_card_number(card_number):
     return True, "Карта валидна"
 
 
+def format_card(digits):
+    """Форматирует номер для вывода (XXXX XXXX XXXX XXXX)"""
+    return ' '.join([digits[i:i + 4] for i in range(0, 16, 4)])
+
+
+def mask_card(digits):
+    """Маскирует номер для журналов: видны первые 6 и последние 4 цифры"""
+    return format_card(digits[:6] + '*' * 6 + digits[12:])
+
+
+def iter_valid_cards(text):
+    """Перебирает валидные номера карт в тексте: (позиция, цифры).
+
+    Номера, в том числе записанные группами через пробел или дефис, находятся
+    и проверяются по Луну за один проход (см. matcher.iter_card_spans).
+    """
+    with metrics.phase("match"):
+        spans = list(iter_card_spans(text))
+    for start, end, digits in spans:
+        yield start, digits
+
+
 def find_cards_in_text(text):
     """Находит валидные номера карт в тексте"""
-    # Регулярное выражение: 16 цифр, первая не 0
-    pattern = r'\b[1-9][0-9]{15}\b'
-    matches = re.findall(pattern, text)
+    return [format_card(card) for _, card in iter_valid_cards(text)]
+
+
+def scan_chunks(chunks):
+    """Ищет валидные номера карт в потоке блоков байтов.
+
+    Выдаёт (смещение в байтах, цифры) по мере чтения. В памяти держится
+    только текущий блок и короткий хвост предыдущего, поэтому объём входа не важен.
+    Для текста в UTF-8 результат совпадает с iter_valid_cards.
+    """
+    collector = metrics.active
+    carry = b''
+    carry_offset = 0   # смещение carry от начала потока
+    scanned = 0        # все совпадения, начинающиеся раньше, уже обработаны
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if collector is not None:
+            collector.count("bytes_read", len(chunk))
+        data = carry + chunk
+        # Совпадение, начавшееся ближе STREAM_TAIL к концу, может продолжиться в следующем блоке
+        limit = len(data) - STREAM_TAIL
+        with metrics.phase("match"):
+            spans = list(iter_card_spans_bytes(data, max(scanned - carry_offset, 0), max(limit, 0)))
+        for start, end, digits in spans:
+            yield carry_offset + start, digits
+        scanned = max(scanned, carry_offset + max(limit, 0))
+        keep_from = max(limit - STREAM_LOOKBEHIND, 0)
+        carry = data[keep_from:]
+        carry_offset += keep_from
+
+    for start, end, digits in iter_card_spans_bytes(carry, max(scanned - carry_offset, 0)):
+        yield carry_offset + start, digits
+
+
+def scan_stream(stream, buffer_size=STREAM_BUFFER_SIZE):
+    """Ищет номера карт в двоичном потоке (файл, stdin, сокет), читая его блоками"""
+    # read1 отдаёт то, что уже пришло, не дожидаясь заполнения буфера
+    read = getattr(stream, 'read1', stream.read)
+    return scan_chunks(iter(lambda: read(buffer_size), b''))
+
+
+def scan_file(filename, buffer_size=STREAM_BUFFER_SIZE):
+    """Ищет номера карт в файле с постоянным расходом памяти"""
+    with open(filename, 'rb') as f:
+        yield from scan_stream(f, buffer_size)
+
+
+def scan_archive(filename, buffer_size=STREAM_BUFFER_SIZE):
+    """Ищет номера карт в сжатом файле или архиве, распаковывая его на лету.
+
+    Выдаёт (член архива, смещение в распакованном члене, цифры). На диск ничего
+    не распаковывается, в памяти держатся только буферы распаковщиков и сканера.
+    Обычный файл сканируется как один член с именем файла.
+    """
+    with open(filename, 'rb') as f:
+        yield from scan_members(f, filename, buffer_size)
 
-    valid_cards = []
-    for card in matches:
-        is_valid, message = is_valid_card_number(card)
-        if is_valid:
-            # Форматируем для вывода (XXXX XXXX XXXX XXXX)
-            formatted = ' '.join([card[i:i + 4] for i in range(0, 16, 4)])
-            valid_cards.append(formatted)
 
-    return valid_cards
+def scan_members(stream, name, buffer_size=STREAM_BUFFER_SIZE):
+    """То же для уже открытого двоичного потока (например, stdin)"""
+    for member, member_stream in iter_members(stream, name):
+        for offset, digits in scan_stream(member_stream, buffer_size):
+            yield member, offset, digits
+
+
+def _char_start(f, offset, size):
+    """Сдвигает смещение вперёд до начала символа UTF-8"""
+    if offset <= 0 or offset >= size:
+        return max(0, min(offset, size))
+    f.seek(offset)
+    tail = f.read(4)
+    for i, byte in enumerate(tail):
+        if byte & 0xC0 != 0x80:
+            return offset + i
+    return offset + len(tail)
+
+
+def _scan_chunk(task):
+    """Сканирует кусок файла [start, end) с перекрытием по краям.
+
+    Номер засчитывается куску, в котором начинается, поэтому совпадения
+    в перекрытии, принадлежащие соседям, отбрасываются.
+    """
+    filename, start, end = task
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        lo = _char_start(f, start - CHUNK_OVERLAP, size)
+        hi = _char_start(f, end + CHUNK_OVERLAP, size)
+        f.seek(lo)
+        data = f.read(hi - lo)
+
+    before = data[:start - lo].decode('utf-8', errors='replace')
+    owned = data[start - lo:end - lo].decode('utf-8', errors='replace')
+    after = data[end - lo:].decode('utf-8', errors='replace')
+    text = before + owned + after
+    first, last = len(before), len(before) + len(owned)
+    return [format_card(card) for position, card in iter_valid_cards(text) if first <= position < last]
+
+
+def find_cards_in_file_parallel(filename, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """Находит валидные номера карт в файле, сканируя куски в пуле процессов.
+
+    Результат совпадает с find_cards_in_text для всего файла и идёт в порядке файла.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        bounds = sorted({_char_start(f, offset, size) for offset in range(0, size, chunk_size)} | {size})
+    tasks = [(filename, start, end) for start, end in zip(bounds, bounds[1:])]
+
+    cards = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_cards in executor.map(_scan_chunk, tasks):
+            cards.extend(chunk_cards)
+    return cards
 
 
 # 1. Режим пользовательского ввода
@@ -74,8 +233,7 @@ def user_input_mode():
         if is_valid:
             # Форматируем для вывода
             digits = ''.join(filter(str.isdigit, card_input))
-            formatted = ' '.join([digits[i:i + 4] for i in range(0, 16, 4)])
-            cards.append(formatted)
+            cards.append(format_card(digits))
             print(message)
         else:
             print(message)
@@ -92,12 +250,29 @@ def file_input_mode():
     filename = input("Введите имя файла: ").strip()
 
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            content = file.read()
-
-        cards = find_cards_in_text(content)
-
-        print(f"\nЗагружено {len(content)} символов из файла")
+        size = os.path.getsize(filename)
+        if is_archive(filename):
+            # Архивы и сжатые логи распаковываются в потоке, без временных файлов
+            cards = []
+            found = {}
+            for member, _, card in scan_archive(filename):
+                cards.append(format_card(card))
+                found[member] = found.get(member, 0) + 1
+            print(f"\nЗагружено {size} байт из архива")
+            for member, count in found.items():
+                print(f"  {member}: {count}")
+            return cards
+
+        if size >= PARALLEL_THRESHOLD:
+            # Большие файлы сканируются параллельно на всех ядрах
+            cards = find_cards_in_file_parallel(filename)
+            print(f"\nЗагружено {size} байт из файла (параллельно, процессов: {os.cpu_count()})")
+            return cards
+
+        # Файл читается блоками, целиком в память он не загружается
+        cards = [format_card(card) for _, card in scan_file(filename)]
+
+        print(f"\nЗагружено {size} байт из файла")
         return cards
 
     except FileNotFoundError:
@@ -115,16 +290,44 @@ def web_input_mode():
     print("=" * 50)
 
     url = input("Введите URL: ").strip()
+    page_cache = PageCache(PAGE_CACHE_FILE) if PAGE_CACHE_FILE else None
 
     try:
         print(f"Загружаем страницу: {url}")
-        response = requests.get(url, timeout=10)
+        # Для страницы из кэша запрос условный: неизменённую сервер не отдаёт
+        headers = page_cache.conditional_headers(url) if page_cache is not None else {}
+        response = requests.get(url, timeout=10, stream=True, headers=headers)
         response.raise_for_status()  # Проверяем успешность запроса
 
-        cards = find_cards_in_text(response.text)
-
-        print(f"\nЗагружено {len(response.text)} символов с веб-страницы")
-        return cards
+        if response.status_code == 304:
+            response.close()
+            if page_cache is not None and url in page_cache:
+                cards = page_cache.revalidated(url)
+                page_cache.save()
+                print("\nСтраница не изменилась, результат взят из кэша")
+                return [format_card(card) for card in cards]
+            # 304 без сохранённого результата (например, от прокси): тела нет,
+            # поэтому страница запрашивается заново без условных заголовков
+            response = requests.get(url, timeout=10, stream=True)
+            response.raise_for_status()
+
+        # Тело страницы сканируется по мере получения
+        received = 0
+
+        def counted(chunks):
+            nonlocal received
+            for chunk in chunks:
+                received += len(chunk)
+                yield chunk
+
+        with response:
+            cards = [card for _, card in scan_chunks(counted(response.iter_content(STREAM_BUFFER_SIZE)))]
+        if page_cache is not None:
+            page_cache.store(url, response.headers, cards)
+            page_cache.save()
+
+        print(f"\nЗагружено {received} байт с веб-страницы")
+        return [format_card(card) for card in cards]
 
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при загрузке страницы: {e}")
@@ -185,8 +388,39 @@ def main():
                 break
 
 
+def stream_main(argv):
+    """Неинтерактивный режим: печатает номера карт из файлов или stdin по мере нахождения"""
+    parser = argparse.ArgumentParser(description="Потоковый поиск номеров карт")
+    parser.add_argument("files", nargs="*", help="файлы для проверки; '-' или пусто - stdin")
+    parser.add_argument("--metrics", action="store_true", help="вывести в stderr фазы и счётчики в JSON")
+    parser.add_argument("--profile", action="store_true", help="выполнить под cProfile, отчёт в stderr")
+    args = parser.parse_args(argv)
+
+    def run():
+        for filename in args.files or ['-']:
+            # Сжатые файлы и архивы распаковываются на лету, номера выводятся по членам
+            if filename == '-':
+                matches = scan_members(sys.stdin.buffer, filename)
+            else:
+                matches = scan_archive(filename)
+            for member, offset, card in matches:
+                print(f"{member}:{offset}: {format_card(card)}", flush=True)
+
+    with metrics.collect() if args.metrics else contextlib.nullcontext() as collected:
+        if args.profile:
+            metrics.profile(run)
+        else:
+            run()
+    if collected is not None:
+        print(collected.to_json(), file=sys.stderr)
+
+
 if __name__ == "__main__":
-    # Запускаем основную программу
-    main()
+    if len(sys.argv) > 1:
+        # Например: tail -f app.log | python code.py -
+        stream_main(sys.argv[1:])
+    else:
+        # Запускаем основную программу
+        main()
 
 # Пример URL: https://www.freeformatter.com/credit-card-number-generator-validator.html
\ No newline at end of file
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from code import scan_chunks, format_card, STREAM_BUFFER_SIZE
+
+
+class HostRateLimiter:
+    """Ограничивает частоту запросов к каждому хосту (запросов в секунду).
+
+    Время начала бронируется в start() в момент самого запроса, а не заранее:
+    запросы, дождавшиеся своей очереди к хосту, но ждавшие слот, иначе начались бы разом.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_start = {}
+
+    async def wait(self, host):
+        """Ждёт, пока к хосту можно будет начать запрос; время не бронирует"""
+        # Все корутины работают в одном цикле событий, блокировка не нужна
+        while True:
+            delay = self._next_start.get(host, 0.0) - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def start(self, host):
+        """Бронирует начало запроса к хосту сейчас; False, если его время ещё не пришло"""
+        if not self.interval:
+            return True
+        now = time.monotonic()
+        if now < self._next_start.get(host, now):
+            return False
+        self._next_start[host] = now + self.interval
+        return True
+
+
+class Crawler:
+    """Параллельно загружает страницы и ищет на них номера карт.
+
+    Одновременно выполняется не больше concurrency запросов. Каждый рабочий
+    поток держит свою requests.Session, поэтому соединения с хостом переиспользуются.
+    """
+
+    def __init__(self, concurrency=16, per_host_rate=None, timeout=10):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(per_host_rate)
+        self._local = threading.local()
+        self._sessions = []
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            self._sessions.append(session)
+        return session
+
+    def _fetch_and_scan(self, url):
+        """Выполняется в рабочем потоке: тело страницы сканируется по мере получения"""
+        received = 0
+
+        def counted(chunks):
+            nonlocal received
+            for chunk in chunks:
+                received += len(chunk)
+                yield chunk
+
+        try:
+            with self._session().get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                cards = [format_card(card) for _, card in
+                         scan_chunks(counted(response.iter_content(STREAM_BUFFER_SIZE)))]
+            return {"url": url, "cards": cards, "bytes": received, "error": None}
+        except requests.exceptions.RequestException as e:
+            return {"url": url, "cards": [], "bytes": received, "error": str(e)}
+
+    async def scan(self, urls):
+        """Возвращает результаты для каждого URL в порядке входного списка"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def scan_one(url):
+            host = urlsplit(url).netloc
+            while True:
+                # Пауза хоста выжидается до захвата слота: иначе запросы к медленному
+                # хосту заняли бы все слоты на время ожидания и остановили остальные хосты
+                await self.limiter.wait(host)
+                async with semaphore:
+                    # Пока ждали слот, время хоста мог занять другой запрос к нему
+                    if self.limiter.start(host):
+                        return await loop.run_in_executor(executor, self._fetch_and_scan, url)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                return await asyncio.gather(*(scan_one(url) for url in urls))
+            finally:
+                for session in self._sessions:
+                    session.close()
+                self._sessions.clear()
+
+
+def scan_urls(urls, concurrency=16, per_host_rate=None, timeout=10):
+    """Синхронная обёртка над Crawler.scan"""
+    return asyncio.run(Crawler(concurrency, per_host_rate, timeout).scan(list(urls)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск номеров карт на множестве веб-страниц")
+    parser.add_argument("url_list", help="файл со списком URL, по одному в строке")
+    parser.add_argument("--concurrency", type=int, default=16, help="одновременных запросов")
+    parser.add_argument("--per-host-rate", type=float, default=None, help="запросов в секунду к одному хосту")
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    with open(args.url_list, 'r', encoding='utf-8') as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    for result in scan_urls(urls, args.concurrency, args.per_host_rate, args.timeout):
+        if result["error"]:
+            print(f"{result['url']}: ошибка: {result['error']}")
+        else:
+            print(f"{result['url']}: найдено {len(result['cards'])} ({result['bytes']} байт)")
+            for card in result["cards"]:
+                print(f"    {card}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import archives
+from code import STREAM_BUFFER_SIZE, mask_card, scan_chunks, scan_members
+
+# Файлы больше этого размера по умолчанию пропускаются
+MAX_FILE_SIZE = 64 * 1024 * 1024
+# Файл с нулевым байтом в начале считается двоичным
+SNIFF_SIZE = 8 * 1024
+# В пул процессов файлы отдаются пачками, чтобы пересылка задач не стоила дороже их чтения
+PROCESS_BATCH = 64
+# Как часто (в файлах) результаты и контрольная точка сбрасываются на диск
+CHECKPOINT_INTERVAL = 1000
+
+
+def _matches(relative, patterns):
+    """Шаблон сравнивается и с путём от корня обхода, и с именем файла или каталога"""
+    name = relative.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatchcase(relative, pattern) or fnmatch.fnmatchcase(name, pattern)
+               for pattern in patterns)
+
+
+def walk_files(roots, include=(), exclude=()):
+    """Перебирает файлы в деревьях каталогов в порядке имён.
+
+    Исключённые каталоги не обходятся, символьные ссылки на каталоги не раскрываются.
+    Пути из roots, указывающие на файлы, выдаются как есть.
+    """
+    for root in roots:
+        if not os.path.isdir(root):
+            yield root
+            continue
+        stack = [(root, '')]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                with os.scandir(directory) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirectories = []
+            for entry in entries:
+                relative = prefix + entry.name
+                if exclude and _matches(relative, exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append((entry.path, relative + '/'))
+                elif entry.is_file() and (not include or _matches(relative, include)):
+                    yield entry.path
+            stack.extend(reversed(subdirectories))
+
+
+def scan_path(path, max_size=MAX_FILE_SIZE, unpack=True):
+    """Сканирует один файл; сжатые файлы и архивы распаковываются на лету (unpack).
+
+    Возвращает {"file", "matches": [(член, смещение, цифры)], "skipped", "error"},
+    skipped - "size" или "binary" для файлов, пропущенных по политике.
+    """
+    result = {"file": path, "matches": [], "skipped": None, "error": None}
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > max_size:
+                result["skipped"] = "size"
+                return result
+            head = f.read(SNIFF_SIZE)
+            if unpack and archives.detect_format(head):
+                f.seek(0)
+                result["matches"] = list(scan_members(f, path))
+            elif b'\0' in head:
+                result["skipped"] = "binary"
+            else:
+                # Прочитанное начало не перечитывается, а идёт первым блоком
+                chunks = itertools.chain([head], iter(lambda: f.read(STREAM_BUFFER_SIZE), b''))
+                result["matches"] = [(path, offset, digits) for offset, digits in scan_chunks(chunks)]
+    except archives.ERRORS as e:
+        result["error"] = str(e)
+    return result
+
+
+def _scan_batch(paths, max_size, unpack, threads):
+    """Задача пула процессов: пачка файлов читается внутри процесса несколькими потоками"""
+    if threads > 1 and len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+            return list(executor.map(lambda path: scan_path(path, max_size, unpack), paths))
+    return [scan_path(path, max_size, unpack) for path in paths]
+
+
+def scan_tree(roots, include=(), exclude=(), threads=16, processes=0,
+              max_size=MAX_FILE_SIZE, unpack=True, done=()):
+    """Сканирует деревья каталогов, выдаёт результаты scan_path по мере готовности.
+
+    Время на мелких файлах уходит на открытие и чтение, поэтому файлы
+    раздаются пулу потоков. С processes > 0 пачки файлов уходят в пул
+    процессов, и каждая читается там threads потоками. В работе одновременно
+    не больше нескольких задач на исполнителя, так что обход миллионов файлов
+    не копит очередь в памяти. Пути из done (уже обработанные) пропускаются.
+    """
+    paths = (path for path in walk_files(roots, include, exclude) if path not in done)
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        size, window = PROCESS_BATCH, processes * 2
+    else:
+        executor = ThreadPoolExecutor(max_workers=threads)
+        size, window, threads = 1, threads * 4, 1
+
+    pending = set()
+    try:
+        while True:
+            batch = list(itertools.islice(paths, size))
+            if batch:
+                pending.add(executor.submit(_scan_batch, batch, max_size, unpack, threads))
+            if pending and (len(pending) >= window or not batch):
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from future.result()
+            elif not batch:
+                return
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class Checkpoint:
+    """Журнал обработанных файлов для продолжения прерванного обхода.
+
+    Пути дописываются в файл только в flush, после сброса результатов, поэтому
+    файл никогда не отмечается обработанным раньше, чем его номера записаны.
+    После сбоя результаты файлов с последнего flush могут повториться.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.done = set()
+        self._pending = []
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line))
+                    except ValueError:
+                        # Последняя строка могла оборваться при сбое
+                        break
+
+    def mark(self, path):
+        self._pending.append(path)
+
+    def flush(self):
+        if not self._pending:
+            return
+        with open(self.filename, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(path, ensure_ascii=False) + '\n' for path in self._pending)
+        self.done.update(self._pending)
+        self._pending.clear()
+
+
+def write_results(results, out, checkpoint=None, errors=None):
+    """Пишет найденные номера в JSON Lines: {"file", "offset", "card"} с маскированным номером.
+
+    Возвращает счётчики файлов, пропусков, ошибок и номеров.
+    """
+    stats = {"files": 0, "skipped.size": 0, "skipped.binary": 0, "errors": 0, "cards": 0}
+    try:
+        for result in results:
+            stats["files"] += 1
+            if result["skipped"]:
+                stats["skipped." + result["skipped"]] += 1
+            if result["error"]:
+                stats["errors"] += 1
+                print(f"{result['file']}: ошибка: {result['error']}", file=errors or sys.stderr)
+            for member, offset, digits in result["matches"]:
+                out.write(json.dumps({"file": member, "offset": offset, "card": mask_card(digits)},
+                                     ensure_ascii=False) + '\n')
+            stats["cards"] += len(result["matches"])
+            if checkpoint is not None:
+                checkpoint.mark(result["file"])
+                if stats["files"] % CHECKPOINT_INTERVAL == 0:
+                    out.flush()
+                    checkpoint.flush()
+    finally:
+        out.flush()
+        if checkpoint is not None:
+            checkpoint.flush()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск номеров карт в деревьях каталогов")
+    parser.add_argument("roots", nargs="+", help="каталоги или файлы для проверки")
+    parser.add_argument("--include", action="append", default=[], help="glob файлов для проверки")
+    parser.add_argument("--exclude", action="append", default=[], help="glob пропускаемых файлов и каталогов")
+    parser.add_argument("--threads", type=int, default=16, help="потоков чтения")
+    parser.add_argument("--processes", type=int, default=0, help="процессов сканирования (0 - без пула процессов)")
+    parser.add_argument("--max-size", type=int, default=MAX_FILE_SIZE, help="пропускать файлы больше (байт)")
+    parser.add_argument("--no-unpack", action="store_true", help="не распаковывать архивы и сжатые файлы")
+    parser.add_argument("--output", help="файл JSON Lines (по умолчанию stdout)")
+    parser.add_argument("--checkpoint", help="файл контрольной точки для продолжения обхода")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    results = scan_tree(args.roots, args.include, args.exclude, args.threads, args.processes,
+                        args.max_size, not args.no_unpack, checkpoint.done if checkpoint else ())
+    if args.output:
+        # При продолжении обхода результаты дописываются к уже найденным
+        with open(args.output, 'a' if checkpoint else 'w', encoding='utf-8') as out:
+            stats = write_results(results, out, checkpoint)
+    else:
+        stats = write_results(results, sys.stdout, checkpoint)
+    print(f"Файлов: {stats['files']}, пропущено больших: {stats['skipped.size']}, "
+          f"двоичных: {stats['skipped.binary']}, ошибок: {stats['errors']}, номеров: {stats['cards']}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import numpy as np
+from code import is_valid_card_number
+
+CARD_LENGTH = 16
+
+# Удвоенная цифра по алгоритму Луна (с вычитанием 9 для результатов больше 9)
+LUHN_DOUBLED = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+# Удваивается каждая вторая цифра с конца, т.е. чётные позиции слева в 16-значном номере
+DOUBLED_COLUMNS = np.arange(CARD_LENGTH) % 2 == 0
+
+MESSAGE_VALID = "Карта валидна"
+MESSAGE_LEADING_ZERO = "Ошибка: первая цифра не может быть 0"
+MESSAGE_LUHN = "Ошибка: не проходит проверку алгоритмом Луна"
+
+# Коды причин в массиве reasons
+VALID, WRONG_LENGTH, LEADING_ZERO, LUHN_FAILED = range(4)
+
+
+def length_message(length):
+    return f"Ошибка: найдено {length} цифр (нужно 16)"
+
+
+def validate_digit_matrix(digits, lengths=None):
+    """Проверяет пачку номеров, заданных матрицей цифр uint8 формы (n, 16).
+
+    lengths - число цифр в каждом номере (по умолчанию все по 16); строки
+    с другой длиной считаются ошибочными, их содержимое не важно.
+    Возвращает (маска валидных, коды причин).
+    """
+    digits = np.asarray(digits, dtype=np.uint8).reshape(-1, CARD_LENGTH)
+    if lengths is None:
+        lengths = np.full(len(digits), CARD_LENGTH)
+    lengths = np.asarray(lengths)
+
+    transformed = np.where(DOUBLED_COLUMNS, LUHN_DOUBLED[np.minimum(digits, 9)], digits)
+    luhn_ok = transformed.sum(axis=1, dtype=np.uint32) % 10 == 0
+
+    reasons = np.full(len(digits), VALID, dtype=np.uint8)
+    reasons[~luhn_ok] = LUHN_FAILED
+    reasons[digits[:, 0] == 0] = LEADING_ZERO
+    reasons[lengths != CARD_LENGTH] = WRONG_LENGTH
+    return reasons == VALID, reasons
+
+
+def validate_buffer(buffer):
+    """Проверяет номера, записанные подряд по 16 ASCII-цифр без разделителей"""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if len(data) % CARD_LENGTH:
+        raise ValueError(f"Длина буфера должна быть кратна {CARD_LENGTH}")
+    digits = (data - ord('0')).reshape(-1, CARD_LENGTH)
+    if (digits > 9).any():
+        raise ValueError("Буфер должен содержать только цифры")
+    return validate_digit_matrix(digits)
+
+
+def validate_batch(candidates):
+    """Пакетный аналог is_valid_card_number: (маска валидных, сообщения).
+
+    Сообщения совпадают с теми, что возвращает is_valid_card_number.
+    """
+    # Кандидаты из сканера уже состоят из одних цифр - фильтр им не нужен
+    digit_strings = [candidate if candidate.isdigit() else ''.join(filter(str.isdigit, candidate))
+                     for candidate in candidates]
+    lengths = np.fromiter(map(len, digit_strings), dtype=np.int64, count=len(digit_strings))
+
+    # Номера нужной длины из ASCII-цифр собираются в одну матрицу; прочее - в запасной путь
+    fixed = ''.join(s if len(s) == CARD_LENGTH and s.isascii() else '0' * CARD_LENGTH
+                    for s in digit_strings)
+    digits = np.frombuffer(fixed.encode('ascii'), dtype=np.uint8).reshape(-1, CARD_LENGTH) - ord('0')
+    mask, reasons = validate_digit_matrix(digits, lengths)
+
+    messages = [MESSAGE_VALID, None, MESSAGE_LEADING_ZERO, MESSAGE_LUHN]
+    result = [messages[reason] for reason in reasons.tolist()]
+    for i in np.flatnonzero(reasons == WRONG_LENGTH).tolist():
+        result[i] = length_message(lengths[i])
+    for i, s in enumerate(digit_strings):
+        # Не-ASCII цифры (например, арабские) проверяются поштучно, как раньше
+        if len(s) == CARD_LENGTH and not s.isascii():
+            mask[i], result[i] = is_valid_card_number(s)
+    return mask, result
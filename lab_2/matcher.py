@@ -0,0 +1,120 @@
+import re
+from time import perf_counter
+import metrics
+
+CARD_LENGTH = 16
+# Самая длинная запись номера: 16 цифр и 3 разделителя
+MAX_MATCH_LENGTH = CARD_LENGTH + 3
+
+# Удвоенная цифра по алгоритму Луна (с вычитанием 9 для результатов больше 9)
+LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+# Вклад группы из 4 цифр в сумму Луна: в 16-значном номере удваиваются
+# 1-я и 3-я цифры каждой группы, так что сумма считается по группам таблицей
+LUHN_GROUP = tuple(LUHN_DOUBLED[n // 1000] + n // 100 % 10 + LUHN_DOUBLED[n // 10 % 10] + n % 10
+                   for n in range(10000))
+
+# Четыре группы по 4 цифры, между группами необязательный пробел или дефис.
+# В шаблоне нет альтернатив, поэтому движок re проходит текст за один линейный проход;
+# одинаковость разделителей, границы и сумма Луна проверяются по найденным группам
+NUMBER = re.compile(r'(?<!\w)[1-9][0-9]{3}([ -]?)[0-9]{4}([ -]?)[0-9]{4}([ -]?)[0-9]{4}')
+# Для байтов границы проверяются по ASCII, соседние не-ASCII символы - в _utf8_word_*
+NUMBER_ASCII = re.compile(r'(?<![A-Za-z0-9_])[1-9][0-9]{3}([ -]?)[0-9]{4}([ -]?)[0-9]{4}([ -]?)[0-9]{4}')
+WORD_CHAR = re.compile(r'\w')
+
+
+def luhn_ok(digits):
+    """Проверка Луна для строки из 16 ASCII-цифр"""
+    return (LUHN_GROUP[int(digits[:4])] + LUHN_GROUP[int(digits[4:8])]
+            + LUHN_GROUP[int(digits[8:12])] + LUHN_GROUP[int(digits[12:])]) % 10 == 0
+
+
+def _is_grouped_run(text, start, end, separator):
+    """Номер с разделителями - часть более длинной цепочки групп («1234 4111 1111 1111 1111»)"""
+    if not separator:
+        return False
+    if text[end:end + 1] == separator and '0' <= text[end + 1:end + 2] <= '9':
+        return True
+    return start >= 2 and text[start - 1] == separator and '0' <= text[start - 2] <= '9'
+
+
+def _utf8_word_before(data, start):
+    """Заканчивается ли перед data[start] буквенный символ UTF-8"""
+    first = start - 1
+    while first > max(0, start - 4) and data[first] & 0xC0 == 0x80:
+        first -= 1
+    previous = data[first:start].decode('utf-8', errors='replace')
+    return bool(WORD_CHAR.match(previous[-1:]))
+
+
+def _utf8_word_after(data, end):
+    following = data[end:end + 4].decode('utf-8', errors='replace')
+    return bool(WORD_CHAR.match(following[:1]))
+
+
+def _iter_spans(text, pos, stop, pattern, raw=None):
+    collector = metrics.active
+    stop = len(text) if stop is None else stop
+    search = pattern.search
+    while True:
+        if collector is None:
+            match = search(text, pos)
+        else:
+            # Поиск по шаблону и проверка Луна замеряются отдельно: фазы regex и luhn
+            started = perf_counter()
+            match = search(text, pos)
+            collector.add_time("regex", perf_counter() - started)
+        if match is None or match.start() >= stop:
+            return
+        start, end = match.span()
+        # После отказа поиск продолжается со следующего символа: номер может начинаться внутри
+        pos = start + 1
+        if collector is not None:
+            collector.count("candidates")
+
+        separator, second, third = match.groups()
+        if separator != second or separator != third or _is_grouped_run(text, start, end, separator):
+            if collector is not None:
+                collector.count("rejected.format")
+            continue
+        if raw is not None and end < len(raw) and raw[end] >= 0x80:
+            word_around = _utf8_word_after(raw, end)
+        else:
+            word_around = WORD_CHAR.match(text, end) is not None
+        if not word_around and raw is not None and start > 0 and raw[start - 1] >= 0x80:
+            word_around = _utf8_word_before(raw, start)
+        if word_around:
+            if collector is not None:
+                collector.count("rejected.word_boundary")
+            continue
+        digits = match.group().replace(separator, '') if separator else match.group()
+        if collector is None:
+            valid = luhn_ok(digits)
+        else:
+            started = perf_counter()
+            valid = luhn_ok(digits)
+            collector.add_time("luhn", perf_counter() - started)
+        if not valid:
+            if collector is not None:
+                collector.count("rejected.luhn")
+            continue
+
+        if collector is not None:
+            collector.count("valid")
+        pos = end
+        yield start, end, digits
+
+
+def iter_card_spans(text, pos=0, stop=None):
+    """Перебирает валидные номера карт в строке: (начало, конец, 16 цифр).
+
+    Номер записан подряд или группами по 4 через один и тот же разделитель
+    (пробел или дефис). Цифры не извлекаются и не проверяются повторно через
+    is_valid_card_number. stop ограничивает начала номеров, но не их концы.
+    """
+    return _iter_spans(text, pos, stop, NUMBER)
+
+
+def iter_card_spans_bytes(data, pos=0, stop=None):
+    """То же для байтов в UTF-8; позиции - смещения в байтах"""
+    # latin-1 отображает байты в символы один к одному, поэтому смещения совпадают
+    return _iter_spans(data.decode('latin-1'), pos, stop, NUMBER_ASCII, raw=data)
@@ -0,0 +1,149 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch, Mock
+import metrics
+from archives import _undecided, detect_format, iter_members
+from code import file_input_mode, iter_valid_cards, scan_archive, scan_members
+
+LOG_A = "оплата 4111 1111 1111 1111 принята\nмусор 1234567890123456\n" * 300
+LOG_B = "возврат 5555-5555-5555-4444, карта5111111111111118 и 5111111111111118\n" * 300
+
+
+def expected_matches(member, text):
+    return [(member, len(text[:position].encode('utf-8')), card) for position, card in iter_valid_cards(text)]
+
+
+def tar_bytes(mode, files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, text in files:
+            data = text.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def zip_bytes(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class Pipe(io.RawIOBase):
+    def __init__(self, data):
+        self.source = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Как у канала: не больше 7 байт за чтение
+        data = self.source.read(min(len(buffer), 7))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class TestArchives(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        filename = os.path.join(self.tmp.name, name)
+        with open(filename, 'wb') as f:
+            f.write(data)
+        return filename
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format(gzip.compress(b'x')), 'gzip')
+        self.assertEqual(detect_format(bz2.compress(b'x')), 'bz2')
+        self.assertEqual(detect_format(lzma.compress(b'x')), 'xz')
+        self.assertEqual(detect_format(zip_bytes([('a', b'x')])), 'zip')
+        self.assertEqual(detect_format(tar_bytes('w', [('a', 'x')])), 'tar')
+        self.assertIsNone(detect_format(LOG_A.encode('utf-8')))
+
+    def test_compressed_streams(self):
+        data = LOG_A.encode('utf-8')
+        for name, compress in (('app.log.gz', gzip.compress), ('app.log.bz2', bz2.compress),
+                               ('app.log.xz', lzma.compress), ('app.log', bytes)):
+            filename = self.write(name, compress(data))
+            self.assertEqual(list(scan_archive(filename, buffer_size=100)), expected_matches(filename, LOG_A))
+
+    def test_archive_members(self):
+        files = [('logs/a.log', LOG_A), ('logs/b.log', LOG_B)]
+        for name, data in (('logs.tar', tar_bytes('w', files)),
+                           ('logs.tar.gz', tar_bytes('w:gz', files)),
+                           ('logs.tar.xz', tar_bytes('w:xz', files)),
+                           ('logs.zip', zip_bytes([(member, text.encode('utf-8')) for member, text in files]))):
+            filename = self.write(name, data)
+            expected = []
+            for member, text in files:
+                expected += expected_matches(filename + '!' + member, text)
+            self.assertEqual(list(scan_archive(filename, buffer_size=333)), expected, name)
+
+    def test_nested_archives(self):
+        inner = tar_bytes('w:bz2', [('b.log', LOG_B)])
+        filename = self.write('bundle.zip', zip_bytes([('a.log.gz', gzip.compress(LOG_A.encode('utf-8'))),
+                                                       ('old.tar.bz2', inner), ('empty/', b'')]))
+        expected = (expected_matches(filename + '!a.log.gz', LOG_A)
+                    + expected_matches(filename + '!old.tar.bz2!b.log', LOG_B))
+        self.assertEqual(list(scan_archive(filename)), expected)
+
+    def test_unseekable_stream(self):
+        tar = tar_bytes('w:gz', [('a.log', LOG_A)])
+        self.assertEqual(list(scan_members(io.BufferedReader(Pipe(tar), 16), '-')),
+                         expected_matches('-!a.log', LOG_A))
+        self.assertEqual(list(scan_members(io.BufferedReader(Pipe(LOG_B.encode('utf-8')), 16), '-')),
+                         expected_matches('-', LOG_B))
+        with metrics.collect() as collected:
+            self.assertEqual(list(iter_members(Pipe(zip_bytes([('a', b'x')])), '-')), [])
+        self.assertEqual(collected.counters["archive.skipped"], 1)
+
+    def test_text_resembling_signature(self):
+        # (начало файла, сколько раз распаковщик не смог начать: файл и канал)
+        cases = ((b'BZh this log is not compressed\n', 0), (b'BZh91AY&SY, but not bz2\n', 2),
+                 (b'\x1f\x8b not gzip\n', 2))
+        for prefix, undecodable in cases:
+            data = prefix + LOG_A.encode('utf-8')
+            filename = self.write('app.log', data)
+            expected = [(offset + len(prefix), card) for _, offset, card in expected_matches('', LOG_A)]
+            with metrics.collect() as collected:
+                self.assertEqual([(offset, card) for _, offset, card in scan_archive(filename, buffer_size=100)],
+                                 expected)
+                self.assertEqual(list(scan_members(io.BufferedReader(Pipe(data), 16), '-')),
+                                 [('-', offset, card) for offset, card in expected])
+            self.assertEqual(collected.counters.get("archive.undecodable", 0), undecodable, prefix)
+
+    def test_tar_head_read_in_small_pieces(self):
+        name = 'logs/' + 'очень-длинное-имя-' * 4 + '.log'
+        tar = tar_bytes('w', [(name, LOG_A)])
+        self.assertEqual(list(scan_members(io.BufferedReader(Pipe(tar), 16), '-')),
+                         expected_matches('-!' + name, LOG_A))
+        # Начало, которое уже не может быть заголовком tar, не ждёт целого блока
+        self.assertTrue(_undecided(b'BZh'))
+        self.assertTrue(_undecided(b'a' * 100))
+        self.assertFalse(_undecided(b'a' * 101))
+        self.assertFalse(_undecided(bz2.compress(b'x')[:10]))
+
+    def test_file_input_mode_reports_members(self):
+        filename = self.write('logs.tar.gz', tar_bytes('w:gz', [('a.log', LOG_A), ('b.log', LOG_B)]))
+        output = io.StringIO()
+        with patch('builtins.input', Mock(return_value=filename)), patch('sys.stdout', output):
+            cards = file_input_mode()
+        self.assertEqual(len(cards), 300 + 600)
+        self.assertIn(f"{filename}!a.log: 300", output.getvalue())
+        self.assertIn(f"{filename}!b.log: 600", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
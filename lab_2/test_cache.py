@@ -0,0 +1,155 @@
+import io
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+import code
+import metrics
+from cache import LRUCache, PageCache
+from code import find_cards_in_text, is_valid_card_number
+
+PAGE = 'Карта: 4111111111111111, тест 5555555555554444.'.encode('utf-8')
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    bodies_sent = 0
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        type(self).bodies_sent += 1
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnpromptedNotModifiedHandler(PageHandler):
+    """Отвечает 304 на первый запрос, даже безусловный"""
+    requests_seen = 0
+
+    def do_GET(self):
+        type(self).requests_seen += 1
+        if type(self).requests_seen == 1:
+            self.send_response(304)
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_and_counters(self):
+        cache = LRUCache(2, 'test_cache')
+        compute = Mock(side_effect=str.upper)
+        with metrics.collect() as collected:
+            self.assertEqual(cache.get('a', compute), 'A')
+            self.assertEqual(cache.get('b', compute), 'B')
+            self.assertEqual(cache.get('a', compute), 'A')
+            # 'b' использовался давнее 'a' и вытесняется
+            cache.get('c', compute)
+            cache.get('a', compute)
+            cache.get('b', compute)
+        self.assertEqual(compute.call_count, 4)
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2})
+        self.assertEqual(collected.counters, {"test_cache.misses": 4, "test_cache.hits": 2})
+
+    def test_validation_results_are_cached(self):
+        code.VALIDATION_CACHE.clear()
+        for _ in range(3):
+            self.assertEqual(is_valid_card_number('4111 1111 1111 1111'), (True, "Карта валидна"))
+            self.assertFalse(is_valid_card_number('4111-1111-1111-1112')[0])
+        self.assertEqual((code.VALIDATION_CACHE.hits, code.VALIDATION_CACHE.misses), (4, 2))
+        # Строки другой длины не кэшируются
+        is_valid_card_number('412345')
+        self.assertEqual(len(code.VALIDATION_CACHE), 2)
+
+        # Сканер текста проверяет номера без кэша
+        text = 'оплата 4111111111111111, возврат 4111 1111 1111 1111, ошибка 4111111111111112. ' * 10
+        self.assertEqual(len(find_cards_in_text(text)), 20)
+        self.assertEqual((code.VALIDATION_CACHE.hits, code.VALIDATION_CACHE.misses), (4, 2))
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.filename = os.path.join(self.tmp.name, 'cache', 'pages.json')
+
+    def test_persistence_and_size_eviction(self):
+        cache = PageCache(self.filename)
+        cache.store('http://a.test/', {'ETag': '"1"'}, ['4111111111111111'])
+        cache.store('http://b.test/', {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}, [])
+        cache.store('http://c.test/', {}, ['5555555555554444'])
+        cache.save()
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o600)
+
+        cache = PageCache(self.filename)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.conditional_headers('http://a.test/'), {'If-None-Match': '"1"'})
+        self.assertEqual(cache.conditional_headers('http://b.test/'),
+                         {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(cache.conditional_headers('http://c.test/'), {})
+        self.assertEqual(cache.revalidated('http://a.test/'), ['4111111111111111'])
+
+        # Места хватает на две записи: вытесняется давно не нужная b
+        size = cache.stats()["bytes"]
+        small = PageCache(self.filename, max_bytes=size + 10)
+        small.revalidated('http://a.test/')
+        small.store('http://d.test/', {'ETag': '"2"'}, [])
+        self.assertNotIn('http://b.test/', small)
+        self.assertEqual(small.evictions, 1)
+
+    def test_web_input_mode_revalidates(self):
+        PageHandler.bodies_sent = 0
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/page'
+        expected = ['4111 1111 1111 1111', '5555 5555 5555 4444']
+
+        with patch('code.PAGE_CACHE_FILE', self.filename), patch('builtins.input', Mock(return_value=url)), \
+                redirect_stdout(io.StringIO()):
+            self.assertEqual(code.web_input_mode(), expected)
+            with patch('code.scan_chunks') as scan:
+                self.assertEqual(code.web_input_mode(), expected)
+            scan.assert_not_called()
+            self.assertEqual(PageHandler.bodies_sent, 1)
+
+            # Страница изменилась: загружается и сканируется заново
+            PageHandler.etag = '"v2"'
+            self.addCleanup(setattr, PageHandler, 'etag', '"v1"')
+            self.assertEqual(code.web_input_mode(), expected)
+            self.assertEqual(PageHandler.bodies_sent, 2)
+
+    def test_not_modified_without_cached_page_refetches(self):
+        UnpromptedNotModifiedHandler.bodies_sent = 0
+        UnpromptedNotModifiedHandler.requests_seen = 0
+        server = ThreadingHTTPServer(('127.0.0.1', 0), UnpromptedNotModifiedHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/page'
+
+        with patch('code.PAGE_CACHE_FILE', self.filename), patch('builtins.input', Mock(return_value=url)), \
+                redirect_stdout(io.StringIO()):
+            self.assertEqual(code.web_input_mode(), ['4111 1111 1111 1111', '5555 5555 5555 4444'])
+        self.assertEqual(UnpromptedNotModifiedHandler.requests_seen, 2)
+        self.assertEqual(UnpromptedNotModifiedHandler.bodies_sent, 1)
+        self.assertIn(url, PageCache(self.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
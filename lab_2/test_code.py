@@ -1,6 +1,14 @@
+import io
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, Mock
-from code import is_valid_card_number, user_input_mode, file_input_mode, web_input_mode
+from unittest.mock import patch, Mock, MagicMock
+import metrics
+from code import (is_valid_card_number, user_input_mode, file_input_mode, web_input_mode,
+                  find_cards_in_text, find_cards_in_file_parallel, iter_valid_cards, scan_stream)
+
+SAMPLE_TEXT = ("Номер 4111111111111111 и ещё 5555555555554444, мусор 1234567890123456,\n"
+               "карта5111111111111118 ёж 4222222222222222 — 0123456789012345 " * 20)
 
 
 class TestCode(unittest.TestCase):
@@ -35,3 +43,52 @@ class TestCode(unittest.TestCase):
             result = web_input_mode()
         self.assertEqual(result, ['2485 7080 3024 1382',
                                   '2485 7080 3024 1382'])
+
+    def test_find_cards_in_file_parallel(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'dump.txt')
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(SAMPLE_TEXT)
+            expected = find_cards_in_text(SAMPLE_TEXT)
+            # Маленькие куски гарантируют номера на стыках кусков
+            for chunk_size in (7, 50, 1 << 20):
+                result = find_cards_in_file_parallel(filename, workers=2, chunk_size=chunk_size)
+                self.assertEqual(result, expected)
+
+    def test_scan_stream_offsets(self):
+        data = SAMPLE_TEXT.encode('utf-8')
+        expected = [(len(SAMPLE_TEXT[:position].encode('utf-8')), card)
+                    for position, card in iter_valid_cards(SAMPLE_TEXT)]
+        for buffer_size in (1, 5, 21, 4096):
+            result = list(scan_stream(io.BytesIO(data), buffer_size))
+            self.assertEqual(result, expected)
+        for offset, card in expected:
+            self.assertEqual(data[offset:offset + 16].decode('ascii'), card)
+
+    def test_scan_metrics(self):
+        data = SAMPLE_TEXT.encode('utf-8')
+        with metrics.collect() as collected:
+            cards = list(scan_stream(io.BytesIO(data), 4096))
+        counters = collected.report()["counters"]
+        self.assertEqual(counters["bytes_read"], len(data))
+        self.assertEqual(counters["valid"], len(cards))
+        # 1234567890123456 и 4222222222222222 не проходят Луна, 5111111111111118 приклеен к слову
+        self.assertEqual(counters["rejected.luhn"], 40)
+        self.assertEqual(counters["rejected.word_boundary"], 20)
+        self.assertIn("match", collected.timers)
+        # Поиск шаблона и проверка Луна учитываются раздельно
+        phases = collected.report()["phases"]
+        self.assertEqual(phases["luhn"]["calls"], counters["valid"] + counters["rejected.luhn"])
+        self.assertGreater(phases["regex"]["calls"], counters["candidates"])
+        self.assertIsNone(metrics.active)
+
+    def test_web_input_mode_streams_body(self):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        body = 'Карта: 4111111111111111, тест 5555555555554444.'.encode('utf-8')
+        response.iter_content.return_value = [body[i:i + 10] for i in range(0, len(body), 10)]
+        with patch('builtins.input', Mock(return_value='http://example.test/')), \
+                patch('code.requests.get', Mock(return_value=response)) as get:
+            result = web_input_mode()
+        self.assertEqual(get.call_args.kwargs['stream'], True)
+        self.assertEqual(result, ['4111 1111 1111 1111', '5555 5555 5555 4444'])
@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from crawler import scan_urls
+
+PAGES = {
+    '/a': 'Карта 4111111111111111 на странице A',
+    '/b': 'Здесь 5555555555554444 и 5111111111111118',
+    '/empty': 'Номеров нет',
+    '/slow': 'Медленная страница',
+}
+# Время ответа страниц, кроме обычных 20 мс
+DELAYS = {'/slow': 0.5}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.connections.add(self.client_address)
+            server.served[self.headers['Host'].split(':')[0] + self.path] = time.monotonic()
+        try:
+            path = self.path.split('?')[0]
+            time.sleep(DELAYS.get(path, 0.02))
+            body = PAGES.get(path)
+            if body is None:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCrawler(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        self.server.lock = threading.Lock()
+        self.server.active = self.server.max_active = 0
+        self.server.connections = set()
+        self.server.served = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_results_per_url(self):
+        urls = [self.base + path for path in ('/a', '/b', '/empty', '/missing')]
+        results = scan_urls(urls, concurrency=4)
+        self.assertEqual([result['url'] for result in results], urls)
+        self.assertEqual(results[0]['cards'], ['4111 1111 1111 1111'])
+        self.assertEqual(results[1]['cards'], ['5555 5555 5555 4444', '5111 1111 1111 1118'])
+        self.assertEqual(results[2]['cards'], [])
+        self.assertIsNotNone(results[3]['error'])
+
+    def test_concurrency_limit_and_connection_reuse(self):
+        urls = [f'{self.base}/a?page={i}' for i in range(30)]
+        results = scan_urls(urls, concurrency=3)
+        self.assertTrue(all(result['cards'] == ['4111 1111 1111 1111'] for result in results))
+        self.assertLessEqual(self.server.max_active, 3)
+        self.assertLessEqual(len(self.server.connections), 3)
+
+    def test_per_host_rate(self):
+        urls = [f'{self.base}/empty?page={i}' for i in range(5)]
+        started = time.monotonic()
+        scan_urls(urls, concurrency=5, per_host_rate=20)
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 20)
+
+    def test_rate_limited_host_does_not_block_others(self):
+        port = self.server.server_address[1]
+        slow = [f'http://localhost:{port}/empty?page={i}' for i in range(6)]
+        urls = slow + [f'{self.base}/a']
+        scan_urls(urls, concurrency=2, per_host_rate=5)
+        served = self.server.served
+        starts = sorted(served[f'localhost/empty?page={i}'] for i in range(6))
+        # Ожидающие паузы запросы к localhost не держат слоты: страница другого хоста
+        # загружается сразу, а не после всей очереди медленного хоста
+        self.assertLess(served['127.0.0.1/a'], starts[2])
+        self.assertGreaterEqual(starts[-1] - starts[0], 4 / 5)
+
+    def test_host_interval_between_request_starts(self):
+        port = self.server.server_address[1]
+        urls = [f'http://localhost:{port}/slow'] + [f'{self.base}/empty?page={i}' for i in range(4)]
+        scan_urls(urls, concurrency=1, per_host_rate=5)
+        # Запросы к 127.0.0.1 дождались своего времени, пока слот занимала медленная
+        # страница, но после её окончания всё равно начинаются с интервалом хоста
+        starts = sorted(self.server.served[f'127.0.0.1/empty?page={i}'] for i in range(4))
+        self.assertGreater(starts[0], self.server.served['localhost/slow'] + 0.4)
+        for previous, current in zip(starts, starts[1:]):
+            self.assertGreaterEqual(current - previous, 0.9 / 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
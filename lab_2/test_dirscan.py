@@ -0,0 +1,107 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from dirscan import Checkpoint, scan_path, scan_tree, walk_files, write_results
+
+FILES = {
+    'a.log': "оплата 4111111111111111\n",
+    'logs/b.log': "возврат 5555-5555-5555-4444 и 5111 1111 1111 1118\n",
+    'logs/c.txt': "номеров нет\n",
+    'logs/deep/d.log': "x 4111111111111111 y 5555555555554444\n",
+    'node_modules/e.log': "4111111111111111\n",
+}
+
+
+class TestDirscan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        for name, text in FILES.items():
+            self.write(name, text.encode('utf-8'))
+        self.write('logs/old.log.gz', gzip.compress(b"4111 1111 1111 1111\n"))
+        self.write('logs/image.bin', b"\0\1\2 4111111111111111")
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def relative(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def run_scan(self, **options):
+        out = io.StringIO()
+        stats = write_results(scan_tree([self.root], exclude=['node_modules'], **options), out)
+        rows = sorted((self.relative(row["file"]), row["offset"], row["card"])
+                      for row in map(json.loads, out.getvalue().splitlines()))
+        return rows, stats
+
+    def test_walk_include_exclude(self):
+        files = [self.relative(path) for path in walk_files([self.root], exclude=['node_modules', '*.bin'])]
+        self.assertEqual(files, ['a.log', 'logs/b.log', 'logs/c.txt', 'logs/old.log.gz', 'logs/deep/d.log'])
+        files = [self.relative(path) for path in walk_files([self.root], include=['*.log'], exclude=['deep'])]
+        self.assertEqual(files, ['a.log', 'logs/b.log', 'node_modules/e.log'])
+
+    def test_jsonl_results_and_skip_policy(self):
+        rows, stats = self.run_scan()
+        self.assertEqual(rows, [
+            ('a.log', 13, '4111 11** **** 1111'),
+            ('logs/b.log', 15, '5555 55** **** 4444'),
+            ('logs/b.log', 38, '5111 11** **** 1118'),
+            ('logs/deep/d.log', 2, '4111 11** **** 1111'),
+            ('logs/deep/d.log', 21, '5555 55** **** 4444'),
+            ('logs/old.log.gz', 0, '4111 11** **** 1111'),
+        ])
+        self.assertEqual(stats["files"], 6)
+        self.assertEqual(stats["skipped.binary"], 1)
+        self.assertEqual(stats["cards"], 6)
+
+        big = scan_path(os.path.join(self.root, 'a.log'), max_size=10)
+        self.assertEqual((big["skipped"], big["matches"]), ("size", []))
+        missing = scan_path(os.path.join(self.root, 'missing.log'))
+        self.assertIsNotNone(missing["error"])
+
+    def test_process_pool_matches_threads(self):
+        for i in range(150):
+            self.write(f'many/{i:03}.log', f"{i} 4111111111111111\n".encode('utf-8'))
+        self.assertEqual(self.run_scan(processes=2, threads=4), self.run_scan(threads=4))
+
+    def test_resume_from_checkpoint(self):
+        for i in range(30):
+            self.write(f'many/{i:03}.log', f"{i} 4111111111111111\n".encode('utf-8'))
+        expected, _ = self.run_scan(threads=2)
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        output = os.path.join(state.name, 'cards.jsonl')
+        checkpoint_file = os.path.join(state.name, 'cards.checkpoint')
+
+        def interrupted(results, after):
+            for i, result in enumerate(results):
+                if i == after:
+                    raise KeyboardInterrupt
+                yield result
+
+        checkpoint = Checkpoint(checkpoint_file)
+        with open(output, 'w', encoding='utf-8') as out, self.assertRaises(KeyboardInterrupt):
+            write_results(interrupted(scan_tree([self.root], exclude=['node_modules'], threads=2), 12),
+                          out, checkpoint)
+        checkpoint = Checkpoint(checkpoint_file)
+        self.assertEqual(len(checkpoint.done), 12)
+        with open(output, 'a', encoding='utf-8') as out:
+            stats = write_results(scan_tree([self.root], exclude=['node_modules'], threads=2,
+                                            done=checkpoint.done), out, checkpoint)
+        self.assertEqual(stats["files"], 36 - 12)
+
+        with open(output, encoding='utf-8') as f:
+            rows = sorted((self.relative(row["file"]), row["offset"], row["card"]) for row in map(json.loads, f))
+        self.assertEqual(rows, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from code import is_valid_card_number
+from luhn_batch import validate_batch, validate_buffer, validate_digit_matrix, LUHN_FAILED, VALID
+
+CANDIDATES = ['4111111111111111', '5555555555554444', '4111111111111112', '0123456789012345',
+              '412345', '12345678901234567890', '4111 1111 1111 1111', '', '5111-1111-1111-1118']
+
+
+class TestLuhnBatch(unittest.TestCase):
+    def test_validate_batch_matches_single(self):
+        mask, messages = validate_batch(CANDIDATES)
+        expected = [is_valid_card_number(candidate) for candidate in CANDIDATES]
+        self.assertEqual(mask.tolist(), [valid for valid, _ in expected])
+        self.assertEqual(messages, [message for _, message in expected])
+
+    def test_validate_buffer(self):
+        mask, reasons = validate_buffer(b'41111111111111114111111111111112')
+        self.assertEqual(mask.tolist(), [True, False])
+        self.assertEqual(reasons.tolist(), [VALID, LUHN_FAILED])
+        with self.assertRaises(ValueError):
+            validate_buffer(b'4111')
+
+    def test_validate_digit_matrix(self):
+        digits = np.array([[4] + [1] * 15, [4] + [1] * 14 + [2]], dtype=np.uint8)
+        mask, _ = validate_digit_matrix(digits)
+        self.assertEqual(mask.tolist(), [True, False])
+
+    def test_empty_batch(self):
+        mask, messages = validate_batch([])
+        self.assertEqual(len(mask), 0)
+        self.assertEqual(messages, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import io
+import random
+import re
+import unittest
+from code import is_valid_card_number, iter_valid_cards, scan_stream
+from matcher import iter_card_spans, iter_card_spans_bytes, luhn_ok
+
+GROUPED_TEXT = ("оплата 4111 1111 1111 1111, возврат 5555-5555-5555-4444; без групп 4111111111111111.\n"
+                "смешанные 4111 1111-1111 1111, длинная цепочка 1234 4111 1111 1111 1111 и 4111 1111 1111 1111 2222,"
+                " неверная 4111 1111 1111 1112 — слово4111 1111 1111 1111 ") * 5
+
+
+class TestMatcher(unittest.TestCase):
+    def test_grouped_numbers_with_spans(self):
+        text = "a 4111 1111 1111 1111 b 5555-5555-5555-4444 c 4111111111111111"
+        self.assertEqual(list(iter_card_spans(text)), [
+            (2, 21, '4111111111111111'),
+            (24, 43, '5555555555554444'),
+            (46, 62, '4111111111111111'),
+        ])
+        for start, end, digits in iter_card_spans(text):
+            self.assertEqual(re.sub('[ -]', '', text[start:end]), digits)
+
+    def test_rejects_mixed_and_longer_groupings(self):
+        for text in ("4111 1111-1111 1111", "4111 11111111 1111", "1234 4111 1111 1111 1111",
+                     "4111 1111 1111 1111 2222", "4111  1111 1111 1111", "41111 111 1111 1111"):
+            self.assertEqual(list(iter_card_spans(text)), [], text)
+
+    def test_contiguous_numbers_match_old_regex(self):
+        rng = random.Random(7)
+        alphabet = "0123456789 -ab_ж.\n"
+        numbers = ["4111111111111111", "5555555555554444", "1234567890123456"]
+        text = ''.join(rng.choice(numbers) if rng.random() < 0.05
+                       else rng.choice(alphabet) for _ in range(20000))
+        expected = [(m.start(), m.group()) for m in re.finditer(r'\b[1-9][0-9]{15}\b', text)
+                    if is_valid_card_number(m.group())[0]]
+        found = [(start, digits) for start, end, digits in iter_card_spans(text)
+                 if '-' not in text[start:end] and ' ' not in text[start:end]]
+        self.assertGreater(len(expected), 10)
+        self.assertEqual(found, expected)
+
+    def test_luhn_table_matches_validator(self):
+        rng = random.Random(3)
+        for _ in range(2000):
+            digits = str(rng.randrange(10 ** 15, 10 ** 16))
+            self.assertEqual(luhn_ok(digits), is_valid_card_number(digits)[0], digits)
+
+    def test_bytes_offsets_and_stream_parity(self):
+        data = GROUPED_TEXT.encode('utf-8')
+        expected = [(len(GROUPED_TEXT[:position].encode('utf-8')), card)
+                    for position, card in iter_valid_cards(GROUPED_TEXT)]
+        self.assertEqual(len(expected), 15)
+        self.assertEqual([(start, digits) for start, _, digits in iter_card_spans_bytes(data)], expected)
+        for buffer_size in (1, 3, 19, 64, 4096):
+            self.assertEqual(list(scan_stream(io.BytesIO(data), buffer_size)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()